@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import shlex
+import logging
+import argparse
+
+from clstk.utils import colors
+
+from clstk.benchmark import runner
+from clstk.benchmark import startup
+from clstk.benchmark import loadTest
+from clstk.benchmark import overhead
+
+
+def parseVariants(values):
+    variants = []
+    for value in values:
+        name, _, variantArgs = value.partition('=')
+        variants.append((name, shlex.split(variantArgs)))
+
+    return variants
+
+
+def parseMaxSentences(values):
+    maxSentences = {}
+    for value in values:
+        method, _, size = value.partition('=')
+        maxSentences[method] = int(size)
+
+    return maxSentences
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Benchmark summarizers on synthetic corpora'
+        )
+
+    parser.add_argument('--methods', type=str, nargs='+',
+                        default=runner.METHODS.keys(),
+                        choices=runner.METHODS.keys(),
+                        help='Summarization methods to benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 200, 500, 1000, 2000, 5000, 10000,
+                                 20000],
+                        metavar='N',
+                        help='Number of sentences in synthetic corpora')
+    parser.add_argument('--max-sentences', type=str, nargs='+',
+                        default=['linBilmes=1000'], metavar='method=N',
+                        help='Largest corpus size to run for a method. '
+                        'Defaults to linBilmes=1000')
+    parser.add_argument('--method-args', type=str, default='',
+                        metavar='args',
+                        help='Arguments passed to the summarizers, as for '
+                        'sum.py, e.g. "--size 250 -w"')
+    parser.add_argument('--variant', type=str, action='append',
+                        default=[], metavar='name=args',
+                        help='Also run each method with further arguments '
+                        'under this name, e.g. "hashing=--vectorizer '
+                        'hashing". Can be repeated')
+
+    parser.add_argument('--documents', type=int, default=10, metavar='N',
+                        help='Number of documents in each corpus')
+    parser.add_argument('--vocabulary', type=int, default=5000, metavar='N',
+                        help='Number of distinct words in each corpus')
+    parser.add_argument('--duplication', type=float, default=0.1,
+                        metavar='rate',
+                        help='Fraction of duplicate sentences in each corpus')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for corpus generation')
+
+    parser.add_argument('--startup', action='store_true',
+                        help='Only benchmark startup time of sum.py and '
+                        'evaluate.py. Exits with non-zero status if a '
+                        'command exceeds the budget')
+    parser.add_argument('--startup-budget', type=float, default=0.5,
+                        metavar='seconds',
+                        help='Allowed startup time for each command')
+
+    parser.add_argument('--load-test', type=str, default=None,
+                        metavar='url',
+                        help='Only load test a running summarization service '
+                        '(see serve.py), e.g. http://127.0.0.1:8080')
+    parser.add_argument('--load-method', type=str, default='coRank',
+                        choices=runner.METHODS.keys(),
+                        help='Summarization method for the load test')
+    parser.add_argument('--load-requests', type=int, default=100,
+                        metavar='N', help='Number of requests to send')
+    parser.add_argument('--load-concurrency', type=int, default=8,
+                        metavar='N', help='Number of concurrent requests')
+    parser.add_argument('--load-sentences', type=int, default=200,
+                        metavar='N',
+                        help='Number of sentences in each request')
+
+    parser.add_argument('--overhead', action='store_true',
+                        help='Only measure per-call overhead of summarizing '
+                        'small document sets from memory and from a '
+                        'directory')
+    parser.add_argument('--overhead-sizes', type=int, nargs='+',
+                        default=[10, 100], metavar='N',
+                        help='Number of sentences in document sets for the '
+                        'overhead benchmark')
+    parser.add_argument('--overhead-repeat', type=int, default=20,
+                        metavar='N',
+                        help='Number of calls timed for each method and size')
+
+    parser.add_argument('-o', '--output', type=str,
+                        default='benchmark.json', metavar='path',
+                        help='Path to write results as JSON')
+    parser.add_argument('--compare', type=str, default=None, metavar='path',
+                        help='Compare with results of an earlier run')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Show verbose information messages')
+    parser.add_argument('--no-colors', action='store_true',
+                        help='Don\'t show colors in verbose log')
+
+    args = parser.parse_args()
+
+    if args.no_colors:
+        colors.disable()
+
+    logLevel = logging.NOTSET if args.verbose else logging.WARNING
+    logging.basicConfig(
+        level=logLevel,
+        format=(colors.enclose('%(asctime)s', colors.CYAN) +
+                colors.enclose('.%(msecs)03d ', colors.BLUE) +
+                colors.enclose('%(name)s', colors.YELLOW) + ': ' +
+                '%(message)s'),
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    # Summarizer logs are too verbose for benchmarks
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("benchmark.py").setLevel(
+        logging.INFO if args.verbose else logging.WARNING)
+
+    if args.startup:
+        results = startup.runStartupBenchmark(
+            os.path.dirname(os.path.abspath(__file__)), args.startup_budget
+        )
+
+        runner.writeResults({"startup": results}, args.output)
+
+        for result in results:
+            print "%-28s %6.3fs  %s  heavy modules: %s" % (
+                result["command"], result["seconds"],
+                "ok  " if result["within_budget"] else "SLOW",
+                ", ".join(result["heavy_modules"]) or "none"
+            )
+
+        sys.exit(0 if all(r["within_budget"] for r in results) else 1)
+
+    if args.load_test:
+        result = loadTest.runLoadTest(
+            args.load_test, args.load_method,
+            requests=args.load_requests,
+            concurrency=args.load_concurrency,
+            sentences=args.load_sentences,
+            methodArgs=shlex.split(args.method_args),
+            seed=args.seed
+        )
+        result["service"] = loadTest.getServiceStats(args.load_test)
+
+        runner.writeResults({"load_test": result}, args.output)
+
+        print "%d requests in %.3fs, %.2f requests/s, statuses: %s" % (
+            result["requests"], result["seconds"], result["throughput"],
+            ", ".join("%s %d" % s for s in sorted(result["statuses"].items()))
+        )
+        print "latency: %s" % ", ".join("%s %.3fs" % l for l in
+                                        result["latency"].items())
+
+        sys.exit(0)
+
+    if args.overhead:
+        results = overhead.runOverheadBenchmark(
+            args.methods, args.overhead_sizes,
+            repeat=args.overhead_repeat,
+            methodArgs=shlex.split(args.method_args),
+            corpusOptions={
+                'documents': args.documents,
+                'vocabulary': args.vocabulary,
+                'duplication': args.duplication,
+            },
+            seed=args.seed
+        )
+
+        runner.writeResults({"overhead": results}, args.output)
+
+        for result in results:
+            print "%-10s N=%-6d memory %.4fs  directory %.4fs  " \
+                "filesystem %+.4fs per call (median of %d)" % (
+                    result["method"], result["sentences"],
+                    result["memory"]["median"],
+                    result["directory"]["median"],
+                    result["filesystem"], result["repeat"]
+                )
+
+        sys.exit(0)
+
+    results = runner.runBenchmarks(
+        args.methods, args.sizes,
+        maxSentences=parseMaxSentences(args.max_sentences),
+        methodArgs=shlex.split(args.method_args),
+        corpusOptions={
+            'documents': args.documents,
+            'vocabulary': args.vocabulary,
+            'duplication': args.duplication,
+        },
+        seed=args.seed,
+        variants=parseVariants(args.variant)
+    )
+
+    runner.writeResults(results, args.output)
+
+    for run in results["runs"]:
+        name = runner.getRunName(run["method"], run.get("variant"))
+
+        if "error" in run:
+            print "%-10s N=%-6d error: %s" % (name, run["sentences"],
+                                               run["error"])
+            continue
+
+        print "%-10s N=%-6d %8.3fs  peak RSS %8d KB  ROUGE-1 R %.4f  (%s)" % (
+            name, run["sentences"], run["total"],
+            run["peak_rss_kb"], run["rouge"]["ROUGE-1"]["recall"],
+            ", ".join("%s %.3fs" % s for s in run["stages"].items())
+        )
+
+        if "pruning" in run:
+            pruning = run["pruning"]
+            print "%-10s %-8s %d candidates, unpruned optimize %.3fs, " \
+                "ROUGE-1 R delta %+.4f, ROUGE-2 R delta %+.4f" % (
+                    "", "", pruning["candidates"],
+                    pruning["unpruned_optimize"],
+                    pruning["rouge_delta"]["ROUGE-1"]["recall"],
+                    pruning["rouge_delta"]["ROUGE-2"]["recall"]
+                )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        print "-"
+        print "\n".join(runner.compareResults(baseline, results))
@@ -0,0 +1,96 @@
+"""
+Load test for the summarization service.
+
+Sends concurrent requests with synthetic documents to a running service, see
+:mod:`clstk.service`, and measures throughput and latency.
+"""
+
+import json
+import time
+import urllib2
+import collections
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from .syntheticCorpus import SyntheticCorpus
+
+
+def _post(url, data, timeout):
+    request = urllib2.Request(url, json.dumps(data),
+                              {"Content-Type": "application/json"})
+
+    start = time.time()
+    try:
+        status = urllib2.urlopen(request, timeout=timeout).getcode()
+    except urllib2.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = None
+
+    return status, time.time() - start
+
+
+def runLoadTest(url, method, requests=100, concurrency=8, sentences=200,
+                methodArgs=[], timeout=300, seed=0):
+    """
+    Run a load test
+
+    :param url: Base URL of the service, e.g. ``http://127.0.0.1:8080``
+    :param method: Name of the summarizer
+    :param requests: Number of requests to send
+    :param concurrency: Number of requests in flight at a time
+    :param sentences: Number of sentences in the documents of each request
+    :param methodArgs: Summarizer arguments as accepted by ``sum.py``
+    :param timeout: Client side timeout for each request in seconds
+    :param seed: Seed for document generation
+    :returns: ``dict`` with throughput, latency percentiles of successful
+              requests and counts of response status codes
+    """
+    corpus = SyntheticCorpus(sentences=sentences, seed=seed)
+    documents = corpus.generateDocuments(corpus.generateSentences())
+
+    data = {
+        "documents": documents,
+        "args": methodArgs,
+        "translator": "identity",
+    }
+    summarizeUrl = "%s/summarize/%s" % (url.rstrip("/"), method)
+
+    pool = ThreadPool(concurrency)
+
+    start = time.time()
+    responses = pool.map(lambda _: _post(summarizeUrl, data, timeout),
+                         xrange(requests))
+    elapsed = time.time() - start
+
+    pool.close()
+
+    statuses = collections.Counter(str(status) for status, _ in responses)
+    latencies = [latency for status, latency in responses if status == 200]
+
+    percentiles = collections.OrderedDict()
+    if latencies:
+        for p in (50, 90, 95, 99):
+            percentiles["p%d" % p] = float(np.percentile(latencies, p))
+        percentiles["max"] = max(latencies)
+
+    return collections.OrderedDict([
+        ("method", method),
+        ("requests", requests),
+        ("concurrency", concurrency),
+        ("sentences", sentences),
+        ("seconds", elapsed),
+        ("throughput", requests / elapsed),
+        ("latency", percentiles),
+        ("statuses", dict(statuses)),
+    ])
+
+
+def getServiceStats(url):
+    """
+    Get stats of a running service
+
+    :param url: Base URL of the service
+    """
+    return json.load(urllib2.urlopen("%s/stats" % url.rstrip("/")))
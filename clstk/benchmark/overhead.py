@@ -0,0 +1,126 @@
+"""
+Per-call overhead of the summarization API.
+
+Small synthetic document sets are summarized repeatedly in one process, as
+a service or a library user would, once from memory with
+:func:`clstk.summarizers.summarizeDocuments` and once from a directory with
+the summarizer's ``summarize``. On small document sets the time of a call is
+mostly fixed overhead, and the difference between the two is the cost of
+going through the filesystem.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import collections
+
+import numpy as np
+
+from .. import summarizers
+from .syntheticCorpus import SyntheticCorpus
+from .runner import getMethodParams
+
+import logging
+logger = logging.getLogger("benchmark.py")
+
+
+def _getTimes(times):
+    return collections.OrderedDict([
+        ("min", min(times)),
+        ("median", float(np.median(times))),
+        ("mean", float(np.mean(times))),
+    ])
+
+
+def _writeDocuments(documents, dirname):
+    for d, document in enumerate(documents):
+        with open(os.path.join(dirname, "doc%03d" % d), "w") as f:
+            f.write(document.encode('utf-8'))
+
+
+def measureOverhead(method, documents, params, repeat=20):
+    """
+    Time summarizing the same documents from memory and from a directory
+
+    Calls from memory and from the directory alternate, after one call of
+    each to load models and language resources.
+
+    :param method: Name of the summarizer
+    :param documents: list of documents as unicode strings
+    :param params: Params for the summarizer
+    :param repeat: Number of timed calls of each
+    :returns: ``dict`` with ``min``, ``median`` and ``mean`` seconds per
+              call for ``memory`` and ``directory``, and ``filesystem``, the
+              difference of their medians
+    """
+    summarizer = summarizers.getSummarizer(method)
+    docsDir = tempfile.mkdtemp(prefix="clstk-overhead-")
+
+    calls = collections.OrderedDict([
+        ("memory", lambda: summarizers.summarizeDocuments(
+            method, iter(documents), params)),
+        ("directory", lambda: summarizer.summarize(docsDir, params)),
+    ])
+    times = collections.OrderedDict((name, []) for name in calls)
+
+    try:
+        _writeDocuments(documents, docsDir)
+
+        for call in calls.values():
+            call()
+
+        for _ in xrange(repeat):
+            for name, call in calls.items():
+                start = time.time()
+                call()
+                times[name].append(time.time() - start)
+    finally:
+        shutil.rmtree(docsDir)
+
+    result = collections.OrderedDict(
+        (name, _getTimes(callTimes)) for name, callTimes in times.items()
+    )
+    result["filesystem"] = result["directory"]["median"] - \
+        result["memory"]["median"]
+
+    return result
+
+
+def runOverheadBenchmark(methods, sizes=[10, 100], repeat=20, methodArgs=[],
+                         corpusOptions={}, seed=0):
+    """
+    Measure per-call overhead for all methods and document set sizes
+
+    :param methods: Names of summarizers
+    :param sizes: Numbers of sentences in the synthetic document sets
+    :param repeat: Number of timed calls for each method and size
+    :param methodArgs: Summarizer arguments as accepted by ``sum.py``
+    :param corpusOptions: Options for
+                          :class:`clstk.benchmark.syntheticCorpus.SyntheticCorpus`
+    :param seed: Seed for corpus generation
+    :returns: list of results, one for each method and size, see
+              :func:`measureOverhead`
+    """
+    results = []
+
+    for size in sizes:
+        corpus = SyntheticCorpus(sentences=size, seed=seed, **corpusOptions)
+        documents = map(lambda d: d.decode('utf-8'),
+                        corpus.generateDocuments(corpus.generateSentences()))
+
+        for method in methods:
+            logger.info("Measuring overhead of %s with %d sentences",
+                        method, size)
+
+            params = getMethodParams(method, methodArgs)
+
+            result = collections.OrderedDict([
+                ("method", method),
+                ("sentences", size),
+                ("repeat", repeat),
+            ])
+            result.update(measureOverhead(method, documents, params, repeat))
+            results.append(result)
+
+    return results
@@ -0,0 +1,377 @@
+"""
+Benchmark runner.
+
+Times each stage of the summarizers on synthetic corpora of increasing size.
+Every run happens in a separate process so that peak memory is measured for
+that run alone, and a run which runs out of memory does not stop the others.
+"""
+
+import os
+import time
+import json
+import shutil
+import platform
+import resource
+import tempfile
+import contextlib
+import collections
+import multiprocessing
+import Queue
+
+from .. import linBilmes
+from .. import coRank
+from .. import simFusion
+from .. import summarizers
+from ..objectives import AggregateObjective
+from ..evaluation import RougeScore
+from ..utils import budget
+from .syntheticCorpus import SyntheticCorpus
+
+import logging
+logger = logging.getLogger("benchmark.py")
+
+METHODS = collections.OrderedDict([
+    ('linBilmes', linBilmes),
+    ('coRank', coRank),
+    ('simFusion', simFusion),
+])
+
+
+class StageTimer(object):
+    """
+    Accumulates wall-clock time of named stages
+
+    Times are exclusive, time of a stage opened inside another one is not
+    counted for the outer stage, so that times add up to the wall time.
+    """
+
+    def __init__(self):
+        self.times = collections.OrderedDict()
+        self._nested = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self._nested.append(0.)
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+
+            self.times[name] = self.times.get(name, 0.) + elapsed - nested
+
+
+def _peakRSS():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def getMethodParams(method, methodArgs=[]):
+    """
+    Get summarizer params from command line style arguments
+
+    :param method: Name of the summarizer
+    :param methodArgs: List of arguments as accepted by ``sum.py``
+    :returns: params for the summarizer, using the offline identity
+              translator
+    """
+    params = summarizers.parseParams(method, methodArgs)
+    params['translator'] = 'identity'
+
+    if method == 'linBilmes' and not os.getenv("CLUTO_BIN_PATH") and \
+            params['objectives']['diversity']['clustering'] == 'cluto':
+        logger.info("CLUTO_BIN_PATH not set, disabling diversity objective")
+        params['objectives']['diversity']['lambda'] = 0
+
+    return params
+
+
+def benchmarkMethod(method, docsDir, references, params):
+    """
+    Run one summarizer on a document set, timing each stage
+
+    :param method: Name of the summarizer
+    :param docsDir: Directory containing the documents
+    :param references: Reference summaries, each a list of sentences
+    :param params: Params for the summarizer
+    :returns: ``dict`` with stage times, corpus size and ROUGE scores of
+              the first budget. ROUGE scores of each budget are added as
+              ``budgets`` if there are several. If candidates are pruned,
+              ROUGE scores of an unpruned run and their difference are
+              added as ``pruning``
+    """
+    summarizer = METHODS[method]
+    timer = StageTimer()
+
+    with timer.stage('load'):
+        c = summarizer.loadCorpus(docsDir, params)
+
+    # Corpus.load already vectorized the sentences, this measures
+    # vectorization alone
+    with timer.stage('vectorize'):
+        c.generateTranslationSentenceVectors()
+        c.generateSentenceVectors()
+
+    with timer.stage('similarity'):
+        c.getSentenceSimilarities()
+        c.getTranslationSentenceSimilarities()
+
+    pruning = None
+
+    if method == 'linBilmes':
+        objective = AggregateObjective(params['objectives'])
+
+        with timer.stage('objectives'):
+            objective.setCorpus(c)
+
+        with timer.stage('prune'):
+            candidates = linBilmes.pruneCandidates(c, **params['prune'])
+
+        with timer.stage('optimize'):
+            summaries = linBilmes.optimizeGreedy(params['size'], objective,
+                                                 c, prepareObjective=False,
+                                                 candidates=candidates)
+
+        if len(candidates) < len(c.getSentences()):
+            start = time.time()
+            unprunedSummaries = linBilmes.optimizeGreedy(
+                params['size'][:1], objective, c, prepareObjective=False
+            )
+            pruning = collections.OrderedDict([
+                ("candidates", len(candidates)),
+                ("unpruned_optimize", time.time() - start),
+                ("unpruned_rouge", _getRouge(unprunedSummaries[0],
+                                             references)),
+            ])
+    else:
+        with timer.stage('rank'):
+            summaries = summarizer.summarizeCorpus(c, params)
+
+    rouge = _getRouge(summaries[0], references)
+
+    result = collections.OrderedDict([
+        ("corpus_sentences", len(c.getSentences())),
+        ("stages", timer.times),
+        ("total", sum(timer.times.values())),
+        ("rouge", rouge),
+    ])
+
+    if len(summaries) > 1:
+        result["budgets"] = collections.OrderedDict(
+            (budget.getBudgetName(sizeBudget), _getRouge(summary, references))
+            for sizeBudget, summary in zip(params['size'], summaries)
+        )
+
+    if pruning:
+        pruning["rouge_delta"] = collections.OrderedDict(
+            (name, collections.OrderedDict(
+                (measure, value - pruning["unpruned_rouge"][name][measure])
+                for measure, value in scores.items()
+            ))
+            for name, scores in rouge.items()
+        )
+        result["pruning"] = pruning
+
+    return result
+
+
+def _getRouge(summary, references):
+    rougeScore = RougeScore()
+    summaryLines = summary.getTargetSummary().split("\n")
+
+    rouge = collections.OrderedDict()
+    for n in (1, 2):
+        f, p, r = rougeScore.rouge_n(summaryLines, references, n)
+        rouge["ROUGE-%d" % n] = collections.OrderedDict([
+            ("recall", r), ("precision", p), ("f", f)
+        ])
+
+    return rouge
+
+
+def _runIsolatedTarget(queue, func, args):
+    baseline = _peakRSS()
+    try:
+        result = func(*args)
+    except MemoryError:
+        result = {"error": "MemoryError"}
+    except Exception as e:
+        logger.exception("Benchmark run failed")
+        result = {"error": repr(e)}
+
+    result["baseline_rss_kb"] = baseline
+    result["peak_rss_kb"] = _peakRSS()
+
+    queue.put(result)
+
+
+def runIsolated(func, *args):
+    """
+    Run a function in a separate process
+
+    :returns: result of the function, along with baseline and peak resident
+              set size of the process
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_runIsolatedTarget,
+                                      args=(queue, func, args))
+    process.start()
+
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except Queue.Empty:
+            if not process.is_alive() and queue.empty():
+                result = {"error": "exit code %d" % process.exitcode,
+                          "peak_rss_kb": None}
+                break
+
+    process.join()
+
+    return result
+
+
+def runBenchmarks(methods, sizes, maxSentences={}, methodArgs=[],
+                  corpusOptions={}, seed=0, variants=[]):
+    """
+    Run benchmarks for all methods and corpus sizes
+
+    :param methods: Names of summarizers to benchmark
+    :param sizes: Numbers of sentences in the synthetic corpora
+    :param maxSentences: ``dict`` from method to largest corpus size to run
+    :param methodArgs: Summarizer arguments as accepted by ``sum.py``
+    :param corpusOptions: Options for
+                          :class:`clstk.benchmark.syntheticCorpus.SyntheticCorpus`
+    :param seed: Seed for corpus generation
+    :param variants: list of pairs of name and further summarizer arguments.
+                     Each method is run once for each variant on the same
+                     corpora. Defaults to a single run
+    :returns: ``dict`` containing settings and a list of runs
+    """
+    variants = variants or [(None, [])]
+
+    runs = []
+    workDir = tempfile.mkdtemp(prefix="clstk-benchmark-")
+
+    try:
+        for size in sizes:
+            corpusDir = os.path.join(workDir, str(size))
+            docsDir, references = SyntheticCorpus(
+                sentences=size, seed=seed, **corpusOptions
+            ).write(corpusDir)
+
+            for method in methods:
+                if size > maxSentences.get(method, float('inf')):
+                    continue
+
+                for variant, variantArgs in variants:
+                    logger.info("Benchmarking %s with %d sentences",
+                                getRunName(method, variant), size)
+
+                    params = getMethodParams(method,
+                                             methodArgs + variantArgs)
+                    result = runIsolated(benchmarkMethod,
+                                         method, docsDir, references, params)
+
+                    run = collections.OrderedDict([
+                        ("method", method),
+                        ("variant", variant),
+                        ("sentences", size),
+                    ])
+                    run.update(result)
+                    runs.append(run)
+
+                    logger.info("Finished in %.3fs, peak RSS %s KB",
+                                result.get("total", float('nan')),
+                                result["peak_rss_kb"])
+    finally:
+        shutil.rmtree(workDir)
+
+    return collections.OrderedDict([
+        ("python", platform.python_version()),
+        ("platform", platform.platform()),
+        ("settings", collections.OrderedDict([
+            ("methods", methods),
+            ("sizes", sizes),
+            ("method_args", methodArgs),
+            ("variants", variants),
+            ("corpus", corpusOptions),
+            ("seed", seed),
+        ])),
+        ("runs", runs),
+        ("curves", getScalingCurves(runs)),
+    ])
+
+
+def getRunName(method, variant=None):
+    """
+    Get name of a method, with the variant it ran with if any
+    """
+    return "%s[%s]" % (method, variant) if variant else method
+
+
+def getScalingCurves(runs):
+    """
+    Collect total time, stage times and peak memory against corpus size for
+    each method
+    """
+    curves = collections.OrderedDict()
+
+    for run in runs:
+        if "error" in run:
+            continue
+
+        name = getRunName(run["method"], run.get("variant"))
+        curve = curves.setdefault(name, collections.OrderedDict([
+            ("sentences", []),
+            ("total", []),
+            ("peak_rss_kb", []),
+            ("stages", collections.OrderedDict()),
+        ]))
+
+        curve["sentences"].append(run["sentences"])
+        curve["total"].append(run["total"])
+        curve["peak_rss_kb"].append(run["peak_rss_kb"])
+        for stage, t in run["stages"].items():
+            curve["stages"].setdefault(stage, []).append(t)
+
+    return curves
+
+
+def compareResults(baseline, results):
+    """
+    Compare stage times and peak memory of two benchmark results
+
+    :returns: list of lines describing ratios of new over baseline values
+    """
+    def key(run):
+        return run["method"], run.get("variant"), run["sentences"]
+
+    baselineRuns = dict((key(run), run) for run in baseline["runs"])
+
+    lines = []
+    for run in results["runs"]:
+        old = baselineRuns.get(key(run))
+        if not old or "error" in old or "error" in run:
+            continue
+
+        ratios = ["%s %.2fx" % (stage, t / old["stages"][stage])
+                  for stage, t in run["stages"].items()
+                  if old["stages"].get(stage)]
+        ratios.append("peak RSS %.2fx" % (float(run["peak_rss_kb"]) /
+                                          old["peak_rss_kb"]))
+
+        lines.append("%s N=%d: %s" % (
+            getRunName(run["method"], run.get("variant")), run["sentences"],
+            ", ".join(ratios)))
+
+    return lines
+
+
+def writeResults(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,106 @@
+"""
+Startup benchmark for the command line tools.
+
+Each command is run in a fresh interpreter a few times and the fastest wall
+clock time is compared against a budget. Heavy modules which got imported
+while running the command are reported, as they are the usual cause of a
+slow startup.
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+import collections
+
+COMMANDS = [
+    ['sum.py', '--help'],
+    ['sum.py', 'coRank', '--help'],
+    ['sum.py', 'linBilmes', '--help'],
+    ['evaluate.py', '--help'],
+    ['evaluate.py', 'coRank', '--help'],
+]
+
+HEAVY_MODULES = ['sklearn', 'scipy', 'nltk', 'polyglot', 'tqe',
+                 'google.cloud', 'requests']
+
+# Runs a script as __main__ and prints heavy modules loaded by it
+_LOADED_MODULES_SCRIPT = """
+import os, sys, json, runpy
+script, heavy = sys.argv[1], json.loads(sys.argv[2])
+sys.argv = [script] + sys.argv[3:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+stdout = sys.stdout
+sys.stdout = open(os.devnull, 'w')
+try:
+    runpy.run_path(script, run_name='__main__')
+except SystemExit:
+    pass
+sys.stdout = stdout
+print(json.dumps([m for m in heavy if m in sys.modules]))
+"""
+
+
+def _run(args, cwd):
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        subprocess.call([sys.executable] + args, cwd=cwd,
+                        stdout=devnull, stderr=devnull)
+        return time.time() - start
+
+
+def measureStartup(command, scriptsDir, repeat=3):
+    """
+    Measure wall clock time of a command
+
+    :param command: Script and its arguments
+    :param scriptsDir: Directory containing the scripts
+    :param repeat: Number of runs
+    :returns: fastest time in seconds
+    """
+    return min(_run(command, scriptsDir) for _ in xrange(repeat))
+
+
+def getLoadedHeavyModules(command, scriptsDir):
+    """
+    Get heavy modules imported while running a command
+
+    :param command: Script and its arguments
+    :param scriptsDir: Directory containing the scripts
+    :returns: list of module names from :data:`HEAVY_MODULES`
+    """
+    with open(os.devnull, 'w') as devnull:
+        output = subprocess.check_output(
+            [sys.executable, '-c', _LOADED_MODULES_SCRIPT,
+             command[0], json.dumps(HEAVY_MODULES)] + command[1:],
+            cwd=scriptsDir, stderr=devnull
+        )
+
+    return json.loads(output.strip().split("\n")[-1])
+
+
+def runStartupBenchmark(scriptsDir, budget, commands=COMMANDS, repeat=3):
+    """
+    Run startup benchmark for all commands
+
+    :param scriptsDir: Directory containing ``sum.py`` and ``evaluate.py``
+    :param budget: Allowed startup time in seconds
+    :param commands: Commands to run, each a list of script and arguments
+    :param repeat: Number of runs for each command
+    :returns: list of results, one for each command
+    """
+    results = []
+
+    for command in commands:
+        seconds = measureStartup(command, scriptsDir, repeat)
+
+        results.append(collections.OrderedDict([
+            ("command", " ".join(command)),
+            ("seconds", seconds),
+            ("budget", budget),
+            ("within_budget", seconds <= budget),
+            ("heavy_modules", getLoadedHeavyModules(command, scriptsDir)),
+        ]))
+
+    return results
@@ -0,0 +1,181 @@
+"""
+Synthetic multi-document corpora for benchmarks.
+
+Words are drawn from a Zipf distribution over a generated vocabulary, with a
+small set of topic words boosted so that sentences differ in salience.
+A fraction of the sentences are duplicates or near-duplicates of earlier
+sentences, as in multi-source news clusters.
+"""
+
+import os
+
+import numpy as np
+
+from ..utils import fs
+
+_SYLLABLES = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+
+
+def _makeWord(index):
+    syllables = []
+    index += len(_SYLLABLES)
+    while index:
+        index, syllable = divmod(index, len(_SYLLABLES))
+        syllables.append(_SYLLABLES[syllable])
+
+    return "".join(syllables)
+
+
+class SyntheticCorpus(object):
+    """
+    Generator for a synthetic document set with reference summaries
+    """
+
+    def __init__(self, documents=10, sentences=1000, vocabulary=5000,
+                 duplication=0.1, topicWords=50, sentenceLength=(8, 30),
+                 seed=None):
+        """
+        :param documents: Number of documents
+        :param sentences: Total number of sentences across all documents
+        :param vocabulary: Number of distinct words
+        :param duplication: Fraction of sentences which repeat an earlier
+                            sentence, half of them with one word changed
+        :param topicWords: Number of words with boosted probability
+        :param sentenceLength: Range of number of words in a sentence
+        :param seed: Seed for the random number generator
+        """
+        self._documents = documents
+        self._sentences = sentences
+        self._duplication = duplication
+        self._sentenceLength = sentenceLength
+
+        self._random = np.random.RandomState(seed)
+
+        self._words = map(_makeWord, xrange(vocabulary))
+
+        probabilities = 1. / np.arange(1, vocabulary + 1) ** 1.1
+        topic = self._random.choice(vocabulary, topicWords, replace=False)
+        probabilities[topic] *= 20
+        self._probabilities = probabilities / probabilities.sum()
+
+        self._topicWords = set(topic)
+
+    def _generateSentence(self):
+        length = self._random.randint(self._sentenceLength[0],
+                                      self._sentenceLength[1] + 1)
+        return list(self._random.choice(len(self._words), length,
+                                        p=self._probabilities))
+
+    def generateSentences(self):
+        """
+        Generate sentences as lists of word ids
+
+        :returns: list of sentences
+        """
+        sentences = []
+
+        for i in xrange(self._sentences):
+            if sentences and self._random.rand() < self._duplication:
+                sentence = list(sentences[self._random.randint(len(sentences))])
+
+                if self._random.rand() < 0.5:
+                    sentence[self._random.randint(len(sentence))] = \
+                        self._random.choice(len(self._words),
+                                            p=self._probabilities)
+            else:
+                sentence = self._generateSentence()
+
+            sentences.append(sentence)
+
+        return sentences
+
+    def _sentenceText(self, sentence):
+        text = " ".join(self._words[w] for w in sentence)
+        return text[0].upper() + text[1:] + "."
+
+    def _salience(self, sentence):
+        return sum(1 for w in sentence if w in self._topicWords) \
+            / float(len(sentence))
+
+    def generateReferences(self, sentences, references=4, size=100):
+        """
+        Generate reference summaries by sampling salient sentences
+
+        :param sentences: Sentences from :meth:`generateSentences`
+        :param references: Number of reference summaries
+        :param size: Number of words in each reference summary
+        :returns: list of references, each a list of sentence texts
+        """
+        salience = np.array(map(self._salience, sentences)) + 1e-3
+        probabilities = salience / salience.sum()
+
+        summaries = []
+        for _ in xrange(references):
+            order = self._random.choice(len(sentences), len(sentences),
+                                        replace=False, p=probabilities)
+
+            summary = []
+            words = 0
+            for i in order:
+                if words >= size:
+                    break
+                summary.append(self._sentenceText(sentences[i]))
+                words += len(sentences[i])
+
+            summaries.append(summary)
+
+        return summaries
+
+    def generateDocuments(self, sentences):
+        """
+        Distribute sentences over documents
+
+        :param sentences: Sentences from :meth:`generateSentences`
+        :returns: list of document texts
+        """
+        documents = []
+
+        for d in xrange(self._documents):
+            documentSentences = sentences[d::self._documents]
+
+            paragraphs = [
+                " ".join(map(self._sentenceText, documentSentences[i:i + 5]))
+                for i in xrange(0, len(documentSentences), 5)
+            ]
+
+            documents.append("\n".join(paragraphs))
+
+        return documents
+
+    def write(self, dirname, references=4, referenceSize=100):
+        """
+        Write documents and reference summaries to a directory
+
+        Documents are written to ``docs`` and references to ``models``
+        inside ``dirname``.
+
+        :param dirname: Directory to write the corpus to
+        :param references: Number of reference summaries
+        :param referenceSize: Number of words in each reference summary
+        :returns: pair of documents directory and list of reference
+                  summaries, each a list of sentences
+        """
+        docsDir = os.path.join(dirname, "docs")
+        modelsDir = os.path.join(dirname, "models")
+        fs.ensureDir(docsDir)
+        fs.ensureDir(modelsDir)
+
+        sentences = self.generateSentences()
+
+        for d, document in enumerate(self.generateDocuments(sentences)):
+            with open(os.path.join(docsDir, "doc%03d" % d), "w") as f:
+                f.write(document)
+
+        summaries = self.generateReferences(sentences, references,
+                                            referenceSize)
+
+        for r, summary in enumerate(summaries):
+            with open(os.path.join(modelsDir, "model%d" % r), "w") as f:
+                f.write("\n".join(summary))
+
+        return docsDir, summaries
@@ -1,157 +1,268 @@
 from corpus import Corpus
-from summary import Summary
+from corpus import readDocuments
+from summary import fillSummaries
+from utils import budget
+from utils import profiling
+from utils import rank
+from utils import similarity
+from utils import vectorizer
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn import preprocessing
 
 import logging
 logger = logging.getLogger("coRank.py")
 
 
-def _row_normalize(M):
-    return preprocessing.normalize(M, axis=1, norm='l1')
+def normalize(M):
+    return M / np.sum(M, axis=0)
 
 
-def normalize(M):
-    return M / np.sum(M)
+def _geometricMean(A, B):
+    if isinstance(A, np.ndarray):
+        return np.sqrt(A * B)
 
+    return A.multiply(B).sqrt()
 
-def summarize(inDir, params):
-    logger.info("Loading documents from %s", inDir)
-    c = Corpus(inDir).load(
+
+def loadCorpus(inDir, params, documents=None):
+    if documents is None:
+        logger.info("Loading documents from %s", inDir)
+
+    return Corpus(inDir).load(
             params,
             translate=True,
             simplify=(params['simplify'] is not None),
-            replaceWithSimplified=(params['simplify'] == 'early')
+            replaceWithSimplified=(params['simplify'] == 'early'),
+            documents=documents
         )
 
-    logger.info("Setting up summarizer")
-    M_en = cosine_similarity(
-        c.getSentenceVectors()
-    )
-    np.fill_diagonal(M_en, 0)
-
-    M_cn = cosine_similarity(
-        c.getTranslationSentenceVectors()
-    )
-    np.fill_diagonal(M_cn, 0)
-
-    M_encn = np.sqrt(M_en * M_cn)
 
-    M_en = _row_normalize(M_en)
-    M_cn = _row_normalize(M_cn)
-    M_encn = _row_normalize(M_encn)
+def summarizeCorpus(c, params, state=None):
+    """
+    Summarize a loaded corpus
 
-    alpha = params['alpha']
-
-    logger.info("Iteratively computing sentence saliency")
-    u = normalize(np.random.random((M_cn.shape[0],)))
-    v = normalize(np.random.random((M_en.shape[0],)))
-    for i in xrange(params['max_iter']):
-        u_prev = u
-        v_prev = v
+    :param c: :class:`clstk.corpus.Corpus`
+    :param params: params from :func:`getParams`
+    :param state: ``dict`` kept between calls to warm start after sentences
+                  are added with :meth:`clstk.corpus.Corpus.addDocuments`.
+                  Transition matrices and saliency scores are stored in it
+    :returns: list of :class:`clstk.summary.Summary`, for each alpha value
+              one for each budget in ``params['size']``. The ranking is
+              shared by all budgets
+    """
+    logger.info("Setting up summarizer")
+    S_en = c.getSentenceSimilarities()
+    S_cn = c.getTranslationSentenceSimilarities()
+    N = S_en.shape[0]
+
+    # Matrices are reused only while similarities of existing sentences are
+    # unchanged, e.g. not after an update with online IDF
+    generation = c.getSimilarityGeneration()
+    previous = rank.getPreviousState(state, N, similarities=generation)
+    if previous:
+        logger.info("Warm start from %d sentences", previous['size'])
+
+    # Blocks are sparse if similarities are, and matrices are then kept
+    # sparse, or memory-mapped along with memory-mapped similarities
+    blocks = {
+        'en': lambda rows, cols: similarity.getSubmatrix(S_en, rows, cols),
+        'cn': lambda rows, cols: similarity.getSubmatrix(S_cn, rows, cols),
+        'encn': lambda rows, cols: _geometricMean(
+            similarity.getSubmatrix(S_en, rows, cols),
+            similarity.getSubmatrix(S_cn, rows, cols)
+        ),
+    }
+    memmapDir = params.get('similarity', {}).get('memmapDir')
+
+    matrices = {}
+    for name, getBlock in blocks.items():
+        matrices[name] = rank.extendRowNormalized(
+            previous.get('matrices', {}).get(name), getBlock, N,
+            memmapDir=memmapDir
+        )
 
-        u = alpha * np.dot(M_cn.T, u) + (1 - alpha) * np.dot(M_encn.T, v)
-        v = alpha * np.dot(M_en.T, v) + (1 - alpha) * np.dot(M_encn.T, u)
+    M_en = matrices['en'][0]
+    M_cn = matrices['cn'][0]
+    M_encn = matrices['encn'][0]
 
-        u = normalize(u)
-        v = normalize(v)
+    profiling.recordSize('rankMatrices', [M_en, M_cn, M_encn])
 
-        if np.all(np.isclose(u_prev, u)) and np.all(np.isclose(v_prev, v)):
-            # Converged
-            break
+    # Scores for all alpha values are iterated together, one column for
+    # each, so that each step is a matrix-matrix product
+    alphas = np.asarray(params['alpha'], dtype=np.float64).reshape(-1)
+    K = len(alphas)
+    weights = alphas.astype(M_cn.dtype)
+    otherWeights = (1 - alphas).astype(M_cn.dtype)
 
-    logger.info("Optimization completed in %d iterations" % (i + 1))
+    logger.info("Iteratively computing sentence saliency")
+    with profiling.stage('optimize'):
+        if previous:
+            U = rank.padScores(previous['scores'][0], N)
+            V = rank.padScores(previous['scores'][1], N)
+            if U.shape[1] != K:
+                U, V = U[:, :1], V[:, :1]
+        else:
+            U = normalize(np.random.random((M_cn.shape[0], 1)))
+            V = normalize(np.random.random((M_en.shape[0], 1)))
+
+        # Scores in the precision of the matrices, so that they are not
+        # upcast in products
+        U = np.tile(U.astype(M_cn.dtype), (1, K // U.shape[1]))
+        V = np.tile(V.astype(M_en.dtype), (1, K // V.shape[1]))
+
+        # Columns which converged are not iterated further
+        active = np.arange(K)
+        iterations = np.zeros(K, dtype=int)
+
+        for i in xrange(params['max_iter']):
+            u_prev = U[:, active]
+            v_prev = V[:, active]
+            alpha = weights[active]
+            beta = otherWeights[active]
+
+            u = alpha * M_cn.T.dot(u_prev) + beta * M_encn.T.dot(v_prev)
+            v = alpha * M_en.T.dot(v_prev) + beta * M_encn.T.dot(u)
+
+            u = normalize(u)
+            v = normalize(v)
+
+            U[:, active] = u
+            V[:, active] = v
+            iterations[active] = i + 1
+
+            converged = np.all(np.isclose(u_prev, u), axis=0) & \
+                np.all(np.isclose(v_prev, v), axis=0)
+            active = active[~converged]
+
+            if not len(active):
+                break
+
+    if state is not None:
+        state.update({
+            'size': N,
+            'similarities': generation,
+            'matrices': matrices,
+            'scores': (U, V),
+            'iterations': iterations.max(),
+        })
+
+    logger.info("Optimization completed in %d iterations%s",
+                iterations.max(), " (warm start)" if previous else "")
+    profiling.count('iterations', iterations.max())
 
     # summary = optimizer.greedy(params["size"], objective, c)
     logger.info("Computing final sentence scores including redundancy penalty")
-    sentence_scores = u.copy()
-    sentence_order = []
-    for i in xrange(len(sentence_scores)):
-        best_sentence = np.argmax(sentence_scores)
-        sentence_order.append(best_sentence)
+    with profiling.stage('selection'):
+        sentence_orders = rank.getRedundancyOrders(
+            U, lambda cols: similarity.getBlock(M_cn, slice(None), cols)
+        )
+
+    logger.info("Generating final summaries")
+    with profiling.stage('fill'):
+        summaries = sum(map(lambda order: fillSummaries(c.getSentences(),
+                                                        order,
+                                                        params['size']),
+                            sentence_orders.T), [])
 
-        sentence_scores -= M_cn[:, best_sentence] * u[best_sentence]
-        sentence_scores[best_sentence] = float('-inf')
+    return summaries
 
-    logger.info("Generating final summary")
 
-    sizeBudget, countTokens = params['size']
-    sizeName = "tokens" if countTokens else "chars"
+def summarizeDocuments(documents, params):
+    """
+    Summarize documents held in memory
 
-    def sentenceSize(sent):
-        return sent.tokenCount() if countTokens else sent.charCount()
+    :param documents: list or other iterable, e.g. a generator, of
+                      documents as unicode strings
+    :param params: params from :func:`getParams`
+    :returns: list of :class:`clstk.summary.Summary`, for each target
+              language one for each budget
+    """
+    corpus = loadCorpus(None, params, documents)
 
-    def summarySize(summary):
-        return summary.tokenCount() if countTokens else summary.charCount()
+    return sum(map(lambda c: summarizeCorpus(c, params),
+                   corpus.getTargetCorpora()), [])
 
-    logger.info("Summary budget: %d %s", sizeBudget, sizeName)
 
-    summary = Summary()
-    sentences = c.getSentences()
+def summarize(inDir, params):
+    """
+    Summarize documents in a directory, see :func:`summarizeDocuments`
+    """
+    logger.info("Loading documents from %s", inDir)
 
-    for sentence_id in sentence_order:
-        if summarySize(summary) >= sizeBudget:
-            break
+    return summarizeDocuments(readDocuments(inDir), params)
 
-        sentence_size = sentenceSize(sentences[sentence_id])
 
-        if summarySize(summary) + sentence_size <= sizeBudget:
-            logger.info("Sentence added with size: %d, ", sentence_size)
-            summary.addSentence(sentences[sentence_id])
+# Params used by loadCorpus, these are shared by all parameter settings when
+# a loaded corpus is reused
+CORPUS_PARAMS = ['sourceLang', 'targetLang', 'simplify', 'dedup',
+                 'vectorizer', 'precision', 'similarity']
 
-    logger.info("Optimization done, summary size: %d chars, %d tokens",
-                summary.charCount(), summary.tokenCount())
 
-    return summary
+def getParams(args):
+    return {
+        'size': budget.getBudgetParams(args),
+        'sourceLang': args.source_lang,
+        'targetLang': args.target_lang or [args.source_lang],
+        'alpha': args.alpha,
+        'max_iter': args.max_iter,
+        'simplify': (args.simplify
+                     if args.simplify in ['early', 'late'] else None),
+        'dedup': args.dedup,
+        'vectorizer': vectorizer.getVectorizerParams(args),
+        'precision': args.precision,
+        'similarity': similarity.getSimilarityParams(args),
+    }
 
 
 def setupArgparse(parser):
     def run(args, silent=False):
-        params = {
-            'size': (args.size, args.words),
-            'sourceLang': args.source_lang,
-            'targetLang': args.target_lang or args.source_lang,
-            'alpha': args.alpha,
-            'max_iter': args.max_iter,
-            'simplify': (args.simplify
-                         if args.simplify in ['early', 'late'] else None),
-        }
-
-        summary = summarize(args.source_directory, params)
+        summaries = summarize(args.source_directory, getParams(args))
 
         if not silent:
-            logging.info("Printing source summary\n" +
-                         summary.getSummary().encode('utf-8'))
+            for summary in summaries:
+                logging.info("Printing source summary\n" +
+                             summary.getSummary().encode('utf-8'))
 
-            logging.info("Printing target summary")
-            print summary.getTargetSummary().encode('utf-8')
+                logging.info("Printing target summary")
+                print summary.getTargetSummary().encode('utf-8')
 
-        return summary
+        return summaries
 
-    parser.add_argument('-s', '--size', type=int, default=665, metavar="N",
-                        help='Maximum size of the summary')
-    parser.add_argument('-w', '--words', action="store_true",
-                        help='Caluated size as number of words instead of '
-                        'characters')
+    budget.addBudgetParams(parser)
     parser.add_argument('--source-lang', type=str, default='en',
                         metavar="lang", help='Two-letter language code of '
                         'the source documents language. Defaults to `en`')
-    parser.add_argument('-l', '--target-lang', type=str, default=None,
-                        metavar="lang", help='Two-letter language code to '
-                        'generate cross-lingual summary. '
+    parser.add_argument('-l', '--target-lang', type=str, nargs='+',
+                        default=None, metavar="lang",
+                        help='Two-letter language code to generate '
+                        'cross-lingual summary. Several languages generate '
+                        'a summary in each of them. '
                         'Defaults to source language.')
 
-    parser.add_argument('--alpha', type=float, default=.5,
+    parser.add_argument('--alpha', type=float, nargs='+', default=[.5],
                         help='Relative contributions to the final saliency '
                         'scores from the information in the same language and '
-                        'the information in the other language')
+                        'the information in the other language. Several '
+                        'values generate a summary for each of them, their '
+                        'scores are computed together')
     parser.add_argument('--max-iter', type=int, default=1000,
                         help='Maximum iterations for the iterative algorithm')
 
     parser.add_argument('--simplify', type=str, default='never',
                         choices=['early', 'never'],
                         help='When to simplify sentences and then summarize.')
+    parser.add_argument('--dedup', type=float, default=None,
+                        metavar="threshold",
+                        help='Collapse near-duplicate sentences with Jaccard '
+                        'similarity of word shingles above this threshold, '
+                        'e.g. 0.8')
+
+    vectorizer.addVectorizerParams(parser)
+    parser.add_argument('--precision', type=str, default='float64',
+                        choices=['float64', 'float32'],
+                        help='Floating point precision of sentence vectors, '
+                        'similarities and ranking matrices. float32 halves '
+                        'their memory')
+    similarity.addSimilarityParams(parser)
 
     parser.set_defaults(func=run)
@@ -1,9 +1,14 @@
 import os
+import copy
+from multiprocessing.pool import ThreadPool
 
 from sentence import Sentence
 from sentenceCollection import SentenceCollection
+from translate import getTranslator
 
 from utils import nlp
+from utils import dedup
+from utils import profiling
 
 import logging
 logger = logging.getLogger("corpus.py")
@@ -13,11 +18,13 @@ class Corpus(SentenceCollection):
     """
     Class for source documents. Contains utilities for loading document set.
     """
-    def __init__(self, dirname):
+    def __init__(self, dirname=None):
         """
         Initialize the class
 
-        :param dirname: Directory from where source documents are to be loaded
+        :param dirname: Directory from where source documents are to be
+                        loaded. Not needed if documents are passed to
+                        :meth:`load`, see :func:`readDocuments`
         """
         super(Corpus, self).__init__()
 
@@ -25,7 +32,15 @@ class Corpus(SentenceCollection):
 
         self._prepareSentenceSplitter()
 
-        self._documents = []
+        self._sentenceTexts = set()
+        self._loadOptions = None
+
+        self._dedupIndex = None
+        self._representatives = {}
+
+        self._targetLangs = []
+        self._targetTranslations = {}
+        self._targetCorpora = None
 
     def _prepareSentenceSplitter(self):
         self._sentenceSplitter = lambda doc: sum(
@@ -33,38 +48,138 @@ class Corpus(SentenceCollection):
             []
         )
 
+    def _splitDocuments(self, documents):
+        # Documents are split as they are read, and are not kept
+        sentences = []
+
+        for document in documents:
+            with profiling.stage('split'):
+                sentences.extend(self._sentenceSplitter(document))
+
+        with profiling.stage('split'):
+            sentences = set(map(lambda s: s.strip(), sentences))
+
+        # Only sentences not seen before
+        sentences = sentences - self._sentenceTexts
+        self._sentenceTexts.update(sentences)
+
+        if self._dedupIndex is None:
+            return map(Sentence, sentences)
+
+        return self._collapseNearDuplicates(sentences)
+
+    def _collapseNearDuplicates(self, sentences):
+        with profiling.stage('dedup'):
+            texts, support = self._dedupIndex.add(sentences)
+
+        newSentences = map(Sentence, texts)
+        self._representatives.update(
+            (sent.getText(), sent) for sent in newSentences)
+
+        for text, count in support.iteritems():
+            sent = self._representatives[text]
+            sent.setExtra('support', sent.getExtra('support', 0) + count)
+
+        removed = len(sentences) - len(texts)
+        profiling.count('nearDuplicates', removed)
+        logger.info("Collapsed near duplicates: %d sentences to %d (%.1f%% "
+                    "fewer)", len(sentences), len(texts),
+                    100. * removed / len(sentences) if sentences else 0)
+
+        return newSentences
+
+    def _startTranslations(self, sentences, sourceLang, langs, translator):
+        # Translate to each language on its own thread, translators wait on
+        # the network. Languages same as the source keep the current
+        # translations, as for a single target
+        if not langs:
+            return {}
+
+        texts = map(Sentence.getText, sentences)
+        current = map(Sentence.getTranslation, sentences)
+        translate = getTranslator(translator)
+
+        def translateTo(lang):
+            if lang == sourceLang:
+                return current
+
+            translation, _ = translate("\n".join(texts), sourceLang, lang)
+            return translation.split("\n")
+
+        pool = ThreadPool(len(langs))
+        results = dict((lang, pool.apply_async(translateTo, (lang,)))
+                       for lang in langs)
+        pool.close()
+
+        return results
+
+    def _finishTranslations(self, results):
+        with profiling.stage('translate'):
+            for lang, result in results.items():
+                self._targetTranslations.setdefault(lang, []).extend(
+                    result.get())
+
     def load(self, params, translate=False, replaceWithTranslation=False,
-             simplify=False, replaceWithSimplified=False):
+             simplify=False, replaceWithSimplified=False, documents=None):
         """
         Load source docuement set
 
         :param params: ``dict`` containing different params including
-                       ``sourceLang`` and ``targetLang``.
+                       ``sourceLang`` and ``targetLang``, a language code or
+                       a list of them. Optionally ``translator`` selects the
+                       translator, see :func:`clstk.translate.getTranslator`.
         :param translate: Whether to translate sentences to target language
         :param replaceWithTranslation: Whether to replace source sentences
                                        with translation
         :param simplify: Whether to simplify sentences
         :param replaceWithSimplified: Whether to replace source sentences with
                                       simplified sentences
+        :param documents: list or other iterable, e.g. a generator, of
+                          documents as unicode strings, to use instead of
+                          reading files from the directory
+
+        If ``dedup`` in ``params`` is set, near-duplicate sentences with
+        Jaccard similarity of word shingles above it are collapsed into one
+        representative sentence. Number of sentences it represents is set as
+        an extra value with key ``support``.
+
+        Options in ``vectorizer`` in ``params`` select how sentence vectors
+        are generated, see :func:`clstk.utils.vectorizer.getVectorizer`, and
+        ``precision`` their floating point precision, see
+        :meth:`setPrecision`. Options in ``similarity`` select how
+        similarities are computed and stored, see
+        :func:`clstk.utils.similarity.cosineSimilarities`.
+
+        With several target languages, this corpus is for the first one.
+        Sentences are translated to the others concurrently, see
+        :meth:`getTargetCorpora`.
+
+        .. seealso:: :class:`clstk.utils.dedup.NearDuplicateIndex`
         """
+        self._targetLangs = _getLangs(params['targetLang'])
+
         self.setSourceLang(params['sourceLang'])
-        self.setTargetLang(params['targetLang'])
+        self.setTargetLang(self._targetLangs[0])
 
-        # load corpus
-        files = map(lambda f: os.path.join(self._dirname, f),
-                    os.walk(self._dirname).next()[2])
+        if params.get('dedup') is not None:
+            self._dedupIndex = dedup.NearDuplicateIndex(params['dedup'])
 
-        sentences = []
+        self.setVectorizerOptions(**params.get('vectorizer', {}))
+        self.setPrecision(params.get('precision', 'float64'))
+        self.setSimilarityOptions(**params.get('similarity', {}))
 
-        for filename in files:
-            with open(filename) as f:
-                document = f.read().decode('utf-8')
+        self._loadOptions = (params, {
+            'translate': translate,
+            'replaceWithTranslation': replaceWithTranslation,
+            'simplify': simplify,
+            'replaceWithSimplified': replaceWithSimplified,
+        })
 
-                self._documents.append(document)
-                sentences.extend(self._sentenceSplitter(document))
+        # load corpus
+        if documents is None:
+            documents = readDocuments(self._dirname)
 
-        sentences = map(lambda s: s.strip(), sentences)
-        self.addSentences(map(Sentence, set(sentences)))
+        self.addSentences(self._splitDocuments(documents))
 
         if simplify:
             logger.info("Simplifying sentences")
@@ -72,11 +187,20 @@ class Corpus(SentenceCollection):
                           replaceOriginal=replaceWithSimplified)
 
         if translate:
+            translator = params.get('translator', 'google')
+            others = self._startTranslations(self._sentences,
+                                             self.sourceLang,
+                                             self._targetLangs[1:],
+                                             translator)
+
             if self.sourceLang != self.targetLang:
                 logger.info("Translating sentences")
                 self.translate(self.sourceLang,
                                self.targetLang,
-                               replaceOriginal=replaceWithTranslation)
+                               replaceOriginal=replaceWithTranslation,
+                               translator=translator)
+
+            self._finishTranslations(others)
 
             if replaceWithTranslation:
                 self.setSourceLang(self.targetLang)
@@ -86,3 +210,142 @@ class Corpus(SentenceCollection):
         self.generateSentenceVectors()
 
         return self
+
+    def addDocuments(self, documents, idf='fixed'):
+        """
+        Add documents to a loaded document set
+
+        Only sentences not seen before are simplified and translated, with
+        the same options as used for :meth:`load`. Sentence vectors are
+        generated for the new sentences and cached similarities are extended,
+        without recomputing them for existing sentences. With near-duplicate
+        collapsing, near duplicates of existing sentences only add to their
+        support.
+
+        With several target languages, new sentences are translated to all
+        of them, and corpora of the other languages are created again by
+        :meth:`getTargetCorpora`.
+
+        :param documents: list of documents as unicode strings
+        :param idf: ``fixed`` to keep IDF weights computed on load, or
+                    ``online`` to update them with the new sentences
+        :returns: list of sentences added
+
+        .. seealso::
+            :meth:`addSentenceVectors`
+        """
+        if self._loadOptions is None:
+            raise RuntimeError("Documents can only be added after loading")
+
+        params, options = self._loadOptions
+        replaceWithTranslation = options['replaceWithTranslation']
+
+        sentences = self._splitDocuments(documents)
+        if not sentences:
+            return sentences
+
+        logger.info("Adding %d sentences", len(sentences))
+        self.addSentences(sentences)
+
+        if options['simplify']:
+            self.simplify(params['sourceLang'],
+                          replaceOriginal=options['replaceWithSimplified'],
+                          sentences=sentences)
+
+        if options['translate']:
+            translator = params.get('translator', 'google')
+            others = self._startTranslations(sentences,
+                                             params['sourceLang'],
+                                             self._targetLangs[1:],
+                                             translator)
+
+            if params['sourceLang'] != self.targetLang:
+                self.translate(params['sourceLang'],
+                               self.targetLang,
+                               replaceOriginal=replaceWithTranslation,
+                               translator=translator,
+                               sentences=sentences)
+
+            self._finishTranslations(others)
+
+            self.addTranslationSentenceVectors(sentences, idf)
+
+        self.addSentenceVectors(sentences, idf)
+
+        self._targetCorpora = None
+
+        return sentences
+
+    def _getTargetCorpus(self, lang):
+        _, options = self._loadOptions
+
+        corpus = copy.copy(self)
+        corpus._sentences = map(Sentence.copy, self._sentences)
+        corpus._vectorizers = dict(self._vectorizers)
+        corpus._similarities = dict(self._similarities)
+        corpus._targetLangs = [lang]
+        corpus._targetTranslations = {}
+        corpus._targetCorpora = None
+
+        corpus.setTargetLang(lang)
+
+        translations = self._targetTranslations.get(lang)
+        if translations is not None:
+            map(Sentence.setTranslation, corpus._sentences, translations)
+
+            if options['replaceWithTranslation']:
+                map(Sentence.setText, corpus._sentences, translations)
+                corpus.setSourceLang(lang)
+                corpus.generateSentenceVectors()
+
+            corpus.generateTranslationSentenceVectors()
+
+        return corpus
+
+    def getTargetCorpora(self):
+        """
+        Get a corpus for each target language
+
+        The first one is this corpus. Corpora of the other languages share
+        its sentence vectors and similarities, and only have their own
+        translations, translation vectors and similarities. If sentences
+        were replaced with translations, sentence vectors are generated for
+        each language too.
+
+        :returns: list of :class:`Corpus`, in order of target languages
+        """
+        if self._targetCorpora is None:
+            if len(self._targetLangs) > 1 and \
+                    not self._loadOptions[1]['replaceWithTranslation']:
+                # Computed once, before they are shared
+                self.getSentenceSimilarities()
+
+            self._targetCorpora = [self] + map(self._getTargetCorpus,
+                                               self._targetLangs[1:])
+
+        return self._targetCorpora[:]
+
+
+def readDocuments(dirname):
+    """
+    Read documents from files in a directory
+
+    Subdirectories are not read.
+
+    :param dirname: Directory containing the documents
+    :returns: generator of documents as unicode strings, each read when
+              it is needed
+    """
+    for filename in os.walk(dirname).next()[2]:
+        with profiling.stage('read'):
+            with open(os.path.join(dirname, filename)) as f:
+                document = f.read().decode('utf-8')
+
+        yield document
+
+
+def _getLangs(langs):
+    if isinstance(langs, basestring):
+        return [langs]
+
+    return list(langs)
@@ -8,8 +8,29 @@ https://github.com/nisargjhaveri/ROUGE-1.5.5-unicode
 """
 
 import os
+import re
 import subprocess
 import tempfile
+import collections
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from .rougeScore import bootstrap_confidence
+
+_AVERAGE_LINE = re.compile(r'^\S+ (ROUGE-\S+) Average_([RPF]): ([\d.]+) '
+                           r'\(\d+%-conf\.int\. ([\d.]+) - ([\d.]+)\)')
+_EVAL_LINE = re.compile(r'^\S+ (ROUGE-\S+) Eval (\S+) '
+                        r'R:([\d.]+) P:([\d.]+) F:([\d.]+)')
+
+_MEASURES = {'R': 'recall', 'P': 'precision', 'F': 'f'}
+
+
+def _evalOrder(evalId):
+    # ROUGE sorts evaluations by ID as strings, with -z SPL the IDs follow
+    # the line numbers of the config file
+    number = re.match(r'^\d+', evalId)
+    return (int(number.group()) if number else float('inf'), evalId)
 
 
 class ExternalRougeScore(object):
@@ -17,24 +38,165 @@ class ExternalRougeScore(object):
     Integration with external ROUGE tool-kit.
     """
 
+    def __init__(self, length_limit=None, byte_limit=None, shards=1,
+                 processes=None, resamples=1000, seed=None):
+        """
+        :param length_limit: Only use the first N words (``-l``)
+        :param byte_limit: Only use the first N bytes (``-b``)
+        :param shards: Split summaries in these many shards, each evaluated
+                       by a separate ROUGE process
+        :param processes: Number of ROUGE processes to run concurrently.
+                          Defaults to number of shards.
+        :param resamples: Number of bootstrap resamples for confidence
+                          intervals of merged shards
+        :param seed: Seed for bootstrap resampling of merged shards
+        """
+        self._length_limit = length_limit
+        self._byte_limit = byte_limit
+        self._shards = shards
+        self._processes = processes or shards
+        self._resamples = resamples
+        self._seed = seed
+
+    def _getOptions(self):
+        options = "-n 2 -m -x -d -z SPL".split()  # -f B
+
+        if self._length_limit is not None:
+            options += ["-l", str(self._length_limit)]
+        if self._byte_limit is not None:
+            options += ["-b", str(self._byte_limit)]
+
+        return options
+
     def runRougeExternal(self, configFileName):
+        """
+        Run ``ROUGE-1.5.5.pl`` on a config file
+
+        :param configFileName: Path of the config file, a line of summary
+                               and reference paths for each evaluation
+        :returns: Output of ROUGE
+        :raises RuntimeError: if ROUGE exits with non-zero status
+        """
         rougeHome = os.getenv("ROUGE_HOME", ".")
         rougeExecutable = os.path.join(rougeHome, "ROUGE-1.5.5.pl")
 
         command = ([rougeExecutable] +
-                   "-n 2 -m -x -z SPL".split() +  # -f B
+                   self._getOptions() +
                    [configFileName])
 
-        rougeOutput = subprocess.Popen(command)
-        rougeOutput.communicate()
+        rougeProcess = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE)
+        rougeOutput, rougeErrors = rougeProcess.communicate()
 
-    def rouge(self, summaryRefsList):
+        if rougeProcess.returncode != 0:
+            raise RuntimeError("%s exited with status %d: %s" % (
+                rougeExecutable, rougeProcess.returncode,
+                rougeErrors.strip()
+            ))
+
+        return rougeOutput
+
+    def parseOutput(self, rougeOutput):
         """
-        Runs external ROUGE-1.5.5 and prints results
+        Parse averages, confidence intervals and per-evaluation scores from
+        ROUGE output
 
-        :param summaryRefsList: List containing pairs of path to summary and
-                                list of paths to reference summaries
+        :param rougeOutput: Output of ``ROUGE-1.5.5.pl``
+        :returns: ``OrderedDict`` from rouge type to averages, confidence
+                  intervals and per-topic scores in the order of evaluation,
+                  in the same structure as returned by
+                  :meth:`clstk.evaluation.rougeScore.RougeScore.rouge`
         """
+        results = collections.OrderedDict()
+        evals = collections.defaultdict(dict)
+
+        def _result(rougeType):
+            return results.setdefault(rougeType, collections.OrderedDict([
+                ("average", collections.OrderedDict()),
+                ("conf_int_low", collections.OrderedDict()),
+                ("conf_int_high", collections.OrderedDict()),
+                ("topics", []),
+            ]))
+
+        for line in rougeOutput.splitlines():
+            match = _EVAL_LINE.match(line)
+            if match:
+                rougeType, evalId, recall, precision, f = match.groups()
+                _result(rougeType)
+                evals[rougeType][evalId] = collections.OrderedDict([
+                    ("f", float(f)),
+                    ("precision", float(precision)),
+                    ("recall", float(recall)),
+                ])
+                continue
+
+            match = _AVERAGE_LINE.match(line)
+            if not match:
+                continue
+
+            rougeType, measure, average, low, high = match.groups()
+            measure = _MEASURES[measure]
+
+            result = _result(rougeType)
+            result["average"][measure] = float(average)
+            result["conf_int_low"][measure] = float(low)
+            result["conf_int_high"][measure] = float(high)
+
+        for rougeType, typeEvals in evals.items():
+            results[rougeType]["topics"] = [
+                typeEvals[evalId]
+                for evalId in sorted(typeEvals.keys(), key=_evalOrder)
+            ]
+
+        return results
+
+    def _mergeResults(self, shardResults):
+        # Averages are means of per-evaluation scores ROUGE printed rounded to
+        # five decimals, so they may differ from those of a single run in the
+        # last decimal. Confidence intervals are estimated again by our own
+        # bootstrap, and do not reproduce those ROUGE would report.
+        merged = collections.OrderedDict()
+
+        for rougeType in shardResults[0].keys():
+            topics = sum(map(lambda r: r[rougeType]["topics"],
+                             shardResults), [])
+            scores = np.array(map(lambda t: t.values(), topics))
+            measures = topics[0].keys()
+
+            low, high = bootstrap_confidence(scores,
+                                             resamples=self._resamples,
+                                             seed=self._seed)
+
+            merged[rougeType] = collections.OrderedDict([
+                ("average", collections.OrderedDict(
+                    zip(measures, map(float, scores.mean(axis=0))))),
+                ("conf_int_low", collections.OrderedDict(
+                    zip(measures, map(float, low)))),
+                ("conf_int_high", collections.OrderedDict(
+                    zip(measures, map(float, high)))),
+                ("topics", topics),
+            ])
+
+        return merged
+
+    def _formatReport(self, results):
+        lines = []
+        for rougeType, result in results.items():
+            lines.append("-" * 45)
+            for short in "RPF":
+                measure = _MEASURES[short]
+                lines.append(
+                    "1 %s Average_%s: %.5f (95%%-conf.int. %.5f - %.5f)" % (
+                        rougeType, short, result["average"][measure],
+                        result["conf_int_low"][measure],
+                        result["conf_int_high"][measure]
+                    )
+                )
+            lines.append("." * 45)
+
+        return "\n".join(lines)
+
+    def _rougeShard(self, summaryRefsList):
         configFile = tempfile.NamedTemporaryFile(mode='w', suffix=".lst",
                                                  delete=False)
 
@@ -44,6 +206,55 @@ class ExternalRougeScore(object):
 
         configFile.close()
 
-        self.runRougeExternal(configFile.name)
+        rougeOutput = self.runRougeExternal(configFile.name)
 
         os.unlink(configFile.name)
+
+        return rougeOutput
+
+    def rouge(self, summaryRefsList, silent=False):
+        """
+        Runs external ROUGE-1.5.5, prints and returns results
+
+        With more than one shard, the summaries are split into contiguous
+        shards evaluated by concurrent ROUGE processes. Per-topic scores from
+        all shards are merged and averaged as a single run would do, from
+        scores rounded to five decimals as printed by ROUGE, so averages may
+        differ from a single run in the last decimal. Confidence intervals
+        are re-estimated from the merged scores by our own bootstrap
+        resampling, with ``resamples`` and ``seed``, and are not the
+        intervals ROUGE would report for a single run.
+
+        :param summaryRefsList: List containing pairs of path to summary and
+                                list of paths to reference summaries
+        :param silent: Do not print ROUGE output
+        :returns: Parsed results, see :meth:`parseOutput`
+        """
+        summaryRefsList = list(summaryRefsList)
+        shards = max(1, min(self._shards, len(summaryRefsList)))
+
+        if shards == 1:
+            rougeOutput = self._rougeShard(summaryRefsList)
+            results = self.parseOutput(rougeOutput)
+            report = "\n".join(line for line in rougeOutput.splitlines()
+                               if not _EVAL_LINE.match(line))
+        else:
+            shardSize = int(np.ceil(len(summaryRefsList) / float(shards)))
+            shardLists = [summaryRefsList[i:i + shardSize]
+                          for i in xrange(0, len(summaryRefsList), shardSize)]
+
+            pool = ThreadPool(min(self._processes, len(shardLists)))
+            try:
+                rougeOutputs = pool.map(self._rougeShard, shardLists)
+            finally:
+                pool.close()
+                pool.join()
+
+            results = self._mergeResults(map(self.parseOutput,
+                                             rougeOutputs))
+            report = self._formatReport(results)
+
+        if not silent:
+            print report
+
+        return results
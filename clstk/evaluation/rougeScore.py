@@ -13,21 +13,50 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import collections
+import functools
+import itertools
+import json
+import multiprocessing
 import six
 
 import numpy as np
 import regex
 
+DEFAULT_ROUGE_TYPES = ("1", "2")
+
 
 class RougeScore(object):
     """
     Implementation of ROUGE score.
+
+    With ``compat=True`` the scores follow ROUGE-1.5.5 as run with
+    ``-n 2 -m -x -z SPL``: only tokens longer than three characters are
+    stemmed, counts are pooled across models (``-f A``) and, with more than
+    one model, scores are averaged over the leave-one-out model sets
+    (jackknifing). ``length_limit`` and ``byte_limit`` correspond to the
+    ``-l`` and ``-b`` options. The WordNet exception list used by ROUGE's
+    morphological stemmer is not replicated, so scores may differ slightly
+    for irregular word forms.
     """
 
-    def __init__(self, tokenizer=None, stemmer=None):
+    def __init__(self, tokenizer=None, stemmer=None, compat=False,
+                 length_limit=None, byte_limit=None):
         self._tokenize = tokenizer if tokenizer else self.dummy_tokenizer
         self._stemmer = stemmer if stemmer else self.dummy_stemmer
 
+        self._compat = compat
+        self._length_limit = length_limit
+        self._byte_limit = byte_limit
+
+        if compat and stemmer:
+            self._stemmer = self._compat_stemmer(stemmer)
+
+    def _compat_stemmer(self, stemmer):
+        def _stem(token):
+            return stemmer(token) if len(token) > 3 else token
+
+        return _stem
+
     def dummy_tokenizer(self, sentence):
         sentence = regex.sub(r'-', ' - ', sentence)
         sentence = regex.sub(r'[^\w]', ' ', sentence)
@@ -44,6 +73,43 @@ class RougeScore(object):
     def dummy_stemmer(self, token):
         return token
 
+    def _truncate(self, sentences):
+        """
+        Truncates sentences to the word (-l) or byte (-b) limit
+
+        Bytes are counted in the UTF-8 encoding, as ROUGE-1.5.5 reads files
+        as bytes. A character split by the limit is dropped.
+        """
+        if self._length_limit is None and self._byte_limit is None:
+            return sentences
+
+        truncated = []
+        words_left = self._length_limit
+        bytes_left = self._byte_limit
+
+        for sentence in sentences:
+            sentence = sentence.strip()
+
+            if words_left is not None:
+                words = sentence.split()[:words_left]
+                words_left -= len(words)
+                sentence = " ".join(words)
+
+            if bytes_left is not None:
+                encoded = sentence.encode('utf-8')[:bytes_left]
+                sentence = encoded.decode('utf-8', 'ignore')
+                # Account for the separating space between sentences
+                bytes_left -= len(encoded) + 1
+
+            if sentence:
+                truncated.append(sentence)
+
+            if words_left == 0 or (bytes_left is not None and
+                                   bytes_left <= 0):
+                break
+
+        return truncated
+
     def _get_ngrams(self, n, text):
         """Calcualtes n-grams.
         Args:
@@ -81,6 +147,56 @@ class RougeScore(object):
             result += min(v, counter2[k])
         return result
 
+    def _f_p_r_counts(self, model_counts, weight=None):
+        """
+        Computes (f1, precision, recall) from per-model counts, pooling the
+        counts across models as ROUGE-1.5.5 does with ``-f A``.
+        Args:
+            model_counts: List of (hit, model_count, summary_count) tuples
+            weight: For ROUGE-W, the weight of the weighting function. The
+                    inverse of the weighting function is applied to precision
+                    and recall.
+        """
+        overlap_count, model_count, summary_count = map(sum,
+                                                        zip(*model_counts))
+
+        # Handle edge case.
+        # This isn't mathematically correct, but it's good enough
+        precision = 0.0 if summary_count == 0 \
+            else overlap_count / summary_count
+
+        recall = 0.0 if model_count == 0 else overlap_count / model_count
+
+        if weight is not None:
+            precision = precision ** (1 / weight)
+            recall = recall ** (1 / weight)
+
+        if self._compat:
+            f1_score = 0.0 if precision + recall == 0 \
+                else 2.0 * precision * recall / (precision + recall)
+        else:
+            f1_score = 2.0 * ((precision * recall) /
+                              (precision + recall + 1e-8))
+
+        return f1_score, precision, recall
+
+    def _score_models(self, model_counts, f_p_r=None):
+        """
+        Combines per-model counts into a single (f1, precision, recall),
+        jackknifing over the models in compatibility mode.
+        """
+        f_p_r = f_p_r or self._f_p_r_counts
+
+        if not self._compat or len(model_counts) <= 1:
+            return f_p_r(model_counts)
+
+        jackknife_scores = [
+            f_p_r(model_counts[:i] + model_counts[i + 1:])
+            for i in range(len(model_counts))
+        ]
+
+        return tuple(map(np.mean, zip(*jackknife_scores)))
+
     def rouge_n(self, summary, model_summaries, n=2):
         """
         Computes ROUGE-N of two text collections of sentences.
@@ -104,28 +220,185 @@ class RougeScore(object):
 
         summary_ngrams = self._get_word_ngrams(n, summary)
 
-        summary_count = 0
-        model_count = 0
-        overlap_count = 0
-
+        model_counts = []
         for model in model_summaries:
             model_ngrams = self._get_word_ngrams(n, model)
-            model_count += len(model_ngrams)
-            summary_count += len(summary_ngrams)
 
             # Gets the overlapping ngrams between evaluated and reference
-            overlap_count += self._count_overlap(summary_ngrams, model_ngrams)
+            model_counts.append((
+                self._count_overlap(summary_ngrams, model_ngrams),
+                len(model_ngrams),
+                len(summary_ngrams)
+            ))
 
-        # Handle edge case.
-        # This isn't mathematically correct, but it's good enough
-        precision = 0.0 if summary_count == 0 \
-            else overlap_count / summary_count
+        return self._score_models(model_counts)
 
-        recall = 0.0 if model_count == 0 else overlap_count / model_count
+    def _get_word_ids(self, summary, model_summaries):
+        """
+        Maps words of the summary and the models to integer ids sharing a
+        single vocabulary.
+        Returns:
+            A tuple (summary ids, list of model ids, vocabulary size)
+        """
+        vocab = collections.defaultdict(functools.partial(next,
+                                                          itertools.count()))
 
-        f1_score = 2.0 * ((precision * recall) / (precision + recall + 1e-8))
+        def _ids(sentences):
+            words = self._split_into_words(sentences)
+            return np.array([vocab[w] for w in words], dtype=np.int64)
 
-        return f1_score, precision, recall
+        summary_ids = _ids(summary)
+        model_ids = map(_ids, model_summaries)
+
+        return summary_ids, model_ids, len(vocab)
+
+    def _get_skip_bigrams(self, ids, vocab_size, skip=None, unigrams=False):
+        """
+        Counts skip-bigrams of a sequence of word ids.
+
+        Each skip-bigram (a, b) is encoded as the integer a * V + b, one
+        vectorized slice per gap, so no pair tuples are ever built. Unigrams
+        are encoded above V * V.
+        Args:
+            ids: Array of word ids
+            vocab_size: Size of the vocabulary, V
+            skip: Maximum number of words allowed between the two words of a
+                  skip-bigram, ``None`` for no limit
+            unigrams: Also count unigrams, for ROUGE-SU
+        Returns:
+            A tuple (sorted unique keys, counts)
+        """
+        max_offset = len(ids) - 1
+        if skip is not None:
+            max_offset = min(skip + 1, max_offset)
+
+        keys = [ids[:-offset] * vocab_size + ids[offset:]
+                for offset in range(1, max_offset + 1)]
+
+        if unigrams:
+            keys.append(ids + vocab_size * vocab_size)
+
+        if not keys:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        return np.unique(np.concatenate(keys), return_counts=True)
+
+    def _count_key_overlap(self, counted_keys1, counted_keys2):
+        keys1, counts1 = counted_keys1
+        keys2, counts2 = counted_keys2
+
+        _, indices1, indices2 = np.intersect1d(keys1, keys2,
+                                               assume_unique=True,
+                                               return_indices=True)
+
+        return int(np.minimum(counts1[indices1], counts2[indices2]).sum())
+
+    def rouge_s(self, summary, model_summaries, skip=4, unigrams=False):
+        """
+        Computes ROUGE-S (or ROUGE-SU with unigrams) of two text collections
+        of sentences.
+        Args:
+            summary: The sentences that have been picked by the
+                     summarizer
+            model_summaries: List of reference summaries, each containing
+                             list of sentences
+            skip: Maximum skip distance, ``None`` for no limit.
+                  Defaults to 4.
+            unigrams: Also count unigrams, i.e. compute ROUGE-SU
+        Returns:
+            A tuple (f1, precision, recall) for ROUGE-S
+        Raises:
+            ValueError: raises exception if a param has len <= 0
+        """
+        if len(summary) <= 0 or len(model_summaries) <= 0:
+            raise ValueError("Collections must contain at least 1 sentence.")
+
+        summary_ids, model_ids, vocab_size = self._get_word_ids(
+            summary, model_summaries)
+
+        summary_bigrams = self._get_skip_bigrams(summary_ids, vocab_size,
+                                                 skip, unigrams)
+        summary_count = summary_bigrams[1].sum()
+
+        model_counts = []
+        for ids in model_ids:
+            model_bigrams = self._get_skip_bigrams(ids, vocab_size,
+                                                   skip, unigrams)
+
+            model_counts.append((
+                self._count_key_overlap(summary_bigrams, model_bigrams),
+                model_bigrams[1].sum(),
+                summary_count
+            ))
+
+        return self._score_models(model_counts)
+
+    def _wlcs(self, x, y, weight):
+        """
+        Computes the weighted longest common subsequence of integer
+        sequences x and y with weighting function f(k) = k ** weight.
+
+        The table is filled one row at a time. Within a row, cells without a
+        match take the running maximum since the last match, which is
+        computed for the whole row with a single cumulative maximum.
+        """
+        n = len(y)
+        if len(x) == 0 or n == 0:
+            return 0.0
+
+        c = np.zeros(n + 1)
+        w = np.zeros(n + 1, dtype=np.int64)
+        match = np.zeros(n + 1, dtype=bool)
+
+        for token in x:
+            match[1:] = (y == token)
+
+            k = np.zeros(n + 1, dtype=np.int64)
+            k[1:] = w[:-1]
+
+            values = c.copy()
+            values[1:][match[1:]] = (
+                c[:-1] + (k[1:] + 1) ** weight - k[1:] ** weight
+            )[match[1:]]
+
+            offset = np.cumsum(match) * (values.max() + 1)
+            c = np.maximum.accumulate(values + offset) - offset
+            w = np.where(match, k + 1, 0)
+
+        return c[n]
+
+    def rouge_w(self, summary, model_summaries, weight=1.2):
+        """
+        Computes ROUGE-W of two text collections of sentences.
+        Args:
+            summary: The sentences that have been picked by the
+                     summarizer
+            model_summaries: List of reference summaries, each containing
+                             list of sentences
+            weight: Weight of the weighting function f(k) = k ** weight.
+                    Defaults to 1.2.
+        Returns:
+            A tuple (f1, precision, recall) for ROUGE-W
+        Raises:
+            ValueError: raises exception if a param has len <= 0
+        """
+        if len(summary) <= 0 or len(model_summaries) <= 0:
+            raise ValueError("Collections must contain at least 1 sentence.")
+
+        summary_ids, model_ids, _ = self._get_word_ids(summary,
+                                                       model_summaries)
+
+        model_counts = [
+            (self._wlcs(ids, summary_ids, weight),
+             len(ids) ** weight,
+             len(summary_ids) ** weight)
+            for ids in model_ids
+        ]
+
+        return self._score_models(
+            model_counts,
+            functools.partial(self._f_p_r_counts, weight=weight)
+        )
 
     def _len_lcs(self, x, y):
         """
@@ -326,53 +599,215 @@ class RougeScore(object):
                 evaluated_sentences, ref_s)
         return self._f_p_r_lcs(union_lcs_sum_across_all_references, m, n)
 
-    def _print_result(self, rouge_type, rouge_all, print_all=False):
-        rouge_f, rouge_p, rouge_r = map(np.mean, zip(*rouge_all))
+    def _read_lines(self, path):
+        with open(path) as f:
+            return map(lambda x: x.decode('utf-8'), list(f))
+
+    def _get_scorer(self, rouge_type):
+        """
+        Returns normalized name and scoring function for a rouge type such as
+        ``2``, ``S4``, ``SU4``, ``S*`` or ``W-1.2``
+        """
+        match = regex.match(r'^(?:(\d+)|(SU?)(\d+|\*)|W(?:-([\d.]+))?)$',
+                            rouge_type)
+        if not match:
+            raise ValueError("Unknown rouge type: %s" % rouge_type)
+
+        n, skip_type, skip, weight = match.groups()
+
+        if n:
+            return n, functools.partial(self.rouge_n, n=int(n))
+        elif skip_type:
+            return skip_type + skip, functools.partial(
+                self.rouge_s,
+                skip=None if skip == "*" else int(skip),
+                unigrams=(skip_type == "SU")
+            )
+        else:
+            weight = weight or "1.2"
+            return "W-" + weight, functools.partial(self.rouge_w,
+                                                    weight=float(weight))
+
+    def score_pair(self, hyp_refs_pair, rouge_types=DEFAULT_ROUGE_TYPES):
+        """
+        Computes ROUGE scores for a single hypothesis against its references
+
+        :param hyp_refs_pair: Pair of path to summary and list of paths to
+                              reference summaries
+        :param rouge_types: List of rouge types to compute, e.g. ``1``, ``2``,
+                            ``SU4`` or ``W-1.2``
+        :returns: ``OrderedDict`` from rouge type to (f1, precision, recall)
+
+        Summaries are truncated to ``length_limit`` and ``byte_limit`` here,
+        once. The scoring methods, e.g. :meth:`rouge_n`, take sentences as
+        they are.
+        """
+        hyp_path, ref_paths = hyp_refs_pair
+
+        hyp = self._truncate(self._read_lines(hyp_path))
+        refs = map(self._truncate, map(self._read_lines, ref_paths))
+
+        scores = collections.OrderedDict()
+        for rouge_type in rouge_types:
+            name, scorer = self._get_scorer(rouge_type)
+            scores[name] = scorer(hyp, refs)
+
+        return scores
+
+    def _score_all(self, hyp_refs_pairs, rouge_types, processes=None):
+        if processes == 1 or len(hyp_refs_pairs) <= 1:
+            return map(lambda p: self.score_pair(p, rouge_types),
+                       hyp_refs_pairs)
+
+        pool = multiprocessing.Pool(processes, _init_worker, (self,))
+        try:
+            return pool.map(_score_worker,
+                            [(p, rouge_types) for p in hyp_refs_pairs],
+                            chunksize=4)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _summarize_result(self, hyp_refs_pairs, rouge_all, resamples,
+                          confidence, seed):
+        # Columns are in the order (f1, precision, recall)
+        rouge_all = np.array(rouge_all, dtype=float)
+
+        average = rouge_all.mean(axis=0)
+        low, high = bootstrap_confidence(rouge_all, resamples=resamples,
+                                         confidence=confidence, seed=seed)
+
+        def measures(values):
+            return collections.OrderedDict(zip(_MEASURES, map(float, values)))
+
+        return collections.OrderedDict([
+            ("average", measures(average)),
+            ("conf_int_low", measures(low)),
+            ("conf_int_high", measures(high)),
+            ("topics", [
+                collections.OrderedDict(
+                    [("summary", hyp_path)] + measures(rouge).items()
+                )
+                for (hyp_path, _), rouge in zip(hyp_refs_pairs, rouge_all)
+            ]),
+        ])
+
+    def _print_result(self, rouge_type, result, confidence, print_all=False):
+        average = result["average"]
+        low = result["conf_int_low"]
+        high = result["conf_int_high"]
 
         print("ROUGE-%s Average  R:%0.5f  P:%0.5f  F:%0.5f"
-              % (rouge_type, rouge_r, rouge_p, rouge_f))
+              % (rouge_type, average["recall"], average["precision"],
+                 average["f"]))
+        print("ROUGE-%s %d%%-conf.int.  R:%0.5f-%0.5f  P:%0.5f-%0.5f  "
+              "F:%0.5f-%0.5f"
+              % (rouge_type, round(confidence * 100),
+                 low["recall"], high["recall"],
+                 low["precision"], high["precision"],
+                 low["f"], high["f"]))
 
         if print_all:
             print("---------------------------------")
-            for i, rouge in enumerate(rouge_all):
-                rouge_f, rouge_p, rouge_r = rouge
+            for i, rouge in enumerate(result["topics"]):
                 print("ROUGE-%s Eval %d  R:%0.5f  P:%0.5f  F:%0.5f"
-                      % (rouge_type, i, rouge_r, rouge_p, rouge_f))
+                      % (rouge_type, i,
+                         rouge["recall"], rouge["precision"], rouge["f"]))
             print("---------------------------------")
 
-    def rouge(self, hyp_refs_pairs, print_all=False):
+    def rouge(self, hyp_refs_pairs, print_all=False, processes=None,
+              resamples=1000, confidence=0.95, seed=None, json_path=None,
+              silent=False, rouge_types=DEFAULT_ROUGE_TYPES):
         """
-        Calculates and prints average rouge scores for a list of hypotheses
-        and references
+        Calculates average rouge scores along with bootstrap confidence
+        intervals for a list of hypotheses and references
+
+        Per-topic scores are computed in a process pool.
 
         :param hyp_refs_pairs: List containing pairs of path to summary and
                                list of paths to reference summaries
         :param print_all: Print every evaluation along with averages
+        :param processes: Number of worker processes. Defaults to number of
+                          CPUs. Use ``1`` to score in the current process.
+        :param resamples: Number of bootstrap resamples for confidence
+                          intervals
+        :param confidence: Confidence level of the intervals
+        :param seed: Seed for bootstrap resampling
+        :param json_path: If given, results are also written as JSON to this
+                          path
+        :param silent: Do not print results
+        :param rouge_types: List of rouge types to compute. Supports ROUGE-N
+                            (``1``, ``2``, ...), skip-bigrams with
+                            maximum skip distance (``S4``, ``SU4``, ``S*``)
+                            and ``W`` with optional weight (``W-1.2``)
+
+        :returns: ``OrderedDict`` from rouge type (e.g. ``ROUGE-1``) to
+                  averages, confidence intervals and per-topic scores
         """
+        hyp_refs_pairs = list(hyp_refs_pairs)
+
+        # Validate rouge types before starting the workers
+        map(self._get_scorer, rouge_types)
+
+        topic_scores = self._score_all(hyp_refs_pairs, rouge_types,
+                                       processes)
+
+        results = collections.OrderedDict()
+        for rouge_type in (topic_scores[0].keys() if topic_scores else []):
+            results["ROUGE-" + rouge_type] = self._summarize_result(
+                hyp_refs_pairs,
+                map(lambda s: s[rouge_type], topic_scores),
+                resamples, confidence, seed
+            )
+
+            if not silent:
+                self._print_result(rouge_type,
+                                   results["ROUGE-" + rouge_type],
+                                   confidence, print_all)
+
+        if json_path:
+            with open(json_path, "w") as json_file:
+                json.dump(results, json_file, indent=2)
+
+        return results
+
 
-        rouge_1_all = []
-        rouge_2_all = []
+_MEASURES = ("f", "precision", "recall")
 
-        for hyp_refs_pair in hyp_refs_pairs:
-            hyp_path, ref_paths = hyp_refs_pair
+_worker_scorer = None
 
-            with open(hyp_path) as hyp_file:
-                hyp = map(lambda x: x.decode('utf-8'), list(hyp_file))
 
-            refs = []
-            for ref_path in ref_paths:
-                with open(ref_path) as ref_file:
-                    refs.append(map(lambda x: x.decode('utf-8'),
-                                    list(ref_file)))
+def _init_worker(scorer):
+    global _worker_scorer
+    _worker_scorer = scorer
 
-            rouge_1_all.append(self.rouge_n(hyp, refs, 1))
 
-            rouge_2_all.append(self.rouge_n(hyp, refs, 2))
+def _score_worker(args):
+    hyp_refs_pair, rouge_types = args
+    return _worker_scorer.score_pair(hyp_refs_pair, rouge_types)
+
+
+def bootstrap_confidence(scores, resamples=1000, confidence=0.95, seed=None):
+    """
+    Computes bootstrap confidence intervals for the mean of per-topic scores.
+
+    All resamples are drawn at once and averaged with a single vectorized
+    operation over the score array.
+
+    :param scores: Array of shape (topics, measures)
+    :param resamples: Number of bootstrap resamples
+    :param confidence: Confidence level of the intervals
+    :param seed: Seed for the random number generator
+
+    :returns: pair of arrays containing lower and upper bounds per measure
+    """
+    scores = np.asarray(scores, dtype=float)
+
+    rng = np.random.RandomState(seed)
+    samples = rng.randint(0, len(scores), size=(resamples, len(scores)))
+    means = scores[samples].mean(axis=1)
 
-            # rouge_l = [
-            #     self.rouge_l_sentence_level(hyp, ref) for ref in refs
-            # ]
-            # rouge_l_all.append(map(np.mean, zip(*rouge_l)))
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(means, [tail, 100 - tail], axis=0)
 
-        self._print_result("1", rouge_1_all, print_all)
-        self._print_result("2", rouge_2_all, print_all)
+    return low, high
@@ -1,5 +1,13 @@
+import numpy as np
+
 from corpus import Corpus
+from corpus import readDocuments
 from summary import Summary
+from utils import budget
+from utils import profiling
+from utils import rank
+from utils import similarity
+from utils import vectorizer
 
 import objectives
 from objectives import AggregateObjective
@@ -8,111 +16,297 @@ import logging
 logger = logging.getLogger("linBilmes.py")
 
 
-def optimizeGreedy(sizeBudget, objective, corpus):
-    summary = Summary()
-    sentencesLeft = corpus.getSentences()
+def pruneCandidates(corpus, top=None, mass=None, centrality='degree'):
+    """
+    Select candidate sentences for the optimizer by centrality
+
+    Sentences are ranked by centrality in the similarity graph, weighted by
+    their support. The most central ``top`` sentences are kept, or as many as
+    needed to reach ``mass`` fraction of the total centrality, whichever is
+    fewer.
+
+    :param corpus: :class:`clstk.corpus.Corpus`
+    :param top: Number of sentences to keep
+    :param mass: Fraction of total centrality to keep, between 0 and 1
+    :param centrality: Centrality method, see
+                       :func:`clstk.utils.rank.getCentrality`
+    :returns: list of candidate sentences in corpus order
+    """
+    sentences = corpus.getSentences()
+    if top is None and mass is None:
+        return sentences
+
+    with profiling.stage('prune'):
+        scores = rank.getCentrality(
+            corpus.getSentenceSimilarities(), centrality,
+            weights=map(lambda s: s.getExtra('support', 1), sentences)
+        )
+
+        order = np.argsort(-scores, kind='mergesort')
+        keep = len(sentences)
+
+        if top is not None:
+            keep = min(keep, top)
+
+        if mass is not None and scores.sum() > 0:
+            cumulative = np.cumsum(scores[order]) / scores.sum()
+            keep = min(keep, int(np.searchsorted(cumulative, mass)) + 1)
+
+        candidates = [sentences[i] for i in sorted(order[:keep])]
+
+    logger.info("Pruned candidates: %d of %d sentences", len(candidates),
+                len(sentences))
+    profiling.count('prunedCandidates', len(sentences) - len(candidates))
+
+    return candidates
 
-    objective.setCorpus(corpus)
 
-    sizeBudget, countTokens = sizeBudget
-    sizeName = "tokens" if countTokens else "chars"
+def optimizeGreedy(sizeBudgets, objective, corpus, prepareObjective=True,
+                   candidates=None):
+    """
+    Greedily add sentences with the highest objective value to a summary for
+    each budget
 
-    def sentenceSize(sent):
+    Each budget keeps its own summary and sentences that still fit. Objective
+    values only depend on the summary, so they are computed once for all
+    budgets with the same summary, e.g. for all budgets until a sentence does
+    not fit in the smaller ones, and are reused while a summary does not
+    change.
+
+    :param sizeBudgets: list of pairs of size budget and whether it counts
+                        tokens
+    :param objective: objective to maximize
+    :param corpus: :class:`clstk.corpus.Corpus`
+    :param prepareObjective: Whether to set the corpus on the objective
+    :param candidates: Sentences to choose from, defaults to all sentences.
+                       Objectives are still computed over the whole corpus
+    :returns: list of :class:`clstk.summary.Summary`, one for each budget
+    """
+    sentences = list(candidates if candidates is not None
+                     else corpus.getSentences())
+
+    if prepareObjective:
+        with profiling.stage('objectives'):
+            objective.setCorpus(corpus)
+
+    def sentenceSize(i, countTokens):
+        sent = sentences[i]
         return sent.tokenCount() if countTokens else sent.charCount()
 
-    def summarySize(summary):
-        return summary.tokenCount() if countTokens else summary.charCount()
+    budgets = []
+    for sizeBudget, countTokens in sizeBudgets:
+        logger.info("Summary budget: %d %s", sizeBudget,
+                    "tokens" if countTokens else "chars")
+        budgets.append({
+            'size': sizeBudget,
+            'countTokens': countTokens,
+            'summary': Summary(),
+            'selected': (),
+            'left': range(len(sentences)),
+        })
+
+    # Objective values of sentences for each distinct summary, keyed by
+    # the selected sentences
+    values = {}
 
     logger.info("Greedily optimizing the objective")
-    logger.info("Summary budget: %d %s", sizeBudget, sizeName)
-    while summarySize(summary) < sizeBudget and len(sentencesLeft) > 0:
-        objectiveValues = map(objective.getObjective(summary),
-                              sentencesLeft)
-        maxObjectiveValue = max(objectiveValues)
+    with profiling.stage('optimize'):
+        while True:
+            active = filter(
+                lambda b: b['left'] and
+                b['summary'].getSize(b['countTokens']) < b['size'],
+                budgets
+            )
+            if not active:
+                break
 
-        candidates = [sentencesLeft[i]
-                      for i, v in enumerate(objectiveValues)
-                      if v == maxObjectiveValue]
+            values = dict((b['selected'], values.get(b['selected'], {}))
+                          for b in active)
 
-        candidateSizes = map(sentenceSize, candidates)
-        minSize = min(candidateSizes)
+            for key, known in values.items():
+                sharing = filter(lambda b: b['selected'] == key, active)
+                missing = sorted(set().union(*map(lambda b: b['left'],
+                                                  sharing)) - set(known))
+                if not missing:
+                    continue
 
-        selectedCandidate = candidates[candidateSizes.index(minSize)]
-        sentencesLeft.remove(selectedCandidate)
+                getObjective = objective.getObjective(sharing[0]['summary'])
+                for i in missing:
+                    known[i] = getObjective(sentences[i])
+                profiling.count('objectiveEvaluations', len(missing))
 
-        if summarySize(summary) + minSize <= sizeBudget:
-            logger.info("Sentence added with objective value: %f, " +
-                        "size: %d", maxObjectiveValue, minSize)
-            summary.addSentence(selectedCandidate)
+            for b in active:
+                _greedyStep(b, values[b['selected']], sentences, sentenceSize)
 
-        budgetLeft = sizeBudget - summarySize(summary)
-        sentencesLeft = filter(lambda s: sentenceSize(s) < budgetLeft,
-                               sentencesLeft)
+    summaries = map(lambda b: b['summary'], budgets)
 
-    logger.info("Optimization done, summary size: %d chars, %d tokens",
-                summary.charCount(), summary.tokenCount())
+    for summary in summaries:
+        logger.info("Optimization done, summary size: %d chars, %d tokens",
+                    summary.charCount(), summary.tokenCount())
 
-    return summary
+    return summaries
 
 
-def summarize(inDir, params):
-    logger.info("Loading documents from %s", inDir)
-    c = Corpus(inDir).load(
+def _greedyStep(state, values, sentences, sentenceSize):
+    # Take the best sentence left, the shortest one on ties, and add it if
+    # it fits the budget
+    left, countTokens = state['left'], state['countTokens']
+
+    objectiveValues = map(lambda i: values[i], left)
+    maxObjectiveValue = max(objectiveValues)
+
+    candidates = [left[i] for i, v in enumerate(objectiveValues)
+                  if v == maxObjectiveValue]
+
+    candidateSizes = map(lambda i: sentenceSize(i, countTokens), candidates)
+    minSize = min(candidateSizes)
+
+    selectedCandidate = candidates[candidateSizes.index(minSize)]
+    left.remove(selectedCandidate)
+
+    summary = state['summary']
+    if summary.getSize(countTokens) + minSize <= state['size']:
+        logger.info("Sentence added with objective value: %f, " +
+                    "size: %d", maxObjectiveValue, minSize)
+        summary.addSentence(sentences[selectedCandidate])
+        state['selected'] += (selectedCandidate,)
+
+    budgetLeft = state['size'] - summary.getSize(countTokens)
+    state['left'] = filter(lambda i: sentenceSize(i, countTokens) <
+                           budgetLeft, left)
+
+
+def loadCorpus(inDir, params, documents=None):
+    if documents is None:
+        logger.info("Loading documents from %s", inDir)
+
+    return Corpus(inDir).load(
             params,
             translate=True,
             replaceWithTranslation=params['earlyTranslate'],
             simplify=(params['simplify'] is not None),
             replaceWithSimplified=(params['simplify'] == 'early'),
+            documents=documents
         )
 
+
+def summarizeCorpus(c, params):
     logger.info("Setting up summarizer")
     objective = AggregateObjective(params['objectives'])
 
-    summary = optimizeGreedy(params["size"], objective, c)
+    candidates = pruneCandidates(c, **params['prune'])
 
-    return summary
+    return optimizeGreedy(params["size"], objective, c,
+                          candidates=candidates)
+
+
+def summarizeDocuments(documents, params):
+    """
+    Summarize documents held in memory
+
+    :param documents: list or other iterable, e.g. a generator, of
+                      documents as unicode strings
+    :param params: params from :func:`getParams`
+    :returns: list of :class:`clstk.summary.Summary`, for each target
+              language one for each budget
+    """
+    corpus = loadCorpus(None, params, documents)
+
+    return sum(map(lambda c: summarizeCorpus(c, params),
+                   corpus.getTargetCorpora()), [])
+
+
+def summarize(inDir, params):
+    """
+    Summarize documents in a directory, see :func:`summarizeDocuments`
+    """
+    logger.info("Loading documents from %s", inDir)
+
+    return summarizeDocuments(readDocuments(inDir), params)
+
+
+# Params used by loadCorpus, these are shared by all parameter settings when
+# a loaded corpus is reused
+CORPUS_PARAMS = ['sourceLang', 'targetLang', 'earlyTranslate', 'simplify',
+                 'dedup', 'vectorizer', 'precision', 'similarity']
+
+
+def getParams(args):
+    return {
+        'objectives': objectives.utils.getParams(args),
+        'size': budget.getBudgetParams(args),
+        'sourceLang': args.source_lang,
+        'targetLang': args.target_lang or [args.source_lang],
+        'earlyTranslate': args.early_translate,
+        'simplify': (args.simplify
+                     if args.simplify in ['early', 'late'] else None),
+        'dedup': args.dedup,
+        'vectorizer': vectorizer.getVectorizerParams(args),
+        'precision': args.precision,
+        'similarity': similarity.getSimilarityParams(args),
+        'prune': {
+            'top': args.prune_top,
+            'mass': args.prune_mass,
+            'centrality': args.prune_centrality,
+        },
+    }
 
 
 def setupArgparse(parser):
     def run(args, silent=False):
-        params = {
-            'objectives': objectives.utils.getParams(args),
-            'size': (args.size, args.words),
-            'sourceLang': args.source_lang,
-            'targetLang': args.target_lang or args.source_lang,
-            'earlyTranslate': args.early_translate,
-            'simplify': (args.simplify
-                         if args.simplify in ['early', 'late'] else None)
-        }
-
-        summary = summarize(args.source_directory, params)
+        summaries = summarize(args.source_directory, getParams(args))
 
         if not silent:
-            logging.info("Printing source summary\n" +
-                         summary.getSummary().encode('utf-8'))
+            for summary in summaries:
+                logging.info("Printing source summary\n" +
+                             summary.getSummary().encode('utf-8'))
 
-            logging.info("Printing target summary")
-            print summary.getTargetSummary().encode('utf-8')
+                logging.info("Printing target summary")
+                print summary.getTargetSummary().encode('utf-8')
 
-        return summary
+        return summaries
 
-    parser.add_argument('-s', '--size', type=int, default=665, metavar="N",
-                        help='Maximum size of the summary')
-    parser.add_argument('-w', '--words', action="store_true",
-                        help='Caluated size as number of words instead of '
-                        'characters')
+    budget.addBudgetParams(parser)
     parser.add_argument('--source-lang', type=str, default='en',
                         metavar="lang", help='Two-letter language code of '
                         'the source documents language. Defaults to `en`')
-    parser.add_argument('-l', '--target-lang', type=str, default=None,
-                        metavar="lang", help='Two-letter language code to '
-                        'generate cross-lingual summary. '
+    parser.add_argument('-l', '--target-lang', type=str, nargs='+',
+                        default=None, metavar="lang",
+                        help='Two-letter language code to generate '
+                        'cross-lingual summary. Several languages generate '
+                        'a summary in each of them. '
                         'Defaults to source language.')
     parser.add_argument('--early-translate', action="store_true",
                         help='First translate and then summarize.')
     parser.add_argument('--simplify', type=str, default='never',
                         choices=['early', 'never'],
                         help='When to simplify sentences and then summarize.')
+    parser.add_argument('--dedup', type=float, default=None,
+                        metavar="threshold",
+                        help='Collapse near-duplicate sentences with Jaccard '
+                        'similarity of word shingles above this threshold, '
+                        'e.g. 0.8')
+
+    vectorizer.addVectorizerParams(parser)
+    parser.add_argument('--precision', type=str, default='float64',
+                        choices=['float64', 'float32'],
+                        help='Floating point precision of sentence vectors, '
+                        'similarities and ranking matrices. float32 halves '
+                        'their memory')
+    similarity.addSimilarityParams(parser)
+
+    parser.add_argument('--prune-top', type=int, default=None, metavar="K",
+                        help='Only consider the K most central sentences '
+                        'as summary candidates')
+    parser.add_argument('--prune-mass', type=float, default=None,
+                        metavar="fraction",
+                        help='Only consider the most central sentences '
+                        'holding this fraction of total centrality as '
+                        'summary candidates, e.g. 0.5')
+    parser.add_argument('--prune-centrality', type=str, default='degree',
+                        choices=['degree', 'power'],
+                        help='Centrality to prune candidates by: similarity '
+                        'row sums, or a few power iterations')
 
     objectives.utils.addObjectiveParams(parser)
 
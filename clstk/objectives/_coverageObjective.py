@@ -1,6 +1,6 @@
-import sklearn.metrics.pairwise
-
 from ..utils.param import Param
+from ..utils import profiling
+from ..utils import similarity
 from ._objective import Objective
 
 import logging
@@ -21,13 +21,15 @@ class CoverageObjective(Objective):
             )
         ]
 
-    def _computeIndividualCoverage(self, sentenceIndex, sentenceList):
+    def _computeIndividualCoverage(self, sentenceIndex, sentenceList,
+                                   weighted=False):
         return sum(
             map(
                 lambda s:
                     self._similarities[sentenceIndex][
                         self._corpusSentenceMap[s]
-                    ],
+                    ] * (self._support[self._corpusSentenceMap[s]]
+                         if weighted else 1),
                 sentenceList
             )
         )
@@ -35,7 +37,7 @@ class CoverageObjective(Objective):
     def _compute(self, summarySentences):
         coverage = 0
         for sentenceIndex in xrange(self._corpusLenght):
-            coverage += min(
+            coverage += self._support[sentenceIndex] * min(
                 self._computeIndividualCoverage(sentenceIndex,
                                                 summarySentences),
                 self.alpha * self._corpusCoverage[sentenceIndex]
@@ -54,20 +56,26 @@ class CoverageObjective(Objective):
             zip(self._corpusSentenceList, range(self._corpusLenght))
         )
 
-        self._similarities = sklearn.metrics.pairwise.cosine_similarity(
-            corpus.getSentenceVectors()
+        self._similarities = similarity.getRows(
+            corpus.getSentenceSimilarities()
         )
         # + 0.5 * sklearn.metrics.pairwise.cosine_similarity(
         #     corpus.getTranslationSentenceVectors()
         # )
 
+        # Sentences standing for collapsed near duplicates count as many times
+        self._support = map(lambda s: s.getExtra('support', 1),
+                            self._corpusSentenceList)
+
         self._corpusCoverage = map(
             lambda sI:
-                self._computeIndividualCoverage(sI, self._corpusSentenceList),
+                self._computeIndividualCoverage(sI, self._corpusSentenceList,
+                                                weighted=True),
             xrange(self._corpusLenght)
         )
+        profiling.recordSize('coverageCorpusCoverage', self._corpusCoverage)
 
-        self.alpha = float(self.alphaN) / self._corpusLenght if (
+        self.alpha = float(self.alphaN) / sum(self._support) if (
                             self.alphaN is not None
                         ) else 1
 
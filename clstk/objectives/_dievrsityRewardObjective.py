@@ -4,19 +4,151 @@ import tempfile
 import math
 import shutil
 
-import sklearn.metrics.pairwise
 import numpy as np
 
 from ..utils.param import Param
+from ..utils import profiling
+from ..utils import clustering
 from ._objective import Objective
 
 import logging
 logger = logging.getLogger("diversityRewardObjective.py")
 
 
+def _executeCLUTO(matrixFileName, clusterFileName, NClusters):
+    clutoPath = os.getenv("CLUTO_BIN_PATH", ".")
+    clutoExecutable = os.path.join(clutoPath, "vcluster")
+
+    command = ([clutoExecutable]
+               + [matrixFileName, str(NClusters)]
+               + ["-clustfile=" + clusterFileName])
+
+    # ["-clmethod=direct"])
+
+    logger.info("Running CLUTO: %s", " ".join(command))
+    clutoOutput = subprocess.check_output(command)
+    logger.info("\n" + clutoOutput)
+
+
+def _writeSparseMatrix(matrixFile, sentenceVectors):
+    # CLUTO's sparse format: a header with number of rows, columns and
+    # non-zeros, then a line of 1-based column and value pairs for each row
+    matrixFile.write("%d %d %d\n" % (sentenceVectors.shape +
+                                     (sentenceVectors.nnz,)))
+
+    indptr = sentenceVectors.indptr
+    indices = sentenceVectors.indices + 1
+    data = sentenceVectors.data
+
+    for i in xrange(sentenceVectors.shape[0]):
+        row = slice(indptr[i], indptr[i + 1])
+        matrixFile.write(" ".join(
+            "%d %.17g" % pair for pair in zip(indices[row], data[row])
+        ) + "\n")
+
+
+def _readClusters(clusterFileName):
+    with open(clusterFileName, "rb") as clusterFile:
+        return np.array([int(line) for line in clusterFile if line.strip()])
+
+
+def _pruneMemo(memoDir, memoSize):
+    # Least recently used cluster files are removed, reading a file updates
+    # its modification time
+    memoFiles = []
+    for fileName in os.listdir(memoDir):
+        if not fileName.endswith(".clusters"):
+            continue
+
+        path = os.path.join(memoDir, fileName)
+        try:
+            memoFiles.append((os.path.getmtime(path), path))
+        except OSError:
+            # Removed by another process meanwhile
+            continue
+
+    for _, path in sorted(memoFiles)[:max(0, len(memoFiles) - memoSize)]:
+        logger.info("Removing memoized clusters file: %s", path)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def clutoClusters(sentenceVectors, NClusters, scratchDir=None, memoSize=256):
+    """
+    Cluster sentence vectors with CLUTO's ``vcluster``
+
+    The directory containing ``vcluster`` is read from ``CLUTO_BIN_PATH``.
+    Vectors are written in CLUTO's sparse matrix format. Cluster files are
+    kept in the scratch directory by fingerprint of the vectors and number
+    of clusters, and ``vcluster`` is not run again for the same input. Only
+    the ``memoSize`` most recently used cluster files are kept.
+
+    :param sentenceVectors: sparse matrix of sentence vectors
+    :param NClusters: Number of clusters
+    :param scratchDir: Directory for temporary and cluster files, e.g. on a
+                       ``tmpfs``. Defaults to the system temporary directory
+    :param memoSize: Number of cluster files to keep, ``0`` to not keep any
+    :returns: ``numpy`` array of cluster ids of the sentences
+    """
+    sentenceVectors = sentenceVectors.tocsr()
+
+    memoDir = os.path.join(scratchDir or tempfile.gettempdir(),
+                           "clstk-cluto")
+    if not os.path.isdir(memoDir):
+        try:
+            os.makedirs(memoDir)
+        except OSError:
+            # Created by another process meanwhile
+            if not os.path.isdir(memoDir):
+                raise
+
+    memoFileName = os.path.join(memoDir, "%s-%d.clusters" % (
+        clustering.getFingerprint(sentenceVectors), NClusters
+    ))
+
+    if memoSize and os.path.exists(memoFileName):
+        logger.info("Reading memoized clusters file: %s", memoFileName)
+        try:
+            os.utime(memoFileName, None)
+            return _readClusters(memoFileName)
+        except (IOError, OSError):
+            # Removed by another process meanwhile
+            logger.info("Memoized clusters file was removed")
+
+    tmpDirName = tempfile.mkdtemp(dir=memoDir)
+    matrixFileName = os.path.join(tmpDirName, "matrixFile")
+    clusterFileName = os.path.join(tmpDirName, "clusterFile")
+
+    try:
+        logger.info("Saving sparse matrix file: %s", matrixFileName)
+        with open(matrixFileName, "wb") as matrixFile:
+            _writeSparseMatrix(matrixFile, sentenceVectors)
+
+        _executeCLUTO(matrixFileName, clusterFileName, NClusters)
+
+        logger.info("Reading clusters file: %s", clusterFileName)
+        labels = _readClusters(clusterFileName)
+
+        if memoSize:
+            # Renaming within the directory is atomic for concurrent runs
+            os.rename(clusterFileName, memoFileName)
+            _pruneMemo(memoDir, memoSize)
+
+        return labels
+    finally:
+        logger.info("Removing temporary directory: %s", tmpDirName)
+        shutil.rmtree(tmpDirName)
+
+
 class DiversityRewardObjective(Objective):
     def __init__(self, params):
         self.kN = params['k']
+        self.clustering = params['clustering']
+        self.threads = params['threads']
+        self.scratch = params['scratch']
+        self.memo = params['memo']
 
     @staticmethod
     def getParams():
@@ -25,45 +157,49 @@ class DiversityRewardObjective(Objective):
                 'k', type=float, default=0.1, metavar="kN",
                 help='Number of clusters for diversity objective.'
                 + ' Number of clustres will be calucated as kN * N'
-            )
+            ),
+            Param(
+                'clustering', type=str, default='kmeans', metavar="method",
+                help='Clustering method for diversity objective: in-process'
+                + ' spherical k-means (`kmeans`), or CLUTO\'s vcluster'
+                + ' (`cluto`) found in CLUTO_BIN_PATH'
+            ),
+            Param(
+                'threads', type=int, default=1, metavar="N",
+                help='Number of threads for k-means clustering'
+            ),
+            Param(
+                'scratch', type=str, default=None, metavar="dir",
+                help='Directory for CLUTO\'s matrix and memoized cluster'
+                + ' files, e.g. on a tmpfs. Defaults to the system temporary'
+                + ' directory'
+            ),
+            Param(
+                'memo', type=int, default=256, metavar="N",
+                help='Number of CLUTO cluster files kept in the scratch'
+                + ' directory, least recently used ones are removed. 0 to'
+                + ' not keep any'
+            ),
         ]
 
-    def _executeCLUTO(self, matrixFileName, clusterFileName, NClusters):
-        clutoPath = os.getenv("CLUTO_BIN_PATH", ".")
-        clutoExecutable = os.path.join(clutoPath, "vcluster")
-
-        command = ([clutoExecutable]
-                   + [matrixFileName, str(NClusters)]
-                   + ["-clustfile=" + clusterFileName])
-
-        # ["-clmethod=direct"])
-
-        logger.info("Running CLUTO: %s", " ".join(command))
-        clutoOutput = subprocess.check_output(command)
-        logger.info("\n" + clutoOutput)
-
     def _computeClusters(self, sentenceVectors, NClusters):
-        tmpDirName = tempfile.mkdtemp()
-        matrixFileName = os.path.join(tmpDirName, "matrixFile")
-        clusterFileName = os.path.join(tmpDirName, "clusterFile")
-
-        logger.info("Saving matrix file: %s", matrixFileName)
-        np.savetxt(matrixFileName,
-                   sentenceVectors,
-                   header=" ".join(map(str, sentenceVectors.shape)),
-                   comments='')
-
-        self._executeCLUTO(matrixFileName, clusterFileName, NClusters)
+        if self.clustering == 'kmeans':
+            labels = clustering.getClusters(sentenceVectors, NClusters,
+                                            clustering.sphericalKMeans,
+                                            threads=self.threads)
+        elif self.clustering == 'cluto':
+            labels = clustering.getClusters(sentenceVectors, NClusters,
+                                            clutoClusters,
+                                            scratchDir=self.scratch,
+                                            memoSize=self.memo)
+        else:
+            raise ValueError("Unknown clustering method: %s" %
+                             self.clustering)
 
         self._sentenceIdClusters = [[] for _ in xrange(NClusters)]
 
-        logger.info("Reading clusters file: %s", clusterFileName)
-        with open(clusterFileName) as clusterFile:
-            for i, line in enumerate(clusterFile):
-                self._sentenceIdClusters[int(line)].append(i)
-
-        logger.info("Removing temporary directory: %s", tmpDirName)
-        shutil.rmtree(tmpDirName)
+        for i, label in enumerate(labels):
+            self._sentenceIdClusters[label].append(i)
 
     def _compute(self, summarySentences):
         diversityReward = 0
@@ -84,18 +220,18 @@ class DiversityRewardObjective(Objective):
         self._corpus = corpus
 
         self._corpusSentenceList = corpus.getSentences()
-        self._corpusSentenceVectos = corpus.getSentenceVectors()
+        self._corpusSentenceVectos = corpus.getSparseSentenceVectors()
         self._corpusLenght = len(self._corpusSentenceList)
 
         self._corpusSentenceMap = dict(
             zip(self._corpusSentenceList, range(self._corpusLenght))
         )
 
-        self._similarities = sklearn.metrics.pairwise.cosine_similarity(
-            self._corpusSentenceVectos
-        )
+        self._similarities = corpus.getSentenceSimilarities()
 
-        self._singletonRewards = self._similarities.mean(axis=1)
+        # Sparse matrices give a column matrix
+        self._singletonRewards = \
+            np.asarray(self._similarities.mean(axis=1)).ravel()
 
         self.K = int(math.ceil(self.kN * self._corpusLenght))
 
@@ -106,6 +242,12 @@ class DiversityRewardObjective(Objective):
             self.K
         )
 
+        profiling.recordSize('diversitySentenceVectors',
+                             self._corpusSentenceVectos)
+        profiling.recordSize('diversitySingletonRewards',
+                             self._singletonRewards)
+        profiling.recordSize('diversityClusters', self._sentenceIdClusters)
+
     def getObjective(self, summary):
         def objective(sentence):
             return self._compute(summary.getSentences() + [sentence])
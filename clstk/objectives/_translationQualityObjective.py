@@ -1,4 +1,5 @@
 from ..utils.param import Param
+from ..utils import profiling
 
 from ._objective import Objective
 
@@ -36,7 +37,8 @@ class TranslationQualityObjective(Objective):
         self._corpusLenght = len(self._corpusSentenceList)
 
         from ..qualityEstimation.qualityEstimation import estimate
-        estimate(corpus, self.modelPath)
+        with profiling.stage('qe'):
+            estimate(corpus, self.modelPath)
 
         self.sentenceScoresMap = {}
 
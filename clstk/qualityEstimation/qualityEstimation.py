@@ -6,15 +6,26 @@ Setup dependencies for TQE to use this. https://github.com/nisargjhaveri/tqe
 You also need to train model using the said tqe system.
 """
 
-import shelve
 from ..utils import nlp
-
-from tqe import getPredictor
+from ..utils import profiling
+from ..utils.cache import openCache
 
 import logging
 logger = logging.getLogger("qualityEstimation.py")
 
 
+_predictors = {}
+
+
+def _getPredictor(modelPath):
+    # Loading a model is slow, keep loaded predictors for later calls
+    if modelPath not in _predictors:
+        from tqe import getPredictor
+        _predictors[modelPath] = getPredictor(modelPath)
+
+    return _predictors[modelPath]
+
+
 def estimate(sentenceCollection, modelPath):
     """
     Estimate translation quality for each sentence in collection.
@@ -49,30 +60,27 @@ def estimate(sentenceCollection, modelPath):
     srcSentences = map(_prepareSrcSentence, _sentenceList)
     mtSentences = map(_prepareMtSentence, _sentenceList)
 
-    try:
-        cache = shelve.open(cachePath, 'r')
-        toPredict = []
+    toPredict = []
+    with openCache(cachePath) as cache:
         for sent, src, mt in zip(_sentenceList,
                                  srcSentences, mtSentences):
             if getCacheKey(src, mt) not in cache:
                 toPredict.append((sent, src, mt))
             else:
                 sent.setExtra('qeScore', cache[getCacheKey(src, mt)])
-        cache.close()
-    except Exception:
-        toPredict = zip(_sentenceList,
-                        srcSentences, mtSentences)
+
+    profiling.count('qeCacheHits', len(_sentenceList) - len(toPredict))
+    profiling.count('qeCacheMisses', len(toPredict))
 
     if len(toPredict):
         sentToPredict, srcToPredict, mtToPredict = zip(*toPredict)
 
-        predictor = getPredictor(modelPath)
+        predictor = _getPredictor(modelPath)
         predictedScores = predictor(srcToPredict, mtToPredict)
 
-        writeCache = shelve.open(cachePath)
-        for sent, src, mt, score in zip(sentToPredict,
-                                        srcToPredict, mtToPredict,
-                                        predictedScores):
-            writeCache[getCacheKey(src, mt)] = score
-            sent.setExtra('qeScore', score)
-        writeCache.close()
+        with openCache(cachePath) as cache:
+            for sent, src, mt, score in zip(sentToPredict,
+                                            srcToPredict, mtToPredict,
+                                            predictedScores):
+                cache[getCacheKey(src, mt)] = score
+                sent.setExtra('qeScore', score)
@@ -1,3 +1,6 @@
+import copy
+
+
 class Sentence(object):
     """
     Class to represent a single sentence
@@ -53,7 +56,7 @@ class Sentence(object):
         """
         Set sentence vector
 
-        :param vector: sentence vector
+        :param vector: sentence vector, a ``(1, D)`` sparse matrix
         """
         self._vector = vector
 
@@ -61,7 +64,7 @@ class Sentence(object):
         """
         Get sentence vector
 
-        :returns: sentence vector
+        :returns: sentence vector, a ``(1, D)`` sparse matrix
         """
         return self._vector
 
@@ -69,7 +72,7 @@ class Sentence(object):
         """
         Set sentence vector for translated text
 
-        :param vector: sentence vector
+        :param vector: sentence vector, a ``(1, D)`` sparse matrix
         """
         self._translationVector = vector
 
@@ -77,7 +80,7 @@ class Sentence(object):
         """
         Get sentence vector for translated text
 
-        :returns: sentence vector
+        :returns: sentence vector, a ``(1, D)`` sparse matrix
         """
         return self._translationVector
 
@@ -99,6 +102,20 @@ class Sentence(object):
         """
         return self._extras[key] if key in self._extras else default
 
+    def copy(self):
+        """
+        Get a copy of the sentence
+
+        The copy has its own translation, vectors and extra values, so they
+        can be changed without changing this sentence.
+
+        :returns: :class:`Sentence`
+        """
+        sentence = copy.copy(self)
+        sentence._extras = dict(self._extras)
+
+        return sentence
+
     def charCount(self):
         """
         Get character count for translated text
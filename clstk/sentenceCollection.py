@@ -1,11 +1,36 @@
 from sentence import Sentence
-from translate.googleTranslate import translate
+from translate import getTranslator
 from simplify.neuralTextSimplification import simplify
 
+import itertools
+
 import numpy as np
-import sklearn
 
-from utils import nlp
+from utils import profiling
+from utils import similarity
+from utils import vectorizer
+
+
+# Generations of similarity matrices computed from scratch, unique across
+# collections
+_similarityGenerations = itertools.count(1)
+
+
+def _getIdf(counts):
+    # Smoothed IDF, as computed by sklearn's TfidfTransformer
+    documentFrequency = np.bincount(counts.indices,
+                                    minlength=counts.shape[1])
+    return np.log((1. + counts.shape[0]) / (1. + documentFrequency)) + 1
+
+
+def _getRows(vectors):
+    # Rows of a sparse matrix, each a (1, D) sparse matrix
+    return [vectors[i] for i in xrange(vectors.shape[0])]
+
+
+def _getTfidf(counts, idf):
+    from sklearn import preprocessing
+    return preprocessing.normalize(counts.multiply(idf).tocsr())
 
 
 class SentenceCollection(object):
@@ -19,6 +44,12 @@ class SentenceCollection(object):
         Initialize the collection
         """
         self._sentences = []
+        self._similarities = {}
+        self._similarityGeneration = 0
+        self._vectorizers = {}
+        self._vectorizerOptions = {}
+        self._dtype = np.float64
+        self._similarityOptions = {}
 
     def setSourceLang(self, lang):
         """
@@ -70,57 +101,271 @@ class SentenceCollection(object):
         """
         Get list of sentence vectors for sentences in the collection
 
+        Vectors are kept sparse, and densified by this call. Prefer
+        :meth:`getSparseSentenceVectors`.
+
         :returns: :class:`np.array` containing sentence vectors
         """
-        return np.array(map(Sentence.getVector, self._sentences))
+        import scipy.sparse
+        return scipy.sparse.vstack(
+            map(Sentence.getVector, self._sentences)
+        ).toarray()
+
+    def getSparseSentenceVectors(self):
+        """
+        Get sentence vectors for sentences in the collection as a sparse
+        matrix
+
+        Vectors are the same as :meth:`getSentenceVectors`, without
+        densifying them.
+
+        :returns: :class:`scipy.sparse.csr_matrix` of L2-normalized vectors
+        """
+        return self._getSparseVectors('sentence')
+
+    def _getSparseVectors(self, kind):
+        _, counts, idf = self._vectorizers[kind]
+        return _getTfidf(counts, idf).astype(self._dtype)
 
     def getTranslationSentenceVectors(self):
         """
         Get list of sentence vectors for translations of sentences in the
         collection
 
+        Vectors are kept sparse, and densified by this call. Prefer
+        :meth:`getSparseTranslationSentenceVectors`.
+
         :returns: :class:`np.array` containing sentence vectors
         """
-        return np.array(map(Sentence.getTranslationVector, self._sentences))
+        import scipy.sparse
+        return scipy.sparse.vstack(
+            map(Sentence.getTranslationVector, self._sentences)
+        ).toarray()
+
+    def getSparseTranslationSentenceVectors(self):
+        """
+        Get sentence vectors for translations of sentences in the collection
+        as a sparse matrix
+
+        .. seealso::
+            :meth:`getSparseSentenceVectors`
+        """
+        return self._getSparseVectors('translation')
+
+    def getSentenceSimilarities(self):
+        """
+        Get cosine similarities between sentence vectors
+
+        The matrix is computed once and cached, copy it before modifying.
+        Depending on :meth:`setSimilarityOptions`, it may be memory-mapped or
+        sparse, see :mod:`clstk.utils.similarity` for reading it.
+
+        :returns: matrix of shape (N, N)
+        """
+        if 'sentence' not in self._similarities:
+            with profiling.stage('similarity'):
+                # Sparse vectors, so that products of blocks scale with
+                # non-zeros rather than with the vocabulary
+                self._similarities['sentence'] = similarity.cosineSimilarities(
+                    self.getSparseSentenceVectors(),
+                    **self._similarityOptions
+                )
+            self._similarityGeneration = next(_similarityGenerations)
+            profiling.recordSize('sentenceSimilarities',
+                                 self._similarities['sentence'])
+
+        return self._similarities['sentence']
+
+    def getTranslationSentenceSimilarities(self):
+        """
+        Get cosine similarities between sentence vectors of translations
+
+        The matrix is computed once and cached, copy it before modifying.
+        Depending on :meth:`setSimilarityOptions`, it may be memory-mapped or
+        sparse, see :mod:`clstk.utils.similarity` for reading it.
+
+        :returns: matrix of shape (N, N)
+        """
+        if 'translation' not in self._similarities:
+            with profiling.stage('similarity'):
+                self._similarities['translation'] = \
+                    similarity.cosineSimilarities(
+                        self.getSparseTranslationSentenceVectors(),
+                        **self._similarityOptions
+                    )
+            self._similarityGeneration = next(_similarityGenerations)
+            profiling.recordSize('translationSentenceSimilarities',
+                                 self._similarities['translation'])
+
+        return self._similarities['translation']
+
+    def getSimilarityGeneration(self):
+        """
+        Get generation of the similarity matrices
+
+        The generation changes whenever a similarity matrix is computed from
+        scratch, e.g. after IDF weights are updated by
+        :meth:`addSentenceVectors` with ``online`` IDF, but not when only
+        similarities of added sentences are appended. Matrices derived from
+        similarities of existing sentences stay valid while it is unchanged.
+
+        :returns: ``int``, unique across collections
+        """
+        return self._similarityGeneration
 
-    def _generateSentenceVectors(self, lang, getText, setVector):
-        def _tokenizeSentence(sentenceText):
-            tokens = map(nlp.getStemmer(),
-                         nlp.getTokenizer(lang)(sentenceText.lower())
-                         )
+    def setVectorizerOptions(self, **options):
+        """
+        Set options of the vectorizer used to generate sentence vectors
 
-            return tokens
+        :param options: keyword arguments for
+                        :func:`clstk.utils.vectorizer.getVectorizer`
+        """
+        self._vectorizerOptions = options
 
-        sentenceVectorizer = sklearn.feature_extraction.text.TfidfVectorizer(
-                                preprocessor=getText,
-                                tokenizer=_tokenizeSentence,
-                                stop_words=nlp.getStopwords(lang),
-                                ngram_range=(1, 2)
-                            )
+    def setPrecision(self, precision):
+        """
+        Set floating point precision of sentence vectors
 
-        sentenceVectors = sentenceVectorizer.fit_transform(
-                                    self._sentences
-                                ).toarray()
+        Similarities are computed in the same precision, and so are matrices
+        derived from them by the summarizers. ``float32`` halves their
+        memory.
 
-        map(setVector, self._sentences, sentenceVectors)
+        :param precision: ``float64`` or ``float32``
+        """
+        self._dtype = np.dtype(precision)
+
+    def setSimilarityOptions(self, **options):
+        """
+        Set options of how similarity matrices are computed and stored
+
+        Cached similarities are dropped.
+
+        :param options: keyword arguments for
+                        :func:`clstk.utils.similarity.cosineSimilarities`
+        """
+        self._similarityOptions = options
+        self._similarities = {}
+
+    def _generateSentenceVectors(self, kind, lang, getText, setVector, name):
+        sentenceVectorizer = vectorizer.getVectorizer(
+            lang, getText, **self._vectorizerOptions
+        )
+
+        with profiling.stage('vectorize'):
+            counts = sentenceVectorizer.fit_transform(self._sentences)
+            idf = _getIdf(counts)
+            # Vectors are kept sparse, which matters in hashing mode, where
+            # they have a fixed large number of features
+            sentenceVectors = _getTfidf(counts, idf).astype(self._dtype)
+
+            map(setVector, self._sentences, _getRows(sentenceVectors))
+
+        # Term counts are kept to add sentences later
+        self._vectorizers[kind] = (sentenceVectorizer, counts, idf)
+        self._similarities.pop(kind, None)
+
+        profiling.recordSize(name, sentenceVectors)
+
+    def _addSentenceVectors(self, kind, sentences, setVector, idf):
+        import scipy.sparse
+
+        if idf not in ['fixed', 'online']:
+            raise ValueError("Unknown IDF mode: %s" % idf)
+
+        sentenceVectorizer, counts, idfWeights = self._vectorizers[kind]
+
+        with profiling.stage('vectorize'):
+            newCounts = sentenceVectorizer.transform(sentences)
+            counts = scipy.sparse.vstack([counts, newCounts]).tocsr()
+
+            if idf == 'online':
+                # Weights of all sentences change
+                idfWeights = _getIdf(counts)
+                sentenceVectors = _getTfidf(counts, idfWeights) \
+                    .astype(self._dtype)
+                map(setVector, self._sentences, _getRows(sentenceVectors))
+            else:
+                sentenceVectors = _getTfidf(newCounts, idfWeights) \
+                    .astype(self._dtype)
+                map(setVector, sentences, _getRows(sentenceVectors))
+
+        self._vectorizers[kind] = (sentenceVectorizer, counts, idfWeights)
+
+        # Memory-mapped and sparse matrices are computed again when needed
+        if idf == 'online' or \
+                type(self._similarities.get(kind)) is not np.ndarray:
+            self._similarities.pop(kind, None)
+            return
+
+        # Only similarities of the new sentences need to be computed. Rows
+        # are normalized, so cosine similarity is the dot product, which is
+        # much faster on the sparse vectors
+        with profiling.stage('similarity'):
+            similarities = self._similarities[kind]
+            n = similarities.shape[0]
+            N = counts.shape[0]
+
+            vectors = _getTfidf(counts, idfWeights)
+            newSimilarities = vectors[n:].dot(vectors.T).toarray()
+
+            extended = np.empty((N, N), dtype=similarities.dtype)
+            extended[:n, :n] = similarities
+            extended[n:, :] = newSimilarities
+            extended[:n, n:] = newSimilarities[:, :n].T
+
+            self._similarities[kind] = extended
 
     def generateSentenceVectors(self):
         """
         Generate sentence vectors
         """
-        self._generateSentenceVectors(self.sourceLang,
+        self._generateSentenceVectors('sentence',
+                                      self.sourceLang,
                                       Sentence.getText,
-                                      Sentence.setVector)
+                                      Sentence.setVector,
+                                      'sentenceVectors')
 
     def generateTranslationSentenceVectors(self):
         """
         Generate sentence vectors for translations
         """
-        self._generateSentenceVectors(self.targetLang,
+        self._generateSentenceVectors('translation',
+                                      self.targetLang,
                                       Sentence.getTranslation,
-                                      Sentence.setTranslationVector)
+                                      Sentence.setTranslationVector,
+                                      'translationSentenceVectors')
 
-    def translate(self, sourceLang, targetLang, replaceOriginal=False):
+    def addSentenceVectors(self, sentences, idf='fixed'):
+        """
+        Generate sentence vectors for sentences added to the collection
+        after :meth:`generateSentenceVectors`
+
+        The vocabulary is not updated, words not seen before are ignored.
+        Cached similarities are extended by rows and columns for the new
+        sentences.
+
+        :param sentences: list of sentences added last to the collection
+        :param idf: ``fixed`` to keep IDF weights, or ``online`` to update
+                    IDF weights with the new sentences. Vectors of all
+                    sentences change with ``online``, and similarities are
+                    recomputed when needed.
+        """
+        self._addSentenceVectors('sentence', sentences, Sentence.setVector,
+                                 idf)
+
+    def addTranslationSentenceVectors(self, sentences, idf='fixed'):
+        """
+        Generate sentence vectors for translations of sentences added to the
+        collection after :meth:`generateTranslationSentenceVectors`
+
+        .. seealso::
+            :meth:`addSentenceVectors`
+        """
+        self._addSentenceVectors('translation', sentences,
+                                 Sentence.setTranslationVector, idf)
+
+    def translate(self, sourceLang, targetLang, replaceOriginal=False,
+                  translator='google', sentences=None):
         """
         Translate sentences
 
@@ -128,32 +373,47 @@ class SentenceCollection(object):
         :param targetLang: two-letter code for target language
         :param replaceOriginal: Replace source text with translation if
                                 ``True``. Used for early-translation
+        :param translator: Name of the translator to use, see
+                           :func:`clstk.translate.getTranslator`
+        :param sentences: Sentences to translate. Defaults to all sentences
+                          in the collection
         """
-        text = "\n".join(map(Sentence.getText, self._sentences))
-        translation, _ = translate(text, sourceLang, targetLang)
+        if sentences is None:
+            sentences = self._sentences
+
+        text = "\n".join(map(Sentence.getText, sentences))
+        with profiling.stage('translate'):
+            translation, _ = getTranslator(translator)(text, sourceLang,
+                                                       targetLang)
 
         translations = translation.split("\n")
 
         if replaceOriginal:
-            map(Sentence.setText, self._sentences, translations)
+            map(Sentence.setText, sentences, translations)
 
-        map(Sentence.setTranslation, self._sentences, translations)
+        map(Sentence.setTranslation, sentences, translations)
 
-    def simplify(self, sourceLang, replaceOriginal=False):
+    def simplify(self, sourceLang, replaceOriginal=False, sentences=None):
         """
         Simplify sentences
 
         :param sourceLang: two-letter code for language
         :param replaceOriginal: Replace source sentences with simplified
                                 sentences. Used for early-simplify.
+        :param sentences: Sentences to simplify. Defaults to all sentences
+                          in the collection
         """
-        sentences = map(Sentence.getText, self._sentences)
+        if sentences is None:
+            sentences = self._sentences
+
+        texts = map(Sentence.getText, sentences)
 
-        simpleSentences = simplify(sentences, sourceLang)
+        with profiling.stage('simplify'):
+            simpleSentences = simplify(texts, sourceLang)
 
         if replaceOriginal:
-            map(Sentence.setText, self._sentences, simpleSentences)
-            map(Sentence.setTranslation, self._sentences, simpleSentences)
+            map(Sentence.setText, sentences, simpleSentences)
+            map(Sentence.setTranslation, sentences, simpleSentences)
 
         map(lambda s, t: s.setExtra('simpleText', t),
-            self._sentences, simpleSentences)
+            sentences, simpleSentences)
@@ -0,0 +1,302 @@
+"""
+Summarization service.
+
+Keeps summarizers, tokenizers, stemmers, quality estimation predictors and
+caches loaded in a long-running process, and serves summaries over a local
+HTTP/JSON API.
+
+Requests are processed on a bounded pool of worker threads. Requests arriving
+while the queue is full are rejected, and requests taking longer than the
+timeout are answered with an error. Note that a timed out request still runs
+to completion on its worker, as threads cannot be interrupted.
+
+Endpoints:
+
+``POST /summarize/<method>``
+    Body is a JSON object with ``documents``, a list of document texts, and
+    optionally ``args``, a list of arguments as accepted by ``sum.py`` (e.g.
+    ``["-s", "250", "-l", "hi"]``), and ``translator``, see
+    :func:`clstk.translate.getTranslator`. Other bodies are answered with
+    status 400.
+
+``GET /stats``
+    Queue depth, request counts and latency percentiles.
+"""
+
+import json
+import time
+import threading
+import collections
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+import BaseHTTPServer
+import SocketServer
+
+import numpy as np
+
+from . import summarizers
+from .utils import nlp
+from .utils import cache
+
+import logging
+logger = logging.getLogger("service.py")
+
+
+class ServiceBusy(RuntimeError):
+    """
+    Raised when the request queue is full
+    """
+    pass
+
+
+class RequestTimeout(RuntimeError):
+    """
+    Raised when a request is not processed within the timeout
+    """
+    pass
+
+
+def _isStringList(values):
+    return isinstance(values, list) and \
+        all(isinstance(value, basestring) for value in values)
+
+
+class SummarizationService(object):
+    """
+    Summarizes documents on a bounded pool of worker threads, keeping models
+    and caches loaded between requests
+    """
+
+    def __init__(self, workers=None, maxQueue=64, timeout=60.,
+                 latencyWindow=1000):
+        """
+        :param workers: Number of worker threads. Defaults to number of CPUs
+        :param maxQueue: Maximum number of requests waiting or being
+                         processed. Further requests are rejected
+        :param timeout: Default timeout for a request in seconds
+        :param latencyWindow: Number of recent requests to compute latency
+                              percentiles over
+        """
+        self._workers = workers or multiprocessing.cpu_count()
+        self._pool = ThreadPool(self._workers)
+        self._maxQueue = maxQueue
+        self._timeout = timeout
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counts = collections.OrderedDict([
+            ("requests", 0),
+            ("completed", 0),
+            ("failed", 0),
+            ("rejected", 0),
+            ("timeouts", 0),
+        ])
+        self._latencies = collections.deque(maxlen=latencyWindow)
+
+        cache.keepOpen()
+
+    def warmUp(self, methods=summarizers.METHODS.keys(), langs=['en']):
+        """
+        Import summarizers and load tokenizers, stemmers and stopwords, so
+        that the first requests do not pay for it
+
+        :param methods: Names of summarizers to load
+        :param langs: Languages to load tokenizers and stopwords for
+        """
+        logger.info("Loading summarizers: %s", ", ".join(methods))
+        for method in methods:
+            summarizers.getSummarizer(method)
+
+        logger.info("Loading language resources: %s", ", ".join(langs))
+        nlp.getSentenceSplitter()(u"Warm up.")
+        nlp.getStemmer()(u"warming")
+        for lang in langs:
+            nlp.getTokenizer(lang)(u"Warm up.")
+            nlp.getStopwords(lang)
+
+    def close(self):
+        """
+        Stop workers and close caches
+        """
+        self._pool.close()
+        self._pool.join()
+        cache.closeAll()
+
+    def _run(self, method, documents, params):
+        try:
+            return summarizers.summarizeDocuments(method, documents, params)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def summarize(self, method, documents, args=[], translator=None,
+                  timeout=None):
+        """
+        Summarize documents
+
+        :param method: Name of the summarizer
+        :param documents: list of documents as unicode strings
+        :param args: list of arguments as accepted by ``sum.py``
+        :param translator: Name of the translator to use
+        :param timeout: Timeout in seconds, defaults to the service timeout
+        :returns: list of :class:`clstk.summary.Summary`, for each target
+                  language one for each size budget, see
+                  :func:`clstk.summarizers.getSummaryNames`
+        :raises ValueError: if the request is not valid
+        :raises ServiceBusy: if the queue is full
+        :raises RequestTimeout: if the request takes too long
+        """
+        with self._lock:
+            self._counts["requests"] += 1
+
+        if not _isStringList(documents) or not documents:
+            raise ValueError("`documents` needs to be a non-empty list of "
+                             "strings")
+        if not _isStringList(args):
+            raise ValueError("`args` needs to be a list of strings")
+        if translator is not None and not isinstance(translator, basestring):
+            raise ValueError("`translator` needs to be a string")
+
+        params = summarizers.parseParams(method, args)
+        if translator:
+            params['translator'] = translator
+
+        with self._lock:
+            if self._pending >= self._maxQueue:
+                self._counts["rejected"] += 1
+                raise ServiceBusy("Queue is full")
+
+            self._pending += 1
+
+        start = time.time()
+        result = self._pool.apply_async(self._run,
+                                        (method, documents, params))
+
+        try:
+            summaries = result.get(timeout or self._timeout)
+        except multiprocessing.TimeoutError:
+            with self._lock:
+                self._counts["timeouts"] += 1
+            raise RequestTimeout("Request timed out")
+        except Exception:
+            with self._lock:
+                self._counts["failed"] += 1
+            raise
+
+        with self._lock:
+            self._counts["completed"] += 1
+            self._latencies.append(time.time() - start)
+
+        return summaries
+
+    def getStats(self):
+        """
+        Get queue depth, request counts and latency percentiles
+
+        :returns: ``dict``, latencies are in seconds
+        """
+        with self._lock:
+            stats = collections.OrderedDict([
+                ("workers", self._workers),
+                ("queue_depth", self._pending),
+                ("max_queue", self._maxQueue),
+            ])
+            stats.update(self._counts)
+            latencies = list(self._latencies)
+
+        percentiles = collections.OrderedDict()
+        if latencies:
+            for p in (50, 90, 95, 99):
+                percentiles["p%d" % p] = float(np.percentile(latencies, p))
+            percentiles["max"] = max(latencies)
+
+        stats["latency"] = percentiles
+
+        return stats
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def _sendJSON(self, status, data):
+        body = json.dumps(data)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._sendJSON(200, self.server.service.getStats())
+        else:
+            self._sendJSON(404, {"error": "Not found"})
+
+    def do_POST(self):
+        prefix = "/summarize/"
+        if not self.path.startswith(prefix):
+            self._sendJSON(404, {"error": "Not found"})
+            return
+
+        method = self.path[len(prefix):]
+
+        try:
+            length = int(self.headers.getheader("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length))
+            if not isinstance(request, dict):
+                raise ValueError("Request body needs to be a JSON object")
+
+            args = request.get("args", [])
+            summaries = self.server.service.summarize(
+                method,
+                request.get("documents"),
+                args=args,
+                translator=request.get("translator")
+            )
+        except ValueError as e:
+            self._sendJSON(400, {"error": str(e)})
+        except ServiceBusy as e:
+            self._sendJSON(503, {"error": str(e)})
+        except RequestTimeout as e:
+            self._sendJSON(504, {"error": str(e)})
+        except Exception as e:
+            logger.exception("Request failed")
+            self._sendJSON(500, {"error": repr(e)})
+        else:
+            response = {
+                "method": method,
+                "summary": summaries[0].getTargetSummary(),
+                "source_summary": summaries[0].getSummary(),
+            }
+            if len(summaries) > 1:
+                names = summarizers.getSummaryNames(
+                    summarizers.parseParams(method, args)
+                )
+                response["summaries"] = map(lambda (name, s): {
+                    "name": name,
+                    "summary": s.getTargetSummary(),
+                    "source_summary": s.getSummary(),
+                }, zip(names, summaries))
+
+            self._sendJSON(200, response)
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+
+class ServiceServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    HTTP server for a :class:`SummarizationService`
+
+    Each connection is handled in its own thread, which waits for the
+    service's worker pool.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        """
+        :param address: Pair of host and port to listen on
+        :param service: :class:`SummarizationService` to serve
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, _RequestHandler)
+        self.service = service
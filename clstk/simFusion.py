@@ -1,153 +1,283 @@
 from corpus import Corpus
-from summary import Summary
+from corpus import readDocuments
+from summary import fillSummaries
+from utils import budget
+from utils import profiling
+from utils import rank
+from utils import similarity
+from utils import vectorizer
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn import preprocessing
 
 import logging
 logger = logging.getLogger("simFusion.py")
 
 
-def _row_normalize(M):
-    return preprocessing.normalize(M, axis=1, norm='l1')
-
-
 def normalize(M):
-    return M / np.sum(M)
+    return M / np.sum(M, axis=0)
 
 
-def summarize(inDir, params):
-    logger.info("Loading documents from %s", inDir)
-    c = Corpus(inDir).load(
+def loadCorpus(inDir, params, documents=None):
+    if documents is None:
+        logger.info("Loading documents from %s", inDir)
+
+    return Corpus(inDir).load(
             params,
             translate=True,
             simplify=(params['simplify'] is not None),
-            replaceWithSimplified=(params['simplify'] == 'early')
+            replaceWithSimplified=(params['simplify'] == 'early'),
+            documents=documents
         )
 
-    logger.info("Setting up summarizer")
-    M_en = cosine_similarity(
-        c.getSentenceVectors()
-    )
-    np.fill_diagonal(M_en, 0)
 
-    M_cn = cosine_similarity(
-        c.getTranslationSentenceVectors()
-    )
-    np.fill_diagonal(M_cn, 0)
+def _iterate(scores, step, maxIter):
+    # Power iterations on score columns, columns which converged are not
+    # iterated further
+    K = scores.shape[1]
+    active = np.arange(K)
+    iterations = np.zeros(K, dtype=int)
+
+    for i in xrange(maxIter):
+        scores_prev = scores[:, active]
+        newScores = normalize(step(scores_prev, active))
+
+        scores[:, active] = newScores
+        iterations[active] = i + 1
+
+        active = active[~np.all(np.isclose(scores_prev, newScores), axis=0)]
+        if not len(active):
+            break
+
+    return scores, iterations.max()
+
+
+def summarizeCorpus(c, params, state=None):
+    """
+    Summarize a loaded corpus
+
+    With several alpha values, the transition matrix of each would be
+    different. Scores for all of them are instead iterated together on the
+    similarity matrices, one column for each, so each step is two
+    matrix-matrix products.
+
+    :param c: :class:`clstk.corpus.Corpus`
+    :param params: params from :func:`getParams`
+    :param state: ``dict`` kept between calls to warm start after sentences
+                  are added with :meth:`clstk.corpus.Corpus.addDocuments`.
+                  Transition matrix and saliency scores are stored in it
+    :returns: list of :class:`clstk.summary.Summary`, for each alpha value
+              one for each budget in ``params['size']``. The ranking is
+              shared by all budgets
+    """
+    logger.info("Setting up summarizer")
+    S_en = c.getSentenceSimilarities()
+    S_cn = c.getTranslationSentenceSimilarities()
+    N = S_en.shape[0]
 
-    alpha = params['alpha']
-    M_encn = (alpha * M_cn) + ((1 - alpha) * M_en)
+    alphas = np.asarray(params['alpha'], dtype=np.float64).reshape(-1)
 
-    M_encn = _row_normalize(M_encn)
+    # The matrix is reused only while similarities of existing sentences
+    # are unchanged, e.g. not after an update with online IDF
+    generation = c.getSimilarityGeneration()
+    previous = rank.getPreviousState(state, N, alpha=tuple(alphas),
+                                     similarities=generation)
+    if previous:
+        logger.info("Warm start from %d sentences", previous['size'])
 
     mu = 0.85  # Damping factor
 
-    logger.info("Iteratively computing sentence saliency scores")
-    infoScore = normalize(np.random.random((M_cn.shape[0],)))
-    n = len(infoScore)
-    for i in xrange(params['max_iter']):
-        infoScore_prev = infoScore
+    if len(alphas) == 1:
+        alpha = alphas[0]
+
+        # Blocks are sparse if similarities are, and the matrix is then
+        # kept sparse, or memory-mapped along with memory-mapped
+        # similarities
+        def getBlock(rows, cols):
+            return (alpha * similarity.getSubmatrix(S_cn, rows, cols)) + \
+                ((1 - alpha) * similarity.getSubmatrix(S_en, rows, cols))
 
-        infoScore = (mu * np.dot(M_encn.T, infoScore)) + ((1 - mu) / n)
+        matrix = rank.extendRowNormalized(
+            previous.get('matrix'), getBlock, N,
+            memmapDir=params.get('similarity', {}).get('memmapDir')
+        )
+        M_encn = matrix[0]
 
-        infoScore = normalize(infoScore)
+        profiling.recordSize('rankMatrices', [M_encn])
 
-        if np.all(np.isclose(infoScore_prev, infoScore)):
-            # Converged
-            break
+        dtype = M_encn.dtype
+
+        def step(infoScore, active):
+            return (mu * M_encn.T.dot(infoScore)) + ((1 - mu) / N)
+    else:
+        matrix = None
+        dtype = S_en.dtype
+
+        # Row-normalized weights of sentence i for each alpha, without
+        # self-loops, applied to the scores before the products
+        diagonals = [S_cn.diagonal(), S_en.diagonal()]
+        rowSums = np.outer(similarity.getRowSums(S_cn) - diagonals[0],
+                           alphas) + \
+            np.outer(similarity.getRowSums(S_en) - diagonals[1], 1 - alphas)
+
+        scale = np.zeros_like(rowSums)
+        np.divide(1., rowSums, out=scale, where=(rowSums > 0))
+        weights = [(alphas * scale).astype(dtype),
+                   ((1 - alphas) * scale).astype(dtype)]
+
+        def step(infoScore, active):
+            products = 0
+            for S, diagonal, weight in zip([S_cn, S_en], diagonals,
+                                           weights):
+                weighted = infoScore * weight[:, active]
+                products = products + S.T.dot(weighted) - \
+                    diagonal[:, np.newaxis] * weighted
 
-    logger.info("Optimization completed in %d iterations" % (i + 1))
+            return (mu * products) + ((1 - mu) / N)
+
+    logger.info("Iteratively computing sentence saliency scores")
+    with profiling.stage('optimize'):
+        if previous:
+            infoScore = rank.padScores(previous['scores'], N)
+        else:
+            infoScore = normalize(np.random.random((N, 1)))
+
+        # Scores in the precision of the matrix, so that it is not upcast in
+        # products
+        infoScore = np.tile(infoScore.astype(dtype),
+                            (1, len(alphas) // infoScore.shape[1]))
+
+        infoScore, iterations = _iterate(infoScore, step, params['max_iter'])
+
+    if state is not None:
+        state.update({
+            'size': N,
+            'alpha': tuple(alphas),
+            'similarities': generation,
+            'matrix': matrix,
+            'scores': infoScore,
+            'iterations': iterations,
+        })
+
+    logger.info("Optimization completed in %d iterations%s", iterations,
+                " (warm start)" if previous else "")
+    profiling.count('iterations', iterations)
 
     # summary = optimizer.greedy(params["size"], objective, c)
     logger.info("Computing final sentence scores including redundancy penalty")
-    sentence_scores = infoScore.copy()
-    sentence_order = []
-    for i in xrange(len(sentence_scores)):
-        best_sentence = np.argmax(sentence_scores)
-        sentence_order.append(best_sentence)
+    with profiling.stage('selection'):
+        # Self-similarity does not matter, the score of the best sentence is
+        # discarded
+        sentence_orders = rank.getRedundancyOrders(
+            infoScore,
+            lambda cols: similarity.getBlock(S_cn, slice(None), cols)
+        )
 
-        sentence_scores -= M_cn[:, best_sentence] * infoScore[best_sentence]
-        sentence_scores[best_sentence] = float('-inf')
+    logger.info("Generating final summaries")
+    with profiling.stage('fill'):
+        summaries = sum(map(lambda order: fillSummaries(c.getSentences(),
+                                                        order,
+                                                        params['size']),
+                            sentence_orders.T), [])
 
-    logger.info("Generating final summary")
+    return summaries
 
-    sizeBudget, countTokens = params['size']
-    sizeName = "tokens" if countTokens else "chars"
 
-    def sentenceSize(sent):
-        return sent.tokenCount() if countTokens else sent.charCount()
+def summarizeDocuments(documents, params):
+    """
+    Summarize documents held in memory
 
-    def summarySize(summary):
-        return summary.tokenCount() if countTokens else summary.charCount()
+    :param documents: list or other iterable, e.g. a generator, of
+                      documents as unicode strings
+    :param params: params from :func:`getParams`
+    :returns: list of :class:`clstk.summary.Summary`, for each target
+              language one for each budget
+    """
+    corpus = loadCorpus(None, params, documents)
 
-    logger.info("Summary budget: %d %s", sizeBudget, sizeName)
+    return sum(map(lambda c: summarizeCorpus(c, params),
+                   corpus.getTargetCorpora()), [])
 
-    summary = Summary()
-    sentences = c.getSentences()
 
-    for sentence_id in sentence_order:
-        if summarySize(summary) >= sizeBudget:
-            break
+def summarize(inDir, params):
+    """
+    Summarize documents in a directory, see :func:`summarizeDocuments`
+    """
+    logger.info("Loading documents from %s", inDir)
+
+    return summarizeDocuments(readDocuments(inDir), params)
 
-        sentence_size = sentenceSize(sentences[sentence_id])
 
-        if summarySize(summary) + sentence_size <= sizeBudget:
-            logger.info("Sentence added with size: %d, ", sentence_size)
-            summary.addSentence(sentences[sentence_id])
+# Params used by loadCorpus, these are shared by all parameter settings when
+# a loaded corpus is reused
+CORPUS_PARAMS = ['sourceLang', 'targetLang', 'simplify', 'dedup',
+                 'vectorizer', 'precision', 'similarity']
 
-    logger.info("Optimization done, summary size: %d chars, %d tokens",
-                summary.charCount(), summary.tokenCount())
 
-    return summary
+def getParams(args):
+    return {
+        'size': budget.getBudgetParams(args),
+        'sourceLang': args.source_lang,
+        'targetLang': args.target_lang or [args.source_lang],
+        'alpha': args.alpha,
+        'max_iter': args.max_iter,
+        'simplify': (args.simplify
+                     if args.simplify in ['early', 'late'] else None),
+        'dedup': args.dedup,
+        'vectorizer': vectorizer.getVectorizerParams(args),
+        'precision': args.precision,
+        'similarity': similarity.getSimilarityParams(args),
+    }
 
 
 def setupArgparse(parser):
     def run(args, silent=False):
-        params = {
-            'size': (args.size, args.words),
-            'sourceLang': args.source_lang,
-            'targetLang': args.target_lang or args.source_lang,
-            'alpha': args.alpha,
-            'max_iter': args.max_iter,
-            'simplify': (args.simplify
-                         if args.simplify in ['early', 'late'] else None),
-        }
-
-        summary = summarize(args.source_directory, params)
+        summaries = summarize(args.source_directory, getParams(args))
 
         if not silent:
-            logging.info("Printing source summary\n" +
-                         summary.getSummary().encode('utf-8'))
+            for summary in summaries:
+                logging.info("Printing source summary\n" +
+                             summary.getSummary().encode('utf-8'))
 
-            logging.info("Printing target summary")
-            print summary.getTargetSummary().encode('utf-8')
+                logging.info("Printing target summary")
+                print summary.getTargetSummary().encode('utf-8')
 
-        return summary
+        return summaries
 
-    parser.add_argument('-s', '--size', type=int, default=665, metavar="N",
-                        help='Maximum size of the summary')
-    parser.add_argument('-w', '--words', action="store_true",
-                        help='Caluated size as number of words instead of '
-                        'characters')
+    budget.addBudgetParams(parser)
     parser.add_argument('--source-lang', type=str, default='en',
                         metavar="lang", help='Two-letter language code of '
                         'the source documents language. Defaults to `en`')
-    parser.add_argument('-l', '--target-lang', type=str, default=None,
-                        metavar="lang", help='Two-letter language code to '
-                        'generate cross-lingual summary. '
+    parser.add_argument('-l', '--target-lang', type=str, nargs='+',
+                        default=None, metavar="lang",
+                        help='Two-letter language code to generate '
+                        'cross-lingual summary. Several languages generate '
+                        'a summary in each of them. '
                         'Defaults to source language.')
 
-    parser.add_argument('--alpha', type=float, default=.5,
+    parser.add_argument('--alpha', type=float, nargs='+', default=[.5],
                         help='Relative contributions to the final saliency '
                         'scores from the information in the same language and '
-                        'the information in the other language')
+                        'the information in the other language. Several '
+                        'values generate a summary for each of them, their '
+                        'scores are computed together')
     parser.add_argument('--max-iter', type=int, default=1000,
                         help='Maximum iterations for the iterative algorithm')
 
     parser.add_argument('--simplify', type=str, default='never',
                         choices=['early', 'never'],
                         help='When to simplify sentences and then summarize.')
+    parser.add_argument('--dedup', type=float, default=None,
+                        metavar="threshold",
+                        help='Collapse near-duplicate sentences with Jaccard '
+                        'similarity of word shingles above this threshold, '
+                        'e.g. 0.8')
+
+    vectorizer.addVectorizerParams(parser)
+    parser.add_argument('--precision', type=str, default='float64',
+                        choices=['float64', 'float32'],
+                        help='Floating point precision of sentence vectors, '
+                        'similarities and ranking matrices. float32 halves '
+                        'their memory')
+    similarity.addSimilarityParams(parser)
 
     parser.set_defaults(func=run)
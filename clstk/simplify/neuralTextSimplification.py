@@ -9,8 +9,9 @@ environmental variables to use this.
 import tempfile
 import os
 import subprocess
-import shelve
 from ..utils import nlp
+from ..utils import profiling
+from ..utils.cache import openCache
 
 
 def _simplify(sentences, lang):
@@ -89,28 +90,31 @@ def simplify(sentences, lang):
             text.strip()
         ]).encode('utf-8')
 
-    cache = shelve.open('.simplification-cache.nts')
+    with openCache('.simplification-cache.nts') as cache:
+        sentencesToSimplify = [sentence for sentence in sentences
+                               if cacheKey(sentence) not in cache]
 
-    sentencesToSimplify = []
-
-    for sentence in sentences:
-        if cacheKey(sentence) not in cache:
-            sentencesToSimplify.append(sentence)
+    profiling.count('simplificationCacheHits',
+                    len(sentences) - len(sentencesToSimplify))
+    profiling.count('simplificationCacheMisses', len(sentencesToSimplify))
 
+    # Simplify without holding the cache, it may be used concurrently
+    simplifications = {}
     if len(sentencesToSimplify):
         simpleSentences = _simplify(sentencesToSimplify, lang)
 
         if (len(sentencesToSimplify) != len(simpleSentences)):
             raise RuntimeError("SENTENCE_SIMPLIFICATION_ERROR")
         else:
-            for origSentence, simpleSentence in zip(sentencesToSimplify,
-                                                    simpleSentences):
-                cache[cacheKey(origSentence)] = simpleSentence
+            simplifications = dict(zip(sentencesToSimplify,
+                                       simpleSentences))
 
-    simpleSentences = []
-    for sentence in sentences:
-        simpleSentences.append(cache[cacheKey(sentence)])
+    with openCache('.simplification-cache.nts') as cache:
+        for origSentence, simpleSentence in simplifications.items():
+            cache[cacheKey(origSentence)] = simpleSentence
 
-    cache.close()
+        simpleSentences = []
+        for sentence in sentences:
+            simpleSentences.append(cache[cacheKey(sentence)])
 
     return simpleSentences
@@ -0,0 +1,151 @@
+"""
+Registry of summarization methods.
+
+Methods are imported only when selected on the command line, so that the
+command line tools start quickly.
+"""
+
+import sys
+import argparse
+import importlib
+import collections
+
+from .utils import budget
+
+METHODS = collections.OrderedDict([
+    ('linBilmes', 'clstk.linBilmes'),
+    ('coRank', 'clstk.coRank'),
+    ('simFusion', 'clstk.simFusion'),
+])
+
+
+def getSummarizer(name):
+    """
+    Get summarizer module by name
+
+    :param name: Name of the method, one of :data:`METHODS`
+    :returns: summarizer module
+    """
+    if name not in METHODS:
+        raise ValueError("Unknown summarization method: %s" % name)
+
+    return importlib.import_module(METHODS[name])
+
+
+def getSummaryNames(params):
+    """
+    Get names of the summaries generated with params
+
+    Summaries are generated for each target language, for each ``alpha``
+    value of methods having it, one for each size budget. Names are
+    ``<lang>/alpha=<alpha>/<budget>``, e.g. ``hi/alpha=0.3/100w``, leaving
+    out parts with only one value.
+
+    :param params: params for a summarizer
+    :returns: list of names, in the order summaries are returned by the
+              summarizer's ``summarize``
+    """
+    langs = params['targetLang']
+    if isinstance(langs, basestring):
+        langs = [langs]
+
+    alphas = params.get('alpha', [None])
+    if isinstance(alphas, (int, float)):
+        alphas = [alphas]
+
+    alphas = map(lambda a: "alpha=%s" % a, alphas)
+    budgets = map(budget.getBudgetName, params['size'])
+
+    names = []
+    for lang in langs:
+        for alpha in alphas:
+            for name in budgets:
+                parts = filter(lambda (part, values): len(values) > 1,
+                               [(lang, langs), (alpha, alphas),
+                                (name, budgets)])
+                names.append("/".join(map(lambda p: p[0], parts)) or name)
+
+    return names
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise ValueError(message)
+
+
+def parseParams(name, args=[]):
+    """
+    Get params for a summarizer from command line style arguments
+
+    :param name: Name of the method
+    :param args: list of arguments as accepted by ``sum.py``, without the
+                 source directory
+    :returns: params for the summarizer
+    :raises ValueError: if the arguments are not valid
+    """
+    if '-h' in args or '--help' in args:
+        raise ValueError("Help is not available here")
+
+    summarizer = getSummarizer(name)
+
+    parser = _ArgumentParser(prog=name)
+    summarizer.setupArgparse(parser)
+
+    return summarizer.getParams(parser.parse_args(args))
+
+
+def summarizeDocuments(name, documents, params):
+    """
+    Summarize documents held in memory, without writing them to files
+
+    Params for the method can be created with :func:`parseParams`, e.g.::
+
+        params = parseParams('coRank', ['-s', '100w', '-l', 'hi'])
+        summaries = summarizeDocuments('coRank', documents, params)
+
+    :param name: Name of the method
+    :param documents: list or other iterable, e.g. a generator, of
+                      documents as unicode strings
+    :param params: params for the summarizer
+    :returns: list of :class:`clstk.summary.Summary`, named by
+              :func:`getSummaryNames`
+    """
+    return getSummarizer(name).summarizeDocuments(documents, params)
+
+
+def getSelectedMethod(argv=None):
+    """
+    Get name of the method selected in command line arguments
+
+    :param argv: Command line arguments, defaults to ``sys.argv[1:]``
+    :returns: name of the method, or ``None`` if no method is selected
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    for arg in argv:
+        if not arg.startswith('-'):
+            return arg if arg in METHODS else None
+
+    return None
+
+
+def setupSubparsers(subparsers, parents, argv=None):
+    """
+    Add a subparser for each method
+
+    Only the selected method is imported to set up its arguments. Other
+    subparsers only accept the common arguments.
+
+    :param subparsers: Object returned by
+                       :meth:`argparse.ArgumentParser.add_subparsers`
+    :param parents: Parent parsers with common arguments
+    :param argv: Command line arguments, defaults to ``sys.argv[1:]``
+    """
+    selected = getSelectedMethod(argv)
+
+    for name in METHODS:
+        parser = subparsers.add_parser(name, parents=parents)
+
+        if name == selected:
+            getSummarizer(name).setupArgparse(parser)
@@ -1,5 +1,8 @@
 from sentenceCollection import SentenceCollection
 
+import logging
+logger = logging.getLogger("summary.py")
+
 
 class Summary(SentenceCollection):
     def charCount(self):
@@ -14,6 +17,14 @@ class Summary(SentenceCollection):
         """
         return sum(map(lambda s: s.tokenCount(), self._sentences))
 
+    def getSize(self, countTokens):
+        """
+        Get size of the summary as counted by a budget
+
+        :param countTokens: Whether to count tokens instead of characters
+        """
+        return self.tokenCount() if countTokens else self.charCount()
+
     def getSummary(self):
         """
         Get printable summary generated from source text
@@ -25,3 +36,47 @@ class Summary(SentenceCollection):
         Get printable summary generated from translated text
         """
         return "\n".join(map(lambda s: s.getTranslation(), self._sentences))
+
+
+def fillSummaries(sentences, order, sizeBudgets):
+    """
+    Fill a summary for each budget with sentences in ranked order, skipping
+    sentences that do not fit
+
+    The ranking is shared, so summaries of smaller budgets are filled from
+    the same ranked sentences.
+
+    :param sentences: list of :class:`clstk.sentence.Sentence`
+    :param order: Indices of the sentences, best first
+    :param sizeBudgets: list of pairs of size budget and whether it counts
+                        tokens
+    :returns: list of :class:`Summary`, one for each budget
+    """
+    summaries = []
+
+    for sizeBudget, countTokens in sizeBudgets:
+        logger.info("Summary budget: %d %s", sizeBudget,
+                    "tokens" if countTokens else "chars")
+
+        summary = Summary()
+        size = 0
+
+        for sentenceId in order:
+            if size >= sizeBudget:
+                break
+
+            sentence = sentences[sentenceId]
+            sentenceSize = sentence.tokenCount() if countTokens \
+                else sentence.charCount()
+
+            if size + sentenceSize <= sizeBudget:
+                logger.info("Sentence added with size: %d, ", sentenceSize)
+                summary.addSentence(sentence)
+                size += sentenceSize
+
+        logger.info("Summary size: %d chars, %d tokens",
+                    summary.charCount(), summary.tokenCount())
+
+        summaries.append(summary)
+
+    return summaries
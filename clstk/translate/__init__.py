@@ -0,0 +1,20 @@
+def getTranslator(name='google'):
+    """
+    Get translate function by name
+
+    Translator modules are imported only when requested.
+
+    :param name: One of ``google``, ``googleWeb`` or ``identity``
+    :returns: translate function, see
+              :func:`clstk.translate.googleTranslate.translate`
+    """
+    if name == 'google':
+        from .googleTranslate import translate
+    elif name == 'googleWeb':
+        from .googleTranslateWeb import translate
+    elif name == 'identity':
+        from .identityTranslate import translate
+    else:
+        raise ValueError("Unknown translator: %s" % name)
+
+    return translate
@@ -6,9 +6,9 @@ to be set with file continaining your key for Google Cloud account.
 
 See https://cloud.google.com/translate/docs/reference/libraries
 """
-import shelve
 
-from google.cloud import translate as googleTranslate
+from ..utils import profiling
+from ..utils.cache import openCache
 
 translate_client = None
 
@@ -17,6 +17,8 @@ def _translateText(text, source, target):
     global translate_client
 
     if not translate_client:
+        # The client library is slow to import, only load it when needed
+        from google.cloud import translate as googleTranslate
         translate_client = googleTranslate.Client()
 
     if len(text) >= 4500:
@@ -60,15 +62,18 @@ def translate(text, sourceLang, targetLang):
             text.strip(), sourceLang, targetLang
         ]).encode('utf-8')
 
-    cache = shelve.open('.translation-cache.google')
-
-    sentencesToTranslate = []
     sourceSentences = text.split("\n")
 
-    for sentence in sourceSentences:
-        if cacheKey(sentence) not in cache:
-            sentencesToTranslate.append(sentence)
+    with openCache('.translation-cache.google') as cache:
+        sentencesToTranslate = [sentence for sentence in sourceSentences
+                                if cacheKey(sentence) not in cache]
+
+    profiling.count('translationCacheHits',
+                    len(sourceSentences) - len(sentencesToTranslate))
+    profiling.count('translationCacheMisses', len(sentencesToTranslate))
 
+    # Translate without holding the cache, it may be used concurrently
+    translations = {}
     if len(sentencesToTranslate):
         textToTranslate = "\n".join(sentencesToTranslate)
         translation = _translateText(textToTranslate, sourceLang, targetLang)
@@ -78,19 +83,20 @@ def translate(text, sourceLang, targetLang):
         if (len(sentencesToTranslate) != len(translatedSentences)):
             raise RuntimeError("GOOGLE_TRANSLATION_ERROR")
         else:
-            for source, target in zip(sentencesToTranslate,
-                                      translatedSentences):
-                cache[cacheKey(source)] = target
+            translations = dict(zip(sentencesToTranslate,
+                                    translatedSentences))
 
-    sentences = []
-    for sentence in sourceSentences:
-        sentences.append({
-            "source": sentence.strip(),
-            "target": cache[cacheKey(sentence)]
-        })
+    with openCache('.translation-cache.google') as cache:
+        for source, target in translations.items():
+            cache[cacheKey(source)] = target
 
-    translation = "\n".join(map(lambda s: s['target'], sentences))
+        sentences = []
+        for sentence in sourceSentences:
+            sentences.append({
+                "source": sentence.strip(),
+                "target": cache[cacheKey(sentence)]
+            })
 
-    cache.close()
+    translation = "\n".join(map(lambda s: s['target'], sentences))
 
     return translation, sentences
@@ -10,7 +10,9 @@ import time
 import requests
 import re
 import json
-import shelve
+
+from ..utils import profiling
+from ..utils.cache import openCache
 
 window = {
     # 'TKK': config.get('TKK') or '0' TODO
@@ -174,15 +176,18 @@ def translate(text, sourceLang, targetLang, sentencePerLine=True):
             text.strip(), sourceLang, targetLang
         ]).encode('utf-8')
 
-    cache = shelve.open('.translation-cache.google')
-
-    sentencesToTranslate = []
     sourceSentences = text.split("\n")
 
-    for sentence in sourceSentences:
-        if cacheKey(sentence) not in cache:
-            sentencesToTranslate.append(sentence)
+    with openCache('.translation-cache.google') as cache:
+        sentencesToTranslate = [sentence for sentence in sourceSentences
+                                if cacheKey(sentence) not in cache]
 
+    profiling.count('translationCacheHits',
+                    len(sourceSentences) - len(sentencesToTranslate))
+    profiling.count('translationCacheMisses', len(sentencesToTranslate))
+
+    # Translate without holding the cache, it may be used concurrently
+    translations = {}
     if len(sentencesToTranslate):
         textToTranslate = "\n".join(sentencesToTranslate)
         translation, sentences = _translateText(textToTranslate,
@@ -193,19 +198,20 @@ def translate(text, sourceLang, targetLang, sentencePerLine=True):
         if (len(sentencesToTranslate) != len(translatedSentences)):
             raise RuntimeError("GOOGLE_TRANSLATION_ERROR")
         else:
-            for source, target in zip(sentencesToTranslate,
-                                      translatedSentences):
-                cache[cacheKey(source)] = target
+            translations = dict(zip(sentencesToTranslate,
+                                    translatedSentences))
 
-    sentences = []
-    for sentence in sourceSentences:
-        sentences.append({
-            "source": sentence.strip(),
-            "target": cache[cacheKey(sentence)]
-        })
+    with openCache('.translation-cache.google') as cache:
+        for source, target in translations.items():
+            cache[cacheKey(source)] = target
 
-    translation = "\n".join(map(lambda s: s['target'], sentences))
+        sentences = []
+        for sentence in sourceSentences:
+            sentences.append({
+                "source": sentence.strip(),
+                "target": cache[cacheKey(sentence)]
+            })
 
-    cache.close()
+    translation = "\n".join(map(lambda s: s['target'], sentences))
 
     return translation, sentences
@@ -0,0 +1,22 @@
+"""
+Offline translator which returns the source text unchanged.
+
+Useful for benchmarks and tests where no translation service is available.
+"""
+
+
+def translate(text, sourceLang, targetLang):
+    """
+    Translate text
+
+    :param text: Text, each line contains one sentence
+    :param sourceLang: Two-letter code for source language
+    :param targetLang: Two-letter code for target language
+
+    :returns: translated text and list of translated sentences
+    :rtype: (translation, sentences)
+    """
+    sentences = map(lambda s: {"source": s.strip(), "target": s},
+                    text.split("\n"))
+
+    return text, sentences
@@ -0,0 +1,68 @@
+"""
+Summary size budgets.
+
+A budget is a pair of maximum size and whether it counts tokens instead of
+characters. Several budgets can be given on the command line, e.g.
+``-s 100w 250w 665c``, to generate summaries of all sizes in one run.
+"""
+
+import argparse
+
+
+def parseBudget(value):
+    """
+    Parse a budget given on the command line
+
+    :param value: size, optionally followed by ``w`` for words or ``c`` for
+                  characters
+    :returns: pair of size and whether it counts tokens, or ``None`` if no
+              unit is given
+    """
+    units = {'w': True, 'c': False}
+    countTokens = units.get(value[-1:].lower())
+    number = value[:-1] if countTokens is not None else value
+
+    try:
+        size = int(number)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid size: %s" % value)
+
+    return size, countTokens
+
+
+def getBudgetName(budget):
+    """
+    Get a name for a budget, e.g. ``100w`` or ``665c``
+
+    :param budget: pair of size and whether it counts tokens
+    """
+    size, countTokens = budget
+    return "%d%s" % (size, "w" if countTokens else "c")
+
+
+def addBudgetParams(parser):
+    """
+    Add size arguments to an argument parser
+
+    :param parser: :class:`argparse.ArgumentParser`
+    """
+    parser.add_argument('-s', '--size', type=parseBudget, nargs='+',
+                        default=[(665, None)], metavar="N",
+                        help='Maximum size of the summary. Several sizes '
+                        'generate a summary for each of them, a size can be '
+                        'followed by `w` for words or `c` for characters, '
+                        'e.g. 100w 250w 665c')
+    parser.add_argument('-w', '--words', action="store_true",
+                        help='Caluated size as number of words instead of '
+                        'characters')
+
+
+def getBudgetParams(args):
+    """
+    Get budgets from parsed arguments
+
+    :returns: list of pairs of size and whether it counts tokens
+    """
+    return map(lambda (size, countTokens): (
+        size, args.words if countTokens is None else countTokens
+    ), args.size)
@@ -0,0 +1,75 @@
+"""
+Persistent caches backed by :mod:`shelve`.
+
+By default a cache is opened and closed for every use. A long-running process
+can keep caches open with :func:`keepOpen`, in which case changes are synced
+after every use instead. Use of a cache is serialized with a lock, as
+:mod:`shelve` does not support concurrent access.
+"""
+
+import shelve
+import threading
+import contextlib
+
+_keepOpen = False
+_shelves = {}
+_locks = {}
+_lock = threading.Lock()
+
+
+def keepOpen(keep=True):
+    """
+    Keep caches open between uses
+
+    :param keep: Whether to keep caches open. If ``False``, caches which are
+                 open are closed
+    """
+    global _keepOpen
+
+    _keepOpen = keep
+
+    if not keep:
+        closeAll()
+
+
+def _getLock(path):
+    with _lock:
+        return _locks.setdefault(path, threading.RLock())
+
+
+@contextlib.contextmanager
+def openCache(path):
+    """
+    Open a cache
+
+    Usage::
+
+        with cache.openCache('.translation-cache.google') as c:
+            ...
+
+    :param path: Path of the cache file
+    """
+    with _getLock(path):
+        if _keepOpen:
+            if path not in _shelves:
+                _shelves[path] = shelve.open(path)
+
+            try:
+                yield _shelves[path]
+            finally:
+                _shelves[path].sync()
+        else:
+            shelf = shelve.open(path)
+            try:
+                yield shelf
+            finally:
+                shelf.close()
+
+
+def closeAll():
+    """
+    Close all caches kept open
+    """
+    for path in _shelves.keys():
+        with _getLock(path):
+            _shelves.pop(path).close()
@@ -0,0 +1,182 @@
+"""
+Clustering of sparse sentence vectors.
+
+Spherical k-means clusters L2-normalized vectors by cosine similarity to the
+cluster centroids. It runs in-process on sparse vectors, with deterministic
+seeding, and computes similarities to the centroids in row blocks on a pool
+of threads.
+
+Cluster assignments are cached by a fingerprint of the vectors, so that the
+same sentences are not clustered again, e.g. across parameter settings or
+service requests.
+"""
+
+import hashlib
+import threading
+import collections
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+import logging
+logger = logging.getLogger("clustering.py")
+
+_cache = collections.OrderedDict()
+_cacheLock = threading.Lock()
+_CACHE_SIZE = 32
+
+
+def getFingerprint(vectors):
+    """
+    Get a fingerprint of a sparse matrix
+
+    :param vectors: :class:`scipy.sparse.csr_matrix`
+    :returns: hex digest of shape and contents
+    """
+    vectors = vectors.tocsr()
+
+    digest = hashlib.sha1(str(vectors.shape) + str(vectors.dtype))
+    for array in (vectors.indptr, vectors.indices, vectors.data):
+        digest.update(np.ascontiguousarray(array).data)
+
+    return digest.hexdigest()
+
+
+def _getSimilarities(vectors, centroids, blockSize, threads):
+    transposed = centroids.T.tocsc()
+
+    def computeBlock(start):
+        return vectors[start:start + blockSize].dot(transposed).toarray()
+
+    starts = range(0, vectors.shape[0], blockSize)
+
+    if threads > 1 and len(starts) > 1:
+        pool = ThreadPool(threads)
+        try:
+            blocks = pool.map(computeBlock, starts)
+        finally:
+            pool.close()
+    else:
+        blocks = map(computeBlock, starts)
+
+    return np.vstack(blocks)
+
+
+def _getCentroids(vectors, labels, k):
+    import scipy.sparse
+    from sklearn import preprocessing
+
+    N = vectors.shape[0]
+    membership = scipy.sparse.csr_matrix(
+        (np.ones(N), (labels, np.arange(N))), shape=(k, N)
+    )
+
+    return preprocessing.normalize(membership.dot(vectors))
+
+
+def _seed(vectors, k, random):
+    # Greedy k-means++ seeding on cosine distance. Several candidates are
+    # sampled for each seed, and the one reducing distances most is kept
+    N = vectors.shape[0]
+    trials = 2 + int(np.log(k))
+
+    seeds = [random.randint(N)]
+    distances = 1 - vectors.dot(vectors[seeds[0]].T).toarray().ravel()
+
+    for _ in xrange(1, k):
+        distances = np.maximum(distances, 0)
+        total = distances.sum()
+
+        if total > 0:
+            candidates = random.choice(N, trials, p=distances / total)
+        else:
+            candidates = random.choice(np.setdiff1d(np.arange(N), seeds), 1)
+
+        candidateDistances = np.minimum(
+            distances[:, np.newaxis],
+            1 - vectors.dot(vectors[candidates].T).toarray()
+        )
+        best = candidateDistances.sum(axis=0).argmin()
+
+        seeds.append(candidates[best])
+        distances = candidateDistances[:, best]
+
+    return vectors[seeds]
+
+
+def sphericalKMeans(vectors, k, maxIter=30, seed=0, threads=1,
+                    blockSize=4096):
+    """
+    Cluster vectors with spherical k-means
+
+    :param vectors: ``(N, D)`` sparse matrix of vectors
+    :param k: Number of clusters
+    :param maxIter: Maximum number of iterations
+    :param seed: Seed for choosing the initial centroids
+    :param threads: Number of threads computing similarities to centroids
+    :param blockSize: Number of vectors in each block of similarities
+    :returns: ``numpy`` array of cluster ids of the vectors
+    """
+    import scipy.sparse
+    from sklearn import preprocessing
+
+    vectors = preprocessing.normalize(scipy.sparse.csr_matrix(vectors))
+    N = vectors.shape[0]
+    k = min(k, N)
+
+    random = np.random.RandomState(seed)
+    centroids = _seed(vectors, k, random)
+
+    labels = None
+    for i in xrange(maxIter):
+        similarities = _getSimilarities(vectors, centroids, blockSize,
+                                        threads)
+        newLabels = similarities.argmax(axis=1)
+
+        # Clusters left empty take the vectors farthest from their centroids
+        best = similarities[np.arange(N), newLabels]
+        empty = np.setdiff1d(np.arange(k), newLabels)
+        if len(empty):
+            farthest = np.argsort(best, kind='mergesort')[:len(empty)]
+            newLabels[farthest] = empty
+
+        if labels is not None and np.array_equal(labels, newLabels):
+            break
+
+        labels = newLabels
+        centroids = _getCentroids(vectors, labels, k)
+
+    logger.info("Spherical k-means finished after %d iterations", i + 1)
+
+    return labels
+
+
+def getClusters(vectors, k, method, **options):
+    """
+    Get cluster ids of vectors, using cached assignments if the same vectors
+    were clustered before with the same options
+
+    :param vectors: ``(N, D)`` sparse matrix of vectors
+    :param k: Number of clusters
+    :param method: function taking vectors, ``k`` and ``options``, and
+                   returning cluster ids, e.g. :func:`sphericalKMeans`
+    :param options: Options for the method
+    :returns: ``numpy`` array of cluster ids of the vectors
+    """
+    key = (getFingerprint(vectors), k, method.__name__,
+           tuple(sorted(options.items())))
+
+    with _cacheLock:
+        if key in _cache:
+            logger.info("Using cached clusters")
+            _cache[key] = _cache.pop(key)
+            return _cache[key]
+
+    labels = method(vectors, k, **options)
+
+    with _cacheLock:
+        _cache[key] = labels
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return labels
@@ -0,0 +1,177 @@
+"""
+Datasets of topics, each a set of documents summarized together.
+
+A dataset is one of
+
+- a directory with a directory for each topic, containing a file for each
+  document
+- a tar archive with the same layout, i.e. members ``<topic>/<doc>``,
+  optionally inside a root directory and compressed with gzip or bzip2
+- a JSONL file, optionally compressed with gzip, with an object for each
+  document having ``topic``, ``doc`` and ``text``
+
+Archives and JSONL files are streamed without extracting them, holding only
+the documents of one topic at a time. Documents of a topic need to be
+consecutive in them, as they are in archives created from directories.
+"""
+
+import os
+import gzip
+import json
+import tarfile
+import collections
+
+import logging
+logger = logging.getLogger("dataset.py")
+
+JSONL_EXTENSIONS = ('.jsonl', '.jsonl.gz')
+
+
+class DatasetError(ValueError):
+    """
+    Raised when a dataset cannot be read, e.g. of an unknown format
+    """
+    pass
+
+
+def getFormat(path):
+    """
+    Get format of a dataset
+
+    :param path: Path of the dataset
+    :returns: ``directory``, ``jsonl`` or ``tar``
+    :raises DatasetError: if the format is not known
+    """
+    if os.path.isdir(path):
+        return 'directory'
+
+    if path.endswith(JSONL_EXTENSIONS):
+        return 'jsonl'
+
+    if os.path.isfile(path) and tarfile.is_tarfile(path):
+        return 'tar'
+
+    raise DatasetError("Unknown dataset format: %s" % path)
+
+
+def _readTar(path, topics):
+    # Stream mode reads members in order without seeking, which also works
+    # for compressed archives
+    with tarfile.open(path, mode='r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+
+            parts = os.path.normpath(member.name).split(os.sep)
+            if len(parts) < 2:
+                logger.warning("Skipping %s, not inside a topic directory",
+                               member.name)
+                continue
+
+            topic, doc = parts[-2:]
+            if topics is not None and topic not in topics:
+                continue
+
+            yield topic, doc, tar.extractfile(member).read().decode('utf-8')
+
+
+def _readJsonl(path, topics):
+    opener = gzip.open if path.endswith('.gz') else open
+
+    with opener(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+
+            record = json.loads(line)
+            topic = unicode(record['topic'])
+            if topics is not None and topic not in topics:
+                continue
+
+            yield topic, record.get('doc'), record['text']
+
+
+def _groupTopics(documents):
+    seen = set()
+    topic, texts = None, []
+
+    for documentTopic, _, text in documents:
+        if documentTopic != topic:
+            if texts:
+                yield topic, texts
+
+            if documentTopic in seen:
+                raise DatasetError("Documents of topic %s are not consecutive"
+                                 % documentTopic)
+
+            seen.add(documentTopic)
+            topic, texts = documentTopic, []
+
+        texts.append(text)
+
+    if texts:
+        yield topic, texts
+
+
+def readTopics(path, topics=None):
+    """
+    Read topics of a dataset
+
+    :param path: Path of the dataset, see :func:`getFormat`
+    :param topics: Names of topics to read, e.g. topics having reference
+                   summaries. Other topics are skipped. Defaults to all
+                   topics
+    :returns: generator of pairs of topic name and its documents, an
+              iterable of unicode strings. Topics of a directory are read in
+              order of ``topics``, and topics of other datasets in their
+              order in the dataset
+    """
+    datasetFormat = getFormat(path)
+
+    if datasetFormat == 'directory':
+        from ..corpus import readDocuments
+
+        if topics is None:
+            topics = sorted(os.walk(path).next()[1])
+
+        for topic in topics:
+            yield topic, readDocuments(os.path.join(path, topic))
+
+        return
+
+    if topics is not None:
+        topics = set(topics)
+
+    reader = _readTar if datasetFormat == 'tar' else _readJsonl
+    for topic, texts in _groupTopics(reader(path, topics)):
+        yield topic, texts
+
+
+def getSummaryRecords(topic, names, summaries):
+    """
+    Get JSON records of the summaries of a topic
+
+    :param topic: Name of the topic
+    :param names: Names of the summaries, see
+                  :func:`clstk.summarizers.getSummaryNames`
+    :param summaries: list of :class:`clstk.summary.Summary`
+    :returns: list of ``dict`` with ``topic``, ``name``, ``summary`` in the
+              target language and ``source_summary``
+    """
+    return map(lambda (name, summary): collections.OrderedDict([
+        ("topic", topic),
+        ("name", name),
+        ("summary", summary.getTargetSummary()),
+        ("source_summary", summary.getSummary()),
+    ]), zip(names, summaries))
+
+
+def writeSummaryRecords(f, records):
+    """
+    Write summary records as JSON lines
+
+    :param f: File to write to
+    :param records: list of records from :func:`getSummaryRecords`
+    """
+    for record in records:
+        f.write(json.dumps(record) + "\n")
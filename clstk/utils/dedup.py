@@ -0,0 +1,169 @@
+"""
+Near-duplicate sentence detection with MinHash signatures and LSH banding.
+
+Sentences are represented by sets of word shingles. Their MinHash signatures
+estimate Jaccard similarity, and banding the signatures finds candidate pairs
+without comparing every pair of sentences.
+"""
+
+import re
+import zlib
+import collections
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_wordRegex = re.compile(r"\w+", re.UNICODE)
+
+
+def getShingles(text, size=3):
+    """
+    Get word shingles of a text
+
+    :param text: text as unicode string
+    :param size: Number of words in a shingle
+    :returns: ``set`` of shingles. Texts shorter than ``size`` words have
+              a single shingle
+    """
+    words = _wordRegex.findall(text.lower())
+
+    if len(words) <= size:
+        return set([u" ".join(words)])
+
+    return set(u" ".join(words[i:i + size])
+               for i in xrange(len(words) - size + 1))
+
+
+def getBands(threshold, numPerm):
+    """
+    Get number of bands and rows per band for a Jaccard threshold
+
+    Pairs with similarity ``(1 / bands) ** (1 / rows)`` become candidates
+    with probability of about one half. The pair closest to the threshold is
+    chosen.
+
+    :param threshold: Jaccard similarity threshold
+    :param numPerm: Number of permutations in a signature
+    :returns: pair of number of bands and rows per band
+    """
+    options = [(b, numPerm // b) for b in xrange(1, numPerm + 1)]
+
+    return min(options,
+               key=lambda (b, r): abs((1. / b) ** (1. / r) - threshold))
+
+
+class NearDuplicateIndex(object):
+    """
+    Groups near-duplicate texts, keeping the first text of each group as its
+    representative
+
+    Texts are added in batches, and texts of later batches are grouped with
+    representatives of earlier ones.
+    """
+
+    def __init__(self, threshold=.8, numPerm=64, shingleSize=3, seed=1):
+        """
+        :param threshold: Estimated Jaccard similarity of word shingles
+                          above which texts are near duplicates
+        :param numPerm: Number of permutations in MinHash signatures
+        :param shingleSize: Number of words in a shingle
+        :param seed: Seed for the permutations
+        """
+        self._threshold = threshold
+        self._shingleSize = shingleSize
+
+        self._bands, self._rows = getBands(threshold, numPerm)
+        self._numPerm = self._bands * self._rows
+
+        random = np.random.RandomState(seed)
+        self._a = random.randint(1, _MAX_HASH, self._numPerm) \
+            .astype(np.uint64)
+        self._b = random.randint(0, _MAX_HASH, self._numPerm) \
+            .astype(np.uint64)
+
+        self._buckets = [collections.defaultdict(list)
+                         for _ in xrange(self._bands)]
+        self._signatures = []
+        self._support = []
+        self._representatives = []
+        self._indices = {}
+
+    def getSignature(self, text):
+        """
+        Get MinHash signature of a text
+
+        :param text: text as unicode string
+        :returns: ``numpy`` array of ``numPerm`` hash values
+        """
+        hashes = np.array([zlib.crc32(s.encode('utf-8')) & _MAX_HASH
+                           for s in getShingles(text, self._shingleSize)],
+                          dtype=np.uint64)
+
+        permuted = (np.outer(self._a, hashes) + self._b[:, np.newaxis]) \
+            % _MERSENNE_PRIME
+
+        return (permuted & _MAX_HASH).min(axis=1)
+
+    def _getBandKeys(self, signature):
+        return [signature[i * self._rows:(i + 1) * self._rows].tostring()
+                for i in xrange(self._bands)]
+
+    def _findRepresentative(self, signature, keys):
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, []))
+
+        best, bestSimilarity = None, self._threshold
+        for candidate in sorted(candidates):
+            similarity = np.mean(self._signatures[candidate] == signature)
+            if similarity >= bestSimilarity:
+                best, bestSimilarity = candidate, similarity
+
+        return best
+
+    def add(self, texts):
+        """
+        Add texts to the index
+
+        Longer texts are added first, so that they represent their group.
+
+        :param texts: iterable of unicode strings
+        :returns: pair of list of new representative texts, and ``dict``
+                  mapping representatives, old or new, to number of texts
+                  grouped with them in this batch
+        """
+        representatives = []
+        added = collections.Counter()
+
+        for text in sorted(texts, key=lambda t: (-len(t), t)):
+            signature = self.getSignature(text)
+            keys = self._getBandKeys(signature)
+
+            index = self._findRepresentative(signature, keys)
+
+            if index is None:
+                index = len(self._representatives)
+                self._representatives.append(text)
+                self._indices[text] = index
+                self._signatures.append(signature)
+                self._support.append(0)
+
+                for bucket, key in zip(self._buckets, keys):
+                    bucket[key].append(index)
+
+                representatives.append(text)
+
+            self._support[index] += 1
+            added[self._representatives[index]] += 1
+
+        return representatives, dict(added)
+
+    def getSupport(self, text):
+        """
+        Get number of texts grouped with a representative, including itself
+
+        :param text: Representative text
+        """
+        return self._support[self._indices[text]]
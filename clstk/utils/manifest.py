@@ -0,0 +1,138 @@
+"""
+Run manifests of batch summarization.
+
+A manifest records, for each topic summarized, a fingerprint of its
+documents, the method and its params, along with the summary files written
+and the summaries. Records are appended as JSON lines and flushed one at a
+time, so a manifest survives an interrupted run.
+
+The manifest is also a cache of results by fingerprint. A rerun can reuse
+the summaries of topics whose fingerprint was recorded, whether by an
+interrupted run or by another parameter setting of a sweep with the same
+effective params.
+"""
+
+import os
+import json
+import hashlib
+
+import logging
+logger = logging.getLogger("manifest.py")
+
+
+def getDocumentsFingerprint(documents):
+    """
+    Get a fingerprint of the documents of a topic
+
+    :param documents: list of documents as unicode strings
+    :returns: hex digest, independent of the order of the documents
+    """
+    digests = sorted(hashlib.sha1(document.encode('utf-8')).hexdigest()
+                     for document in documents)
+
+    return hashlib.sha1("\n".join(digests)).hexdigest()
+
+
+def getFingerprint(method, params, documentsFingerprint):
+    """
+    Get a fingerprint of summarizing documents with a method and params
+
+    :param method: Name of the summarizer
+    :param params: params for the summarizer
+    :param documentsFingerprint: fingerprint from
+                                 :func:`getDocumentsFingerprint`
+    :returns: hex digest
+    """
+    key = json.dumps([method, params, documentsFingerprint], sort_keys=True,
+                     default=repr)
+
+    return hashlib.sha1(key).hexdigest()
+
+
+class Manifest(object):
+    """
+    Run manifest, appended to as topics are summarized
+    """
+
+    def __init__(self, path):
+        """
+        Load records of an existing manifest, if any
+
+        :param path: Path of the manifest
+        """
+        self._path = path
+        self._records = {}
+        self._file = None
+
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Last line of an interrupted run
+                        logger.warning("Skipping incomplete record in %s",
+                                       path)
+                        continue
+
+                    self._records[record["fingerprint"]] = record
+
+            logger.info("Loaded %d records from %s", len(self._records),
+                        path)
+
+    def __len__(self):
+        return len(self._records)
+
+    def find(self, fingerprint):
+        """
+        Find summaries recorded with a fingerprint
+
+        :param fingerprint: fingerprint from :func:`getFingerprint`
+        :returns: record with ``topic``, ``fingerprint``, ``outputs``, the
+                  summary files written, and ``summaries``, see
+                  :func:`clstk.utils.dataset.getSummaryRecords`, or ``None``
+        """
+        return self._records.get(fingerprint)
+
+    def record(self, topic, fingerprint, outputs, summaries):
+        """
+        Append a record of a summarized topic
+
+        :param topic: Name of the topic
+        :param fingerprint: fingerprint from :func:`getFingerprint`
+        :param outputs: Paths of the summary files written
+        :param summaries: list of summary records, see
+                          :func:`clstk.utils.dataset.getSummaryRecords`
+        """
+        record = {
+            "topic": topic,
+            "fingerprint": fingerprint,
+            "outputs": outputs,
+            "summaries": summaries,
+        }
+        self._records[fingerprint] = record
+
+        if self._file is None:
+            self._file = open(self._path, "a+")
+
+            # Complete the last line of an interrupted run
+            self._file.seek(0, os.SEEK_END)
+            if self._file.tell():
+                self._file.seek(-1, os.SEEK_END)
+                complete = self._file.read(1) == "\n"
+
+                self._file.seek(0, os.SEEK_END)
+                if not complete:
+                    self._file.write("\n")
+
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """
+        Close the manifest file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,12 +1,29 @@
 # -*- coding: utf-8 -*-
 
+import functools
 from collections import defaultdict
 
-import nltk
+# nltk is slow to import, it is imported in each function instead
+
+
+def _memoize(func):
+    # Tokenizers, stemmers and stopwords are expensive to construct, keep
+    # them around for later calls, e.g. in a long-running service
+    results = {}
+
+    @functools.wraps(func)
+    def memoized(*args, **kwargs):
+        key = args + tuple(sorted(kwargs.items()))
+        if key not in results:
+            results[key] = func(*args, **kwargs)
+        return results[key]
+
+    return memoized
 
 # CORENLP_JAR = os.getenv("CORENLP_JAR")
 
 
+@_memoize
 def getSentenceSplitter():
     """
     Get sentence splitter function
@@ -14,12 +31,15 @@ def getSentenceSplitter():
     :returns: A function which takes a string and return list of sentence
               as strings.
     """
+    import nltk
+
     def _sent_splitter(text):
         return nltk.sent_tokenize(text, 'english')
 
     return _sent_splitter
 
 
+@_memoize
 def getTokenizer(lang):
     """
     Get tokenizer for a given language
@@ -38,12 +58,14 @@ def getTokenizer(lang):
     # return StanfordTokenizer(CORENLP_JAR).tokenize
 
     if lang == 'en':
+        import nltk
         return nltk.word_tokenize
     else:
         from polyglot.text import Text
         return lambda t: Text(t).words
 
 
+@_memoize
 def getDetokenizer(lang):
     """
     Get detokenizer for a given language
@@ -52,19 +74,31 @@ def getDetokenizer(lang):
     :returns: detokenizer, which takes list of tokens and returns a sentence
               as string
     """
+    import nltk.tokenize.treebank
     d = nltk.tokenize.treebank.TreebankWordDetokenizer()
     return d.detokenize
 
 
-def getStemmer():
+@_memoize
+def getStemmer(original=False):
     """
     Get stemmer. For now returns Porter Stemmer
 
+    :param original: Use the original Porter algorithm, as used by
+                     ROUGE-1.5.5, instead of NLTK's extended version
     :returns: stemmer, which takes a token and returns its stem
     """
+    import nltk.stem
+
+    if original:
+        return nltk.stem.PorterStemmer(
+            mode=nltk.stem.PorterStemmer.ORIGINAL_ALGORITHM
+        ).stem
+
     return nltk.stem.PorterStemmer().stem
 
 
+@_memoize
 def getStopwords(lang):
     """
     Get list of stopwords for a given language
@@ -72,6 +106,8 @@ def getStopwords(lang):
     :param lang: language
     :returns: list of stopwords including common puncuations
     """
+    import nltk.corpus
+
     stopwords = defaultdict(list, {
         # 'gu': ["છે", u"અને", u"આ", u"પણ", u"કે", u"માટે", u"જ", u"એક", u"પર", u"હોય", u"જાય", u"તો", u"થઈ", u"થાય", u"આવે", u"વધારે", u"સાથે", u"કરી", u"નથી", u"જે", u"સુધી", u"શકે", u"પછી", u"કરે", u"અહીં", u"એ", u"કોઈ", u"તથા", u"રીતે", u"દૂર", u"કારણે", u"જો", u"કરવામાં", u"આવેલ", u"રહે", u"શકાય", u"રોગ", u"તમે", u"ન", u"અથવા", u"તેમજ", u"ખૂબ", u"તે", u"દ્વારા", u"સૌથી", u"આવી", u"પરંતુ", u"ઉપયોગ", u"મળે"],  # noqa: E501
         # 'hi': [u"है", u"के", u"में", u"से", u"की", u"का", u"हैं", u"को", u"और", u"पर", u"भी", u"हो", u"एक", u"लिए", u"यह", u"ही", u"इस", u"तो", u"जाता", u"नहीं", u"कि", u"होता", u"या", u"यहाँ", u"कर", u"तथा", u"व", u"तक", u"होती", u"होने", u"करने", u"जाती", u"जो", u"एवं", u"था", u"कारण", u"किया", u"ने", u"सकता", u"जा", u"कुछ", u"कम", u"साथ", u"न", u"चाहिए"],  # noqa: E501
@@ -0,0 +1,342 @@
+"""
+Instrumentation for pipeline stages.
+
+Stages are wrapped in named timers and events are counted. Everything is
+recorded in a per-topic record, which can be written as a JSON line.
+Optionally a single stage can be profiled with :mod:`cProfile`.
+
+Stages nest, e.g. ``similarity`` may run inside ``objectives``. Stage times
+are exclusive: time spent in a nested stage counts only for that stage, and
+not for the stages around it, so times of all stages add up to the wall time
+of the outermost ones, recorded as ``wall``.
+
+With memory accounting, resident set size and its peak (``VmHWM``) are
+recorded around each stage. Sizes of large arrays are recorded with
+:func:`recordSize`. Allocations are not traced. Peaks are reset for every
+record, where supported, so that each topic is accounted for separately.
+
+Instrumentation is disabled by default. While disabled, :func:`stage` returns
+a shared no-op context manager and :func:`count` returns immediately, so the
+timers cost next to nothing.
+"""
+
+import sys
+import json
+import time
+import resource
+import threading
+import cProfile
+import collections
+
+import numpy as np
+
+_enabled = False
+_memory = False
+_record = None
+
+# Stages open in each thread, innermost last
+_open = threading.local()
+
+_profileStage = None
+_profileDump = None
+_profiler = None
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_nullStage = _NullStage()
+
+
+def _readStatus(field):
+    # Memory fields of /proc/self/status are in kilobytes
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+
+    return None
+
+
+def currentRSS():
+    """
+    Get current resident set size of the process
+
+    :returns: size in kilobytes, ``None`` if not available
+    """
+    return _readStatus("VmRSS")
+
+
+def peakRSS():
+    """
+    Get peak resident set size of the process since the last
+    :func:`resetPeakRSS`
+
+    :returns: size in kilobytes
+    """
+    peak = _readStatus("VmHWM")
+    if peak is None:
+        # ru_maxrss is in kilobytes on Linux, and is never reset
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak
+
+
+def resetPeakRSS():
+    """
+    Reset peak resident set size to the current size, where supported
+    (Linux 4.0 and later)
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except (IOError, OSError):
+        pass
+
+
+def _updateMemory(name, peakBefore):
+    memory = _record['memory'].setdefault(name, collections.OrderedDict())
+
+    peak = peakRSS()
+    memory['rss_kb'] = currentRSS()
+    memory['peak_rss_kb'] = max(memory.get('peak_rss_kb', 0), peak)
+    memory['peak_rss_growth_kb'] = \
+        memory.get('peak_rss_growth_kb', 0) + peak - peakBefore
+
+
+class _Stage(object):
+    def __init__(self, name):
+        self._name = name
+
+    def __enter__(self):
+        if _memory:
+            self._peakBefore = peakRSS()
+
+        self._profile = (self._name == _profileStage)
+        if self._profile:
+            _profiler.enable()
+
+        # Time of nested stages, subtracted from the time of this one
+        self._nested = 0.
+
+        if not hasattr(_open, 'stages'):
+            _open.stages = []
+        _open.stages.append(self)
+
+        self._start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.time() - self._start
+
+        if self._profile:
+            _profiler.disable()
+            _profiler.dump_stats(_profileDump)
+
+        _open.stages.pop()
+        if _open.stages:
+            _open.stages[-1]._nested += elapsed
+        else:
+            _record['wall'] = _record.get('wall', 0.) + elapsed
+
+        stages = _record['stages']
+        stages[self._name] = stages.get(self._name, 0.) + \
+            elapsed - self._nested
+
+        if _memory:
+            _updateMemory(self._name, self._peakBefore)
+
+        return False
+
+
+def enable(profileStage=None, profileDump=None, memory=False):
+    """
+    Enable instrumentation
+
+    :param profileStage: Name of a stage to profile with :mod:`cProfile`
+    :param profileDump: Path to dump profile stats of ``profileStage``.
+                        Stats are accumulated over all runs of the stage.
+                        Defaults to ``<profileStage>.prof``
+    :param memory: Whether to record resident set size around stages and
+                   sizes of arrays
+    """
+    global _enabled, _memory, _profileStage, _profileDump, _profiler
+
+    _enabled = True
+    _memory = memory
+
+    _profileStage = profileStage
+    _profileDump = profileDump or "%s.prof" % profileStage
+    _profiler = cProfile.Profile() if profileStage else None
+
+    startRecord()
+
+
+def disable():
+    """
+    Disable instrumentation
+    """
+    global _enabled, _memory, _profileStage, _profiler
+
+    _enabled = False
+    _memory = False
+    _profileStage = None
+    _profiler = None
+
+
+def isEnabled():
+    return _enabled
+
+
+def startRecord(**info):
+    """
+    Start a new record, e.g. for a new topic
+
+    :param info: key-value pairs to identify the record
+    """
+    global _record
+
+    _record = collections.OrderedDict(info)
+    _record['stages'] = collections.OrderedDict()
+    _record['counters'] = collections.OrderedDict()
+
+    if _memory:
+        _record['memory'] = collections.OrderedDict()
+        _record['sizes'] = collections.OrderedDict()
+
+        resetPeakRSS()
+
+
+def getRecord():
+    """
+    Get the current record
+
+    :returns: ``dict`` with exclusive stage times in seconds, wall time of
+              the outermost stages and counters
+    """
+    return _record
+
+
+def writeRecord(recordFile):
+    """
+    Write the current record as a JSON line
+
+    :param recordFile: file object to write to
+    """
+    recordFile.write(json.dumps(_record) + "\n")
+    recordFile.flush()
+
+
+def stage(name):
+    """
+    Get a context manager timing a named stage
+
+    Time spent in stages opened inside it is not counted for it. Memory is
+    measured around the stage, including nested stages.
+
+    Usage::
+
+        with profiling.stage('vectorize'):
+            ...
+
+    :param name: Name of the stage
+    """
+    if not _enabled:
+        return _nullStage
+
+    return _Stage(name)
+
+
+def count(name, n=1):
+    """
+    Increment a named counter
+
+    :param name: Name of the counter
+    :param n: Increment
+    """
+    if not _enabled:
+        return
+
+    counters = _record['counters']
+    counters[name] = counters.get(name, 0) + n
+
+
+def sizeOf(obj):
+    """
+    Get approximate size of an object in bytes
+
+    Arrays, sparse matrices and nested lists are measured including their
+    contents.
+
+    :param obj: object to measure
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+
+    if hasattr(obj, 'indptr'):
+        # scipy.sparse CSR/CSC matrix
+        return obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes
+
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(map(sizeOf, obj))
+
+    return sys.getsizeof(obj)
+
+
+def recordSize(name, obj):
+    """
+    Record size of a large object, if memory accounting is enabled
+
+    :param name: Name of the object
+    :param obj: object to measure, see :func:`sizeOf`
+    """
+    if not _memory:
+        return
+
+    _record['sizes'][name] = sizeOf(obj)
+
+
+def formatMemoryReport(records):
+    """
+    Format memory usage of records as a table
+
+    :param records: list of records from :func:`getRecord`
+    :returns: list of lines, one for each record
+    """
+    lines = ["%-20s %12s %-24s %s" % ("Topic", "Peak RSS MB",
+                                      "Largest growth", "Largest array")]
+
+    for record in records:
+        memory = record.get('memory', {})
+        sizes = record.get('sizes', {})
+
+        peak = max([m['peak_rss_kb'] for m in memory.values()] or [0])
+
+        stages = [(stageName, m) for stageName, m in memory.items()
+                  if stageName != 'total']
+
+        growth = "-"
+        if stages:
+            stageName, m = max(stages,
+                               key=lambda i: i[1]['peak_rss_growth_kb'])
+            growth = "%s (%.1f MB)" % (stageName,
+                                       m['peak_rss_growth_kb'] / 1024.)
+
+        largest = "-"
+        if sizes:
+            arrayName, size = max(sizes.items(), key=lambda i: i[1])
+            largest = "%s (%.1f MB)" % (arrayName, size / 1024. ** 2)
+
+        lines.append("%-20s %12.1f %-24s %s" % (record.get('topic', ''),
+                                                peak / 1024., growth,
+                                                largest))
+
+    return lines
@@ -0,0 +1,212 @@
+"""
+Helpers for graph-based ranking, shared by coRank and simFusion.
+"""
+
+import numpy as np
+
+from . import similarity
+
+
+def _normalizeSparse(getBlock, size):
+    import scipy.sparse
+
+    W = scipy.sparse.csr_matrix(getBlock(slice(0, size), slice(0, size)))
+    W = (W - scipy.sparse.diags(W.diagonal())).tocsr()
+    W.eliminate_zeros()
+
+    sums = np.asarray(W.sum(axis=1), dtype=np.float64).ravel()
+
+    # Rows without any weight stay zero
+    scale = np.zeros(size)
+    np.divide(1., sums, out=scale, where=(sums > 0))
+
+    return scipy.sparse.diags(scale.astype(W.dtype)).dot(W).tocsr(), sums
+
+
+def extendRowNormalized(previous, getBlock, size, chunkSize=1024,
+                        growth=1.25, memmapDir=None):
+    """
+    Row-normalize a weight matrix, reusing the normalized matrix for its
+    first rows and columns
+
+    Rows of the previous matrix are rescaled for their new sums instead of
+    being normalized again, and only weights of the appended rows and
+    columns are read. Self-loops, i.e. the diagonal, are dropped.
+
+    The matrix is a view of the first rows and columns of a larger storage
+    array. Updates grow it in place while the storage has room, and
+    otherwise copy it to a storage ``growth`` times larger than needed, so
+    that a series of small updates does not allocate a new matrix each time.
+    A cold start allocates exactly ``(N, N)``. Matrices returned by earlier
+    calls are overwritten.
+
+    Blocks are read ``chunkSize`` rows at a time into the result, so
+    temporaries of ``getBlock`` stay small, and the result has the dtype of
+    the blocks.
+
+    If ``getBlock`` returns sparse matrices, e.g. blocks of truncated
+    similarities from :func:`clstk.utils.similarity.getSubmatrix`, the
+    result is a sparse matrix too. It is normalized from scratch, which
+    takes time linear in the number of weights.
+
+    :param previous: Result of an earlier call for the first ``n`` nodes,
+                     or ``None``
+    :param getBlock: function taking row and column slices and returning
+                     that block of the weight matrix, as an array or a
+                     sparse matrix
+    :param size: Number of nodes, ``N``
+    :param chunkSize: Number of rows to read at a time
+    :param growth: Factor of extra room allocated when the storage is full
+    :param memmapDir: Directory to store a dense matrix in a memory-mapped
+                      file, e.g. along with memory-mapped similarities
+    :returns: tuple of row-normalized ``(N, N)`` matrix, row sums, and its
+              storage, to be passed as ``previous`` for the next update
+    """
+    import scipy.sparse
+
+    M, rowSums, storage = previous or (None, None, None)
+    n = 0 if M is None or storage is None else M.shape[0]
+    N = size
+
+    newColumns = getBlock(slice(0, n), slice(n, N))
+    if scipy.sparse.issparse(newColumns):
+        return _normalizeSparse(getBlock, N) + (None,)
+
+    dtype = newColumns.dtype if not n else M.dtype
+
+    if storage is None or storage.shape[0] < N:
+        capacity = N if storage is None else int(np.ceil(N * growth))
+        if memmapDir is not None:
+            storage = similarity.createMemmap((capacity, capacity), dtype,
+                                              memmapDir, prefix="rank-")
+        else:
+            storage = np.empty((capacity, capacity), dtype=dtype)
+
+    # New rows are normalized in place, after the previous rows, which are
+    # either already there or copied over
+    extended = storage[:N, :N]
+    newRows = extended[n:]
+
+    for start in xrange(n, N, chunkSize):
+        rows = slice(start, min(start + chunkSize, N))
+        newRows[rows.start - n:rows.stop - n] = getBlock(rows, slice(0, N))
+
+    newRows[np.arange(N - n), np.arange(n, N)] = 0
+
+    sums = np.concatenate([
+        (rowSums if n else np.zeros(0)) +
+        newColumns.sum(axis=1, dtype=np.float64),
+        newRows.sum(axis=1, dtype=np.float64)
+    ])
+
+    # Rows without any weight stay zero
+    scale = np.zeros(N)
+    np.divide(1., sums, out=scale, where=(sums > 0))
+
+    if n:
+        np.multiply(M, (rowSums * scale[:n])[:, np.newaxis],
+                    out=extended[:n, :n], casting='unsafe')
+        np.multiply(newColumns, scale[:n, np.newaxis], out=extended[:n, n:],
+                    casting='unsafe')
+    newRows *= scale[n:, np.newaxis].astype(dtype)
+
+    return extended, sums, storage
+
+
+def padScores(scores, size):
+    """
+    Pad saliency scores of ``n`` nodes with uniform scores for new nodes
+
+    :param scores: Scores of the first nodes, summing to one, or an
+                   ``(n, K)`` array with scores in each column
+    :param size: Number of nodes, ``N``
+    :returns: scores of ``N`` nodes, summing to one
+    """
+    n = len(scores)
+    return np.concatenate([scores * (float(n) / size),
+                           np.ones((size - n,) + scores.shape[1:]) / size])
+
+
+def getRedundancyOrders(scores, getColumns):
+    """
+    Order nodes by score, penalizing nodes similar to the ones ordered before
+
+    After each node is taken, scores of all nodes are reduced by their
+    weight to it times its score. Orders for several score vectors, e.g. for
+    several alpha values, are computed together.
+
+    :param scores: ``(N, K)`` array with ``K`` score vectors in columns
+    :param getColumns: function taking an array of ``K`` node indices and
+                       returning the ``(N, K)`` array of weights to them
+    :returns: ``(N, K)`` array of node indices, best first, for each score
+              vector
+    """
+    N, K = scores.shape
+    columns = np.arange(K)
+
+    remaining = scores.copy()
+    orders = np.empty((N, K), dtype=int)
+
+    for i in xrange(N):
+        best = np.argmax(remaining, axis=0)
+        orders[i] = best
+
+        remaining -= getColumns(best) * scores[best, columns]
+        remaining[best, columns] = float('-inf')
+
+    return orders
+
+
+def getPreviousState(state, size, **settings):
+    """
+    Get usable previous state for a warm start
+
+    :param state: ``dict`` kept by the caller between updates, or ``None``
+    :param size: Current number of nodes
+    :param settings: Settings the previous matrices depend on, the state is
+                     not usable if any of them changed
+    :returns: previous state, or an empty ``dict`` for a cold start
+    """
+    if not state or state.get('size', size + 1) > size:
+        return {}
+
+    if any(state.get(key) != value for key, value in settings.items()):
+        return {}
+
+    return state
+
+
+def getCentrality(similarities, method='degree', weights=None, iterations=10,
+                  damping=.85):
+    """
+    Get a cheap centrality score of each node of a similarity graph
+
+    :param similarities: ``(N, N)`` similarity matrix, dense or sparse
+    :param method: ``degree`` for weighted degree, i.e. row sums without
+                   self-similarity, or ``power`` for a few power iterations
+                   of PageRank
+    :param weights: Weights of the nodes, e.g. support of sentences, scaling
+                    their contribution to the centrality of the others
+    :param iterations: Number of power iterations
+    :param damping: Damping factor of PageRank
+    :returns: ``numpy`` array of ``N`` non-negative scores
+    """
+    N = similarities.shape[0]
+    weights = np.ones(N) if weights is None else np.asarray(weights, float)
+
+    if method == 'degree':
+        return similarities.dot(weights) - similarities.diagonal() * weights
+
+    if method != 'power':
+        raise ValueError("Unknown centrality method: %s" % method)
+
+    M = extendRowNormalized(
+        None, lambda r, c: similarity.getSubmatrix(similarities, r, c), N
+    )[0]
+    teleport = weights / weights.sum()
+
+    scores = teleport
+    for _ in xrange(iterations):
+        scores = damping * M.T.dot(scores) + (1 - damping) * teleport
+
+    return scores
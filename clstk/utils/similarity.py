@@ -0,0 +1,264 @@
+"""
+Cosine similarity matrices computed in row blocks.
+
+Blocks of rows are computed on a pool of threads, as the products release the
+GIL, and written into a matrix in memory or into a memory-mapped file for
+matrices larger than memory. Each row can optionally be truncated to its
+largest similarities, or to similarities above a threshold, giving a sparse
+matrix.
+
+Consumers should read similarities through :func:`getBlock`,
+:func:`getSubmatrix`, :func:`getColumn`, :func:`getRowSums` and
+:func:`getRows`, which work with all of these.
+"""
+
+import os
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+
+def _normalize(vectors):
+    from sklearn import preprocessing
+    return preprocessing.normalize(vectors)
+
+
+def _truncate(block, topK, threshold):
+    import scipy.sparse
+
+    if threshold is not None:
+        block[block < threshold] = 0
+
+    if topK is not None and topK < block.shape[1]:
+        # Indices of all but the largest topK in each row
+        smallest = np.argpartition(-block, topK, axis=1)[:, topK:]
+        block[np.arange(block.shape[0])[:, np.newaxis], smallest] = 0
+
+    return scipy.sparse.csr_matrix(block)
+
+
+def createMemmap(shape, dtype, memmapDir, prefix="similarities-"):
+    """
+    Create an array in a memory-mapped file
+
+    The file is removed right away, and its space is freed when the array
+    is no longer referenced.
+
+    :param shape: Shape of the array
+    :param dtype: dtype of the array
+    :param memmapDir: Directory to create the file in
+    :param prefix: Prefix of the file name
+    :returns: :class:`numpy.memmap`
+    """
+    fd, path = tempfile.mkstemp(prefix=prefix, dir=memmapDir)
+    os.close(fd)
+    try:
+        return np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+    finally:
+        os.remove(path)
+
+
+def cosineSimilarities(vectors, blockSize=1024, threads=1, memmapDir=None,
+                       topK=None, threshold=None):
+    """
+    Compute cosine similarities between all pairs of vectors
+
+    :param vectors: ``(N, D)`` array or sparse matrix of vectors
+    :param blockSize: Number of rows computed at a time
+    :param threads: Number of threads computing blocks
+    :param memmapDir: Directory to store the matrix in a memory-mapped file.
+                      The file is removed right away, and its space is freed
+                      when the matrix is no longer referenced
+    :param topK: Keep only the ``topK`` largest similarities of each row
+    :param threshold: Keep only similarities of at least this value
+    :returns: ``(N, N)`` array, :class:`numpy.memmap`, or
+              :class:`scipy.sparse.csr_matrix` if truncated. A truncated
+              matrix is not necessarily symmetric
+    """
+    vectors = _normalize(vectors)
+    N = vectors.shape[0]
+    dtype = vectors.dtype
+    sparse = topK is not None or threshold is not None
+
+    if sparse:
+        similarities = None
+    elif memmapDir is not None:
+        similarities = createMemmap((N, N), dtype, memmapDir)
+    else:
+        similarities = np.empty((N, N), dtype=dtype)
+
+    def computeBlock(start):
+        rows = slice(start, start + blockSize)
+
+        if sparse:
+            # Truncation needs whole rows
+            block = vectors[rows].dot(vectors.T)
+            if not isinstance(block, np.ndarray):
+                block = block.toarray()
+
+            return _truncate(block, topK, threshold)
+
+        # The matrix is symmetric, only columns from the diagonal on are
+        # computed and mirrored. Blocks write disjoint regions
+        block = vectors[rows].dot(vectors[start:].T)
+        if not isinstance(block, np.ndarray):
+            block = block.toarray()
+
+        similarities[rows, start:] = block
+        similarities[start:, rows] = block.T
+
+    starts = range(0, N, blockSize)
+
+    if threads > 1 and len(starts) > 1:
+        pool = ThreadPool(threads)
+        try:
+            blocks = pool.map(computeBlock, starts)
+        finally:
+            pool.close()
+    else:
+        blocks = map(computeBlock, starts)
+
+    if sparse:
+        import scipy.sparse
+        return scipy.sparse.vstack(blocks, format='csr') if blocks \
+            else scipy.sparse.csr_matrix((N, N), dtype=dtype)
+
+    return similarities
+
+
+def getBlock(similarities, rows, cols):
+    """
+    Get a block of a similarity matrix as an array
+
+    :param similarities: similarity matrix
+    :param rows: slice of rows
+    :param cols: slice of columns, or an array of column indices
+    :returns: ``numpy`` array
+    """
+    block = similarities[rows, cols]
+
+    if not isinstance(block, np.ndarray):
+        return block.toarray()
+
+    return np.asarray(block)
+
+
+def getSubmatrix(similarities, rows, cols):
+    """
+    Get a block of a similarity matrix, keeping sparse matrices sparse
+
+    :param similarities: similarity matrix
+    :param rows: slice of rows
+    :param cols: slice of columns
+    :returns: ``numpy`` array, or :class:`scipy.sparse.csr_matrix` if the
+              matrix is sparse
+    """
+    if isinstance(similarities, np.ndarray):
+        return np.asarray(similarities[rows, cols])
+
+    return similarities[rows, cols].tocsr()
+
+
+def getColumn(similarities, col):
+    """
+    Get a column of a similarity matrix as an array
+
+    :param similarities: similarity matrix
+    :param col: Index of the column
+    :returns: 1-D ``numpy`` array
+    """
+    return getBlock(similarities, slice(None), slice(col, col + 1)).ravel()
+
+
+def getRowSums(similarities):
+    """
+    Get sums of rows of a similarity matrix, in double precision
+
+    :param similarities: similarity matrix
+    :returns: 1-D ``numpy`` array
+    """
+    if isinstance(similarities, np.ndarray):
+        return similarities.sum(axis=1, dtype=np.float64)
+
+    return np.asarray(similarities.sum(axis=1), dtype=np.float64).ravel()
+
+
+class _SparseRow(dict):
+    def __missing__(self, key):
+        return 0.
+
+
+class _SparseRows(object):
+    def __init__(self, similarities):
+        self._similarities = similarities.tocsr()
+        self._rows = {}
+
+    def __getitem__(self, i):
+        if i not in self._rows:
+            row = self._similarities[i]
+            self._rows[i] = _SparseRow(zip(row.indices, row.data))
+
+        return self._rows[i]
+
+    def __len__(self):
+        return self._similarities.shape[0]
+
+
+def getRows(similarities):
+    """
+    Get a similarity matrix indexable as ``rows[i][j]``
+
+    Dense matrices are returned as they are. Rows of sparse matrices are
+    converted to ``dict`` on first access, which is fast to index from
+    Python.
+
+    :param similarities: similarity matrix
+    """
+    if isinstance(similarities, np.ndarray):
+        return similarities
+
+    return _SparseRows(similarities)
+
+
+def addSimilarityParams(parser):
+    """
+    Add similarity arguments to an argument parser
+
+    :param parser: :class:`argparse.ArgumentParser`
+    """
+    parser.add_argument('--similarity-block', type=int, default=1024,
+                        metavar="N",
+                        help='Number of rows of the similarity matrices '
+                        'computed at a time')
+    parser.add_argument('--similarity-threads', type=int, default=1,
+                        metavar="N",
+                        help='Number of threads computing similarities')
+    parser.add_argument('--similarity-memmap', type=str, default=None,
+                        metavar="dir",
+                        help='Store similarity matrices in memory-mapped '
+                        'files in this directory, for matrices larger than '
+                        'memory')
+    parser.add_argument('--similarity-top-k', type=int, default=None,
+                        metavar="K",
+                        help='Keep only the K largest similarities of each '
+                        'sentence, storing the matrices sparse')
+    parser.add_argument('--similarity-threshold', type=float, default=None,
+                        metavar="value",
+                        help='Keep only similarities of at least this value, '
+                        'storing the matrices sparse')
+
+
+def getSimilarityParams(args):
+    """
+    Get similarity params from parsed arguments
+
+    :returns: ``dict`` of keyword arguments for :func:`cosineSimilarities`
+    """
+    return {
+        'blockSize': args.similarity_block,
+        'threads': args.similarity_threads,
+        'memmapDir': args.similarity_memmap,
+        'topK': args.similarity_top_k,
+        'threshold': args.similarity_threshold,
+    }
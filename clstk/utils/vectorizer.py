@@ -0,0 +1,116 @@
+"""
+Term count vectorizers for sentence vectors.
+
+``count`` mode fits a vocabulary of unigrams and bigrams on the sentences,
+optionally pruned by document frequency and size. ``hashing`` mode maps terms
+to a fixed number of features without fitting a vocabulary, so memory does
+not grow with the vocabulary of the document set.
+
+IDF weights are applied separately, see
+:class:`clstk.sentenceCollection.SentenceCollection`.
+"""
+
+from . import nlp
+
+MODES = ['count', 'hashing']
+
+
+def getVectorizer(lang, getText, mode='count', nFeatures=2 ** 14, minDf=1,
+                  maxDf=1.0, maxFeatures=None):
+    """
+    Get a vectorizer producing term counts of sentences
+
+    :param lang: Two-letter language code of the sentences
+    :param getText: function getting text from a sentence
+    :param mode: ``count`` or ``hashing``
+    :param nFeatures: Number of features in ``hashing`` mode
+    :param minDf: Ignore terms in fewer sentences, a count or a fraction.
+                  ``count`` mode only
+    :param maxDf: Ignore terms in more sentences, a count or a fraction.
+                  ``count`` mode only
+    :param maxFeatures: Keep only this many most frequent terms. ``count``
+                        mode only
+    :returns: ``sklearn`` vectorizer
+    """
+    import sklearn.feature_extraction.text
+
+    def _tokenizeSentence(sentenceText):
+        tokens = map(nlp.getStemmer(),
+                     nlp.getTokenizer(lang)(sentenceText.lower())
+                     )
+
+        return tokens
+
+    options = {
+        'preprocessor': getText,
+        'tokenizer': _tokenizeSentence,
+        'stop_words': nlp.getStopwords(lang),
+        'ngram_range': (1, 2),
+    }
+
+    if mode == 'count':
+        return sklearn.feature_extraction.text.CountVectorizer(
+                    min_df=minDf,
+                    max_df=maxDf,
+                    max_features=maxFeatures,
+                    **options
+                )
+
+    if mode == 'hashing':
+        return sklearn.feature_extraction.text.HashingVectorizer(
+                    n_features=nFeatures,
+                    alternate_sign=False,
+                    norm=None,
+                    **options
+                )
+
+    raise ValueError("Unknown vectorizer mode: %s" % mode)
+
+
+def _documentFrequency(value):
+    # Integers are counts, other numbers fractions of sentences
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def addVectorizerParams(parser):
+    """
+    Add vectorizer arguments to an argument parser
+
+    :param parser: :class:`argparse.ArgumentParser`
+    """
+    parser.add_argument('--vectorizer', type=str, default='count',
+                        choices=MODES,
+                        help='Fit a vocabulary (`count`), or hash terms to '
+                        'a fixed number of features (`hashing`)')
+    parser.add_argument('--n-features', type=int, default=2 ** 14,
+                        metavar="N",
+                        help='Number of features for the hashing vectorizer')
+    parser.add_argument('--min-df', type=_documentFrequency, default=1,
+                        metavar="df",
+                        help='Ignore terms in fewer sentences, a count or a '
+                        'fraction')
+    parser.add_argument('--max-df', type=_documentFrequency, default=1.0,
+                        metavar="df",
+                        help='Ignore terms in more sentences, a count or a '
+                        'fraction')
+    parser.add_argument('--max-features', type=int, default=None,
+                        metavar="N",
+                        help='Keep only the N most frequent terms')
+
+
+def getVectorizerParams(args):
+    """
+    Get vectorizer params from parsed arguments
+
+    :returns: ``dict`` of keyword arguments for :func:`getVectorizer`
+    """
+    return {
+        'mode': args.vectorizer,
+        'nFeatures': args.n_features,
+        'minDf': args.min_df,
+        'maxDf': args.max_df,
+        'maxFeatures': args.max_features,
+    }
@@ -1,61 +1,536 @@
 import os
 import sys
 import argparse
+import itertools
+import collections
+import multiprocessing
 
 from clstk.utils import fs
+from clstk.utils import dataset
+from clstk.utils import manifest
 from clstk.utils import nlp
+from clstk.utils import profiling
 
 from clstk.evaluation import RougeScore
 from clstk.evaluation import ExternalRougeScore
 
-from clstk import linBilmes
-from clstk import coRank
-from clstk import simFusion
+from clstk import summarizers
 
 
-def runSummarizer(inDir, outFile, summarizer, args):
-    args = argparse.Namespace(**vars(args))
-    args.source_directory = inDir
+def getOutputDirs(summariesDir, params):
+    """
+    Get names of the summaries generated for each topic, and directories to
+    store them. A single summary is stored in ``summariesDir``, several
+    summaries, i.e. for several target languages or size budgets, in a
+    directory for each of them inside it, see
+    :func:`clstk.summarizers.getSummaryNames`.
+    """
+    names = summarizers.getSummaryNames(params)
 
-    summary = summarizer(args, silent=True)
-    with open(outFile, "w") as f:
-        f.write(summary.getTargetSummary().encode('utf8'))
+    if len(names) == 1:
+        return names, [summariesDir]
 
+    return names, map(lambda name: os.path.join(summariesDir, name), names)
 
-def summarizeAll(docNames, docsDir, outDir, summarizer, args):
-    fs.ensureDir(outDir)
+
+def writeSummaries(summaries, outFiles):
+    for summary, outFile in zip(summaries, outFiles):
+        with open(outFile, "w") as f:
+            f.write(summary["summary"].encode('utf8'))
+
+
+def getManifestPath(args):
+    return args.manifest or os.path.join(args.summaries_path,
+                                         "manifest.jsonl")
+
+
+def getCachedSummaries(runManifest, fingerprint, docName):
+    """
+    Get summaries recorded in the manifest with a fingerprint, possibly for
+    another topic with the same documents
+
+    :returns: pair of the manifest record and summary records of the topic,
+              or ``None``
+    """
+    cached = runManifest.find(fingerprint)
+    if cached is None:
+        return None
+
+    return cached, map(lambda summary: collections.OrderedDict([
+        ("topic", docName),
+        ("name", summary["name"]),
+        ("summary", summary["summary"]),
+        ("source_summary", summary["source_summary"]),
+    ]), cached["summaries"])
+
+
+def storeSummaries(docName, fingerprint, summaries, outFiles, runManifest,
+                   cached=None):
+    """
+    Write summaries of a topic and record them in the manifest, unless the
+    manifest already records them in ``outFiles``
+
+    :param summaries: summary records, see
+                      :func:`clstk.utils.dataset.getSummaryRecords`
+    :param cached: manifest record the summaries were taken from
+    """
+    if cached is not None and cached["outputs"] == outFiles and \
+            all(map(os.path.exists, outFiles)):
+        return
+
+    writeSummaries(summaries, outFiles)
+    runManifest.record(docName, fingerprint, outFiles, summaries)
+
+
+def summarizeAll(docNames, source, outDirs, summarizer, params, runManifest,
+                 resume=False, profileFile=None, summariesFile=None):
+    """
+    Summarize all topics of a dataset having references, and write the
+    summaries of each topic to ``outDirs``
+
+    :param docNames: Names of the topics
+    :param source: Path of the dataset, see
+                   :func:`clstk.utils.dataset.readTopics`
+    :param outDirs: Directories for the summaries, see
+                    :func:`getOutputDirs`
+    :param summarizer: summarizer module
+    :param params: params for the summarizer
+    :param runManifest: :class:`clstk.utils.manifest.Manifest` to record the
+                        summaries of each topic in
+    :param resume: Whether to reuse summaries recorded in the manifest with
+                   the same fingerprint instead of summarizing again
+    :param profileFile: File to write profiling records to
+    :param summariesFile: File to also write summaries to as JSON lines
+    :returns: profiling records of the topics summarized
+    :raises clstk.utils.dataset.DatasetError: if the dataset cannot be read,
+                                              or topics are not found in it
+    """
+    map(fs.ensureDir, outDirs)
+    names = summarizers.getSummaryNames(params)
 
     total = len(docNames)
+    records = []
+    summarized = set()
+    reused = 0
 
-    for i, inDirName in enumerate(docNames):
-        inDir = os.path.join(docsDir, inDirName)
-        outFile = os.path.join(outDir, inDirName)
+    for i, (docName, documents) in enumerate(dataset.readTopics(source,
+                                                                docNames)):
+        outFiles = map(lambda d: os.path.join(d, docName), outDirs)
 
         print "Summarizing:", i + 1, "/", total, "\r",
         sys.stdout.flush()
-        runSummarizer(inDir, outFile, summarizer, args)
+
+        documents = list(documents)
+        fingerprint = manifest.getFingerprint(
+            summarizer.__name__, params,
+            manifest.getDocumentsFingerprint(documents)
+        )
+
+        cached = None
+        if resume:
+            cached = getCachedSummaries(runManifest, fingerprint, docName)
+
+        if cached is not None:
+            cached, summaries = cached
+            reused += 1
+        else:
+            profiling.startRecord(topic=docName)
+            with profiling.stage('total'):
+                summaries = dataset.getSummaryRecords(
+                    docName, names,
+                    summarizer.summarizeDocuments(documents, params)
+                )
+
+            records.append(profiling.getRecord())
+            if profileFile:
+                profiling.writeRecord(profileFile)
+
+        storeSummaries(docName, fingerprint, summaries, outFiles,
+                       runManifest, cached)
+        if summariesFile:
+            dataset.writeSummaryRecords(summariesFile, summaries)
+
+        summarized.add(docName)
 
     print
 
+    if resume:
+        print "Reused summaries of", reused, "/", total, "topics"
+
+    missing = [docName for docName in docNames if docName not in summarized]
+    if missing:
+        raise dataset.DatasetError("Topics not found in %s: %s" %
+                                   (source, ", ".join(missing)))
+
+    return records
+
 
 def getAvailableReferences(refsDir):
     return os.walk(refsDir).next()[1]
 
 
-def getRougeScore(summaryNames, summariesDir, refsDir):
-    summaryRefsList = []
+def getReferenceIndex(summaryNames, refsDir):
+    refIndex = {}
 
     for summaryName in summaryNames:
-        summaryPath = os.path.join(summariesDir, summaryName)
         summaryRefsDir = os.path.join(refsDir, summaryName)
-        refPaths = map(lambda f: os.path.join(summaryRefsDir, f),
-                       os.walk(summaryRefsDir).next()[2])
+        refIndex[summaryName] = map(lambda f: os.path.join(summaryRefsDir, f),
+                                    os.walk(summaryRefsDir).next()[2])
+
+    return refIndex
+
+
+def getSummaryRefsList(summaryNames, summariesDir, refIndex):
+    return map(lambda summaryName: (os.path.join(summariesDir, summaryName),
+                                    refIndex[summaryName]),
+               summaryNames)
+
+
+def getRougeScorer(args):
+    return RougeScore(
+        stemmer=nlp.getStemmer(original=True),
+        compat=True,
+        length_limit=args.rouge_length_limit,
+        byte_limit=args.rouge_byte_limit
+    )
 
-        summaryRefsList.append((summaryPath, refPaths))
 
-    ExternalRougeScore().rouge(summaryRefsList)
+def getRougeScore(summaryNames, summariesDir, refsDir, args, jsonPath=None):
+    """
+    Compute ROUGE scores of summaries, and print them
+
+    :returns: pair of results, and whether they match the external ROUGE
+              if parity is checked
+    """
+    summaryRefsList = getSummaryRefsList(
+        summaryNames, summariesDir, getReferenceIndex(summaryNames, refsDir)
+    )
+
+    externalResults = None
+    if args.external_rouge or args.rouge_parity:
+        externalResults = ExternalRougeScore(
+            length_limit=args.rouge_length_limit,
+            byte_limit=args.rouge_byte_limit,
+            shards=args.rouge_shards,
+            processes=args.rouge_processes,
+            resamples=args.rouge_resamples,
+            seed=args.rouge_seed
+        ).rouge(summaryRefsList)
+        print "-"
+
+    results = getRougeScorer(args).rouge(
+        summaryRefsList,
+        processes=args.rouge_processes,
+        resamples=args.rouge_resamples,
+        seed=args.rouge_seed,
+        json_path=jsonPath,
+        rouge_types=args.rouge_types
+    )
+
+    if args.rouge_parity:
+        return results, checkRougeParity(results, externalResults)
+
+    return results, True
+
+
+def checkRougeParity(results, externalResults, tolerance=1e-5):
+    """
+    Compare in-process ROUGE averages with the ones reported by ROUGE-1.5.5,
+    which are rounded to five decimals. Parity fails if ROUGE-1.5.5 reported
+    none of the computed rouge types, e.g. when it did not run.
+    """
+    compared = filter(lambda t: t in results, externalResults.keys())
+
     print "-"
-    RougeScore(stemmer=nlp.getStemmer()).rouge(summaryRefsList)
+    if not compared:
+        print "ROUGE-1.5.5 reported no results to compare  MISMATCH"
+        return False
+
+    matches = True
+    for rougeType in compared:
+        externalResult = externalResults[rougeType]
+
+        diff = max(
+            abs(round(results[rougeType]["average"][measure], 5) - value)
+            for measure, value in externalResult["average"].items()
+        )
+        matches = matches and diff <= tolerance
+
+        print "%s parity  max abs diff: %0.5f  %s" % (
+            rougeType, diff, "OK" if diff <= tolerance else "MISMATCH"
+        )
+
+    return matches
+
+
+def getSweepGrid(sweepSpecs, args):
+    """
+    Parse ``name=value1,value2,...`` sweep specifications. Values are
+    converted to the type of the corresponding argument.
+    """
+    grid = []
+
+    for spec in sweepSpecs:
+        name, _, values = spec.partition('=')
+        name = name.strip().lstrip('-').replace('-', '_')
+
+        if not hasattr(args, name) or not values:
+            raise ValueError("Invalid sweep parameter: %s" % spec)
+
+        current = getattr(args, name)
+        if isinstance(current, list):
+            # Values of parameters taking several numbers are swept one by
+            # one
+            if not current or not isinstance(current[0], (int, float)):
+                raise ValueError("Parameter `%s` takes several values and "
+                                 "cannot be swept" % name)
+            current = current[0]
+
+        valueType = type(current) if isinstance(current, (int, float)) \
+            and not isinstance(current, bool) else str
+
+        grid.append((name, map(valueType, values.split(','))))
+
+    return grid
+
+
+def getSweepConfigs(grid, args):
+    configs = []
+
+    for values in itertools.product(*map(lambda g: g[1], grid)):
+        configArgs = argparse.Namespace(**vars(args))
+        for (name, _), value in zip(grid, values):
+            setattr(configArgs, name,
+                    [value] if isinstance(getattr(args, name), list)
+                    else value)
+
+        configName = ",".join("%s=%s" % (name, value)
+                              for (name, _), value in zip(grid, values))
+        configs.append((configName, values, configArgs))
+
+    return configs
+
+
+# Loaded corpora and summarizer shared with the sweep workers by fork
+_sweepState = {}
+
+
+def _sweepWorker(task):
+    docName, params, outFiles, fingerprint = task
+
+    summaries = sum(map(
+        lambda c: _sweepState['summarizer'].summarizeCorpus(c, params),
+        _sweepState['corpora'][docName]
+    ), [])
+
+    return docName, fingerprint, outFiles, dataset.getSummaryRecords(
+        docName, summarizers.getSummaryNames(params), summaries
+    )
+
+
+def _sweepBatch(batch, summarizer, params, runManifest, processes, done,
+                total):
+    """
+    Load a batch of topics, and their similarity matrices, and summarize
+    them with all their parameter settings in parallel. Loaded corpora are
+    released before the next batch.
+
+    :returns: Number of summarized topics and parameter settings, including
+              ``done`` before this batch
+    """
+    corpora = {}
+    tasks = []
+    for docName, documents, topicTasks in batch:
+        corpus = summarizer.loadCorpus(None, params, documents)
+
+        corpora[docName] = corpus.getTargetCorpora()
+        for targetCorpus in corpora[docName]:
+            targetCorpus.getSentenceSimilarities()
+            targetCorpus.getTranslationSentenceSimilarities()
+
+        tasks.extend(topicTasks)
+
+    _sweepState['summarizer'] = summarizer
+    _sweepState['corpora'] = corpora
+
+    pool = multiprocessing.Pool(min(processes or multiprocessing.cpu_count(),
+                                    len(tasks)))
+    try:
+        for result in pool.imap_unordered(_sweepWorker, tasks):
+            docName, fingerprint, outFiles, summaries = result
+            storeSummaries(docName, fingerprint, summaries, outFiles,
+                           runManifest)
+
+            done += 1
+            print "Summarizing:", done, "/", total, "\r",
+            sys.stdout.flush()
+    finally:
+        pool.close()
+        pool.join()
+        _sweepState.clear()
+
+    return done
+
+
+def validateSweep(summarizer, grid, args):
+    """
+    Check that no parameter needed for loading documents is swept, as each
+    topic is loaded once for all combinations
+
+    :raises ValueError: if such a parameter is swept
+    """
+    baseParams = summarizer.getParams(args)
+
+    for _, _, configArgs in getSweepConfigs(grid, args):
+        params = summarizer.getParams(configArgs)
+        for key in summarizer.CORPUS_PARAMS:
+            if params[key] != baseParams[key]:
+                raise ValueError("Parameter `%s` is needed for loading "
+                                 "documents and cannot be swept" % key)
+
+
+def sweepAll(docNames, summarizer, grid, args):
+    """
+    Summarize and evaluate all topics for every combination of parameters in
+    the grid. Each topic is loaded, and its similarity matrices computed,
+    only once. Topics are loaded in batches of ``--sweep-batch``, and the
+    optimization stage for all combinations then runs in parallel on the
+    loaded corpora of a batch, so memory is bounded by the batch size rather
+    than the dataset.
+
+    With ``--resume``, combinations whose summaries of a topic are recorded
+    in the manifest are not summarized again, and topics having all of them
+    are not loaded.
+    """
+    configs = getSweepConfigs(grid, args)
+    baseParams = summarizer.getParams(args)
+    outputNames, _ = getOutputDirs(args.summaries_path, baseParams)
+
+    if not args.only_rouge:
+        configParams = []
+        for configName, _, configArgs in configs:
+            params = summarizer.getParams(configArgs)
+
+            _, outDirs = getOutputDirs(
+                os.path.join(args.summaries_path, configName), params
+            )
+            map(fs.ensureDir, outDirs)
+            configParams.append((params, outDirs))
+
+        runManifest = manifest.Manifest(getManifestPath(args))
+
+        total = len(docNames) * len(configParams)
+        batch = []
+        done = reused = 0
+        try:
+            for docName, documents in dataset.readTopics(args.source_path,
+                                                         docNames):
+                documents = list(documents)
+                documentsFingerprint = manifest.getDocumentsFingerprint(
+                    documents)
+
+                topicTasks = []
+                for params, outDirs in configParams:
+                    outFiles = map(lambda d: os.path.join(d, docName),
+                                   outDirs)
+                    fingerprint = manifest.getFingerprint(
+                        summarizer.__name__, params, documentsFingerprint
+                    )
+
+                    cached = None
+                    if args.resume:
+                        cached = getCachedSummaries(runManifest, fingerprint,
+                                                    docName)
+
+                    if cached is not None:
+                        cached, summaries = cached
+                        storeSummaries(docName, fingerprint, summaries,
+                                       outFiles, runManifest, cached)
+                        reused += 1
+                        done += 1
+                        continue
+
+                    topicTasks.append((docName, params, outFiles,
+                                       fingerprint))
+
+                if topicTasks:
+                    batch.append((docName, documents, topicTasks))
+
+                if len(batch) >= args.sweep_batch:
+                    done = _sweepBatch(batch, summarizer, baseParams,
+                                       runManifest, args.sweep_processes,
+                                       done, total)
+                    batch = []
+
+            if batch:
+                _sweepBatch(batch, summarizer, baseParams, runManifest,
+                            args.sweep_processes, done, total)
+        finally:
+            runManifest.close()
+        print
+
+        if args.resume:
+            print "Reused summaries of", reused, "/", total, \
+                "topics and parameter settings"
+
+    refIndex = getReferenceIndex(docNames, args.models_path)
+    rougeScorer = getRougeScorer(args)
+
+    rows = []
+    for i, (configName, values, configArgs) in enumerate(configs):
+        print "Evaluating:", i + 1, "/", len(configs), "\r",
+        sys.stdout.flush()
+
+        _, summariesDirs = getOutputDirs(
+            os.path.join(args.summaries_path, configName),
+            summarizer.getParams(configArgs)
+        )
+        for outputName, summariesDir in zip(outputNames, summariesDirs):
+            summaryRefsList = getSummaryRefsList(docNames, summariesDir,
+                                                 refIndex)
+            results = rougeScorer.rouge(summaryRefsList,
+                                        processes=args.rouge_processes,
+                                        resamples=args.rouge_resamples,
+                                        seed=args.rouge_seed,
+                                        rouge_types=args.rouge_types,
+                                        silent=True)
+            rows.append((values + ((outputName,) if len(outputNames) > 1
+                                   else ()), results))
+    print
+
+    if len(outputNames) > 1:
+        grid = grid + [('summary', outputNames)]
+
+    tablePath = args.sweep_table or os.path.join(args.summaries_path,
+                                                 "sweep.tsv")
+    writeResultsTable(tablePath, grid, rows)
+
+
+def writeResultsTable(tablePath, grid, rows):
+    """
+    Write average ROUGE scores for each combination of parameter values as
+    tab separated values, and print them
+    """
+    rougeTypes = rows[0][1].keys()
+
+    header = map(lambda g: g[0], grid) + sum(
+        map(lambda t: [t + " R", t + " P", t + " F"], rougeTypes), []
+    )
+
+    lines = ["\t".join(header)]
+    for values, results in rows:
+        scores = sum(map(lambda t: [results[t]["average"]["recall"],
+                                    results[t]["average"]["precision"],
+                                    results[t]["average"]["f"]],
+                         rougeTypes), [])
+        lines.append("\t".join(map(str, values) +
+                                map(lambda v: "%0.5f" % v, scores)))
+
+    with open(tablePath, "w") as tableFile:
+        tableFile.write("\n".join(lines) + "\n")
+
+    print "\n".join(lines)
+    print "Results written to", tablePath
 
 
 if __name__ == '__main__':
@@ -65,7 +540,9 @@ if __name__ == '__main__':
                                help='Directory containing all the source '
                                'files to be summarized. Each set of documents '
                                'are expected to be in different directories '
-                               'inside this path.')
+                               'inside this path. Can also be a tar archive '
+                               'with the same layout, or a JSONL file with '
+                               'topic, doc and text of each document.')
     common_parser.add_argument('models_path',
                                help='Directory containing all the model '
                                'summaries. Each set of summaires are expected '
@@ -77,31 +554,192 @@ if __name__ == '__main__':
                                help='Directory to store the generated '
                                'summaries. The directory will be created if '
                                'not already exists.')
+    common_parser.add_argument('--summaries-jsonl', type=str, default=None,
+                               metavar='path',
+                               help='Also write all summaries as JSON lines '
+                               'to this path, with topic, name, summary and '
+                               'source_summary')
+    common_parser.add_argument('--manifest', type=str, default=None,
+                               metavar='path',
+                               help='Path of the run manifest, recording a '
+                               'fingerprint of the documents and parameters '
+                               'of each topic along with its summaries. '
+                               'Defaults to manifest.jsonl in summaries_path')
+    common_parser.add_argument('--resume', action='store_true',
+                               help='Reuse summaries recorded in the '
+                               'manifest for the same documents and '
+                               'parameters, e.g. to resume an interrupted run '
+                               'or to skip parameter settings of earlier '
+                               'sweeps. Changes to the code are not detected')
     common_parser.add_argument('--only-rouge', action='store_true',
                                help='Do not run summarizer. '
                                'Only compule ROUGE score for existing '
                                'summaries in summaries_path')
+    common_parser.add_argument('--sweep', type=str, action='append',
+                               default=[], metavar='name=v1,v2,...',
+                               help='Sweep a summarizer parameter over the '
+                               'given values, e.g. alpha=0.3,0.5. Can be '
+                               'repeated, all combinations are evaluated. '
+                               'Summaries for each combination are stored in '
+                               'a directory inside summaries_path')
+    common_parser.add_argument('--sweep-processes', type=int, default=None,
+                               metavar='N',
+                               help='Number of processes for the parameter '
+                               'sweep. Defaults to number of CPUs')
+    common_parser.add_argument('--sweep-batch', type=int, default=1,
+                               metavar='N',
+                               help='Number of topics loaded together for '
+                               'the parameter sweep. Larger batches keep more '
+                               'processes busy with few combinations, and '
+                               'take more memory. Defaults to 1')
+    common_parser.add_argument('--sweep-table', type=str, default=None,
+                               metavar='path',
+                               help='Path to write the sweep results table. '
+                               'Defaults to sweep.tsv in summaries_path')
+    common_parser.add_argument('--rouge-types', type=str, nargs='+',
+                               default=['1', '2'], metavar='type',
+                               help='ROUGE variants to compute, e.g. 1 2 SU4 '
+                               'W-1.2. Defaults to 1 2')
+    common_parser.add_argument('--rouge-length-limit', type=int,
+                               default=None, metavar='N',
+                               help='Only use the first N words of each '
+                               'summary for ROUGE, like ROUGE-1.5.5 -l')
+    common_parser.add_argument('--rouge-byte-limit', type=int, default=None,
+                               metavar='N',
+                               help='Only use the first N bytes of each '
+                               'summary for ROUGE, like ROUGE-1.5.5 -b')
+    common_parser.add_argument('--external-rouge', action='store_true',
+                               help='Also run the external ROUGE-1.5.5 '
+                               'tool-kit. Needs ROUGE_HOME')
+    common_parser.add_argument('--rouge-shards', type=int, default=1,
+                               metavar='N',
+                               help='Split summaries in N shards evaluated by '
+                               'concurrent external ROUGE processes. '
+                               'Confidence intervals of merged shards are '
+                               're-estimated by bootstrap resampling')
+    common_parser.add_argument('--rouge-parity', action='store_true',
+                               help='Run both ROUGE implementations and '
+                               'check that the averages match. Exits with '
+                               'non-zero status on mismatch')
+    common_parser.add_argument('--rouge-processes', type=int, default=None,
+                               metavar='N',
+                               help='Number of processes to compute ROUGE '
+                               'scores. Defaults to number of CPUs, or '
+                               'number of shards for external ROUGE')
+    common_parser.add_argument('--rouge-resamples', type=int, default=1000,
+                               metavar='N',
+                               help='Number of bootstrap resamples for ROUGE '
+                               'confidence intervals')
+    common_parser.add_argument('--rouge-seed', type=int, default=None,
+                               metavar='seed',
+                               help='Seed for bootstrap resampling')
+    common_parser.add_argument('--rouge-json', type=str, default=None,
+                               metavar='path',
+                               help='Write ROUGE results as JSON to this path')
+    common_parser.add_argument('--profile', type=str, default=None,
+                               metavar='path',
+                               help='Record time spent in each stage and '
+                               'counters, such as cache hits, and write them '
+                               'as JSON lines to this path')
+    common_parser.add_argument('--cprofile-stage', type=str, default=None,
+                               metavar='stage',
+                               help='Profile a stage with cProfile, e.g. '
+                               '`optimize`')
+    common_parser.add_argument('--cprofile-dump', type=str, default=None,
+                               metavar='path',
+                               help='Path to dump cProfile stats. Defaults '
+                               'to `<stage>.prof`')
+    common_parser.add_argument('--profile-memory', action='store_true',
+                               help='Also record resident set size and its '
+                               'peak (VmHWM) around each stage, and sizes of '
+                               'large arrays. A summary is printed for each '
+                               'topic')
 
     parser = argparse.ArgumentParser(
             description='Evaluate the summarizer',
-            epilog='Set ROUGE_HOME environment variable for this to work')
+            epilog='Set ROUGE_HOME environment variable to use the '
+                   'external ROUGE-1.5.5 tool-kit')
 
     subparsers = parser.add_subparsers(title='methods',
-                                       description='Summarization method')
+                                       description='Summarization method',
+                                       dest='method')
 
-    linBilmes.setupArgparse(subparsers.add_parser('linBilmes',
-                                                  parents=[common_parser]))
-    coRank.setupArgparse(subparsers.add_parser('coRank',
-                                               parents=[common_parser]))
-    simFusion.setupArgparse(subparsers.add_parser('simFusion',
-                                                  parents=[common_parser]))
+    summarizers.setupSubparsers(subparsers, [common_parser])
 
     args = parser.parse_args()
 
     docNames = getAvailableReferences(args.models_path)
+    outputNames, summariesDirs = getOutputDirs(
+        args.summaries_path,
+        summarizers.getSummarizer(args.method).getParams(args)
+    )
+
+    if args.sweep:
+        summarizer = summarizers.getSummarizer(args.method)
+        try:
+            grid = getSweepGrid(args.sweep, args)
+            validateSweep(summarizer, grid, args)
+        except ValueError as e:
+            parser.error(str(e))
+
+        sweepAll(docNames, summarizer, grid, args)
+
+        sys.exit(0)
 
     if not args.only_rouge:
-        summarizeAll(docNames, args.source_path, args.summaries_path,
-                     args.func, args)
+        profileFile = None
+        if args.profile or args.cprofile_stage or args.profile_memory:
+            profiling.enable(args.cprofile_stage, args.cprofile_dump,
+                             memory=args.profile_memory)
+            if args.profile:
+                profileFile = open(args.profile, "w")
+
+        summariesFile = None
+        if args.summaries_jsonl:
+            summariesFile = open(args.summaries_jsonl, "w")
+
+        summarizer = summarizers.getSummarizer(args.method)
+        runManifest = manifest.Manifest(getManifestPath(args))
+        try:
+            records = summarizeAll(docNames, args.source_path, summariesDirs,
+                                   summarizer, summarizer.getParams(args),
+                                   runManifest, args.resume, profileFile,
+                                   summariesFile)
+        except dataset.DatasetError as e:
+            parser.error(str(e))
+        finally:
+            runManifest.close()
+            if summariesFile:
+                summariesFile.close()
+
+        if profileFile:
+            profileFile.close()
+
+        if args.profile_memory:
+            print "\n".join(profiling.formatMemoryReport(records))
+            print
+
+    rows = []
+    matches = True
+    for outputName, summariesDir in zip(outputNames, summariesDirs):
+        jsonPath = args.rouge_json
+        if len(outputNames) > 1:
+            print "Summary:", outputName
+            if jsonPath:
+                root, ext = os.path.splitext(jsonPath)
+                jsonPath = "%s-%s%s" % (root, outputName.replace("/", "-"),
+                                        ext)
+
+        results, outputMatches = getRougeScore(
+            docNames, summariesDir, args.models_path, args, jsonPath
+        )
+        rows.append(((outputName,), results))
+        matches = matches and outputMatches
+
+    if len(outputNames) > 1:
+        print "-"
+        writeResultsTable(os.path.join(args.summaries_path, "summaries.tsv"),
+                          [('summary', outputNames)], rows)
 
-    getRougeScore(docNames, args.summaries_path, args.models_path)
+    if not matches:
+        sys.exit(1)
@@ -0,0 +1,73 @@
+import argparse
+import logging
+
+from clstk.utils import colors
+
+from clstk import summarizers
+from clstk.service import SummarizationService, ServiceServer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Serve summaries over a local HTTP/JSON API, keeping '
+                        'models and caches loaded'
+        )
+
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Address to listen on. Defaults to localhost')
+    parser.add_argument('-p', '--port', type=int, default=8080,
+                        help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=None, metavar='N',
+                        help='Number of worker threads. Defaults to number '
+                        'of CPUs')
+    parser.add_argument('--max-queue', type=int, default=64, metavar='N',
+                        help='Maximum number of requests waiting or being '
+                        'processed. Further requests are rejected')
+    parser.add_argument('--timeout', type=float, default=60.,
+                        metavar='seconds',
+                        help='Timeout for each request')
+    parser.add_argument('--methods', type=str, nargs='+',
+                        default=summarizers.METHODS.keys(),
+                        choices=summarizers.METHODS.keys(),
+                        help='Summarization methods to load at startup')
+    parser.add_argument('--langs', type=str, nargs='+', default=['en'],
+                        metavar='lang',
+                        help='Languages to load tokenizers for at startup')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Show verbose information messages')
+    parser.add_argument('--no-colors', action='store_true',
+                        help='Don\'t show colors in verbose log')
+
+    args = parser.parse_args()
+
+    if args.no_colors:
+        colors.disable()
+
+    logLevel = logging.NOTSET if args.verbose else logging.WARNING
+    logging.basicConfig(
+        level=logLevel,
+        format=(colors.enclose('%(asctime)s', colors.CYAN) +
+                colors.enclose('.%(msecs)03d ', colors.BLUE) +
+                colors.enclose('%(name)s', colors.YELLOW) + ': ' +
+                '%(message)s'),
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    # Summarizer logs are too verbose for every request
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("service.py").setLevel(
+        logging.INFO if args.verbose else logging.WARNING)
+
+    service = SummarizationService(workers=args.workers,
+                                   maxQueue=args.max_queue,
+                                   timeout=args.timeout)
+    service.warmUp(args.methods, args.langs)
+
+    server = ServiceServer((args.host, args.port), service)
+    print "Serving on http://%s:%d" % server.server_address
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -1,35 +1,98 @@
+import os
+import sys
 import argparse
 import logging
 
 from clstk.utils import colors
+from clstk.utils import dataset
+from clstk.utils import profiling
+
+from clstk import summarizers
+
+
+def getTopics(source):
+    """
+    Get topics to summarize. A directory of documents is a single topic
+    named after it, other sources are datasets of topics, see
+    :func:`clstk.utils.dataset.readTopics`
+    """
+    if os.path.isdir(source):
+        from clstk.corpus import readDocuments
+
+        return [(os.path.basename(os.path.normpath(source)),
+                 readDocuments(source))]
+
+    return dataset.readTopics(source)
+
+
+def summarizeTopics(args, outFile=None):
+    """
+    Summarize each topic of the source, and write the summaries as JSON
+    lines to ``outFile``, or print them
+    """
+    summarizer = summarizers.getSummarizer(args.method)
+    params = summarizer.getParams(args)
+    names = summarizers.getSummaryNames(params)
+
+    for topic, documents in getTopics(args.source_directory):
+        summaries = summarizer.summarizeDocuments(documents, params)
+
+        if outFile:
+            dataset.writeSummaryRecords(
+                outFile, dataset.getSummaryRecords(topic, names, summaries)
+            )
+            continue
+
+        for name, summary in zip(names, summaries):
+            print "Topic: %s%s" % (topic,
+                                   " " + name if len(names) > 1 else "")
+            print summary.getTargetSummary().encode('utf-8')
 
-from clstk import linBilmes
-from clstk import coRank
-from clstk import simFusion
 
 if __name__ == '__main__':
     common_parser = argparse.ArgumentParser(add_help=False)
 
     common_parser.add_argument('source_directory',
                                help='Directory containing a set of files to '
-                               'be summarized.')
+                               'be summarized. Can also be a tar archive or a '
+                               'JSONL file with several topics, see '
+                               'evaluate.py, to summarize each of them.')
+    common_parser.add_argument('-o', '--output', type=str, default=None,
+                               metavar='path',
+                               help='Write summaries as JSON lines to this '
+                               'path, with topic, name, summary and '
+                               'source_summary, instead of printing them')
     common_parser.add_argument('-v', '--verbose', action='store_true',
                                help='Show verbose information messages')
     common_parser.add_argument('--no-colors', action='store_true',
                                help='Don\'t show colors in verbose log')
+    common_parser.add_argument('--profile', type=str, default=None,
+                               metavar='path',
+                               help='Record time spent in each stage and '
+                               'counters, such as cache hits, and write them '
+                               'as JSON lines to this path')
+    common_parser.add_argument('--cprofile-stage', type=str, default=None,
+                               metavar='stage',
+                               help='Profile a stage with cProfile, e.g. '
+                               '`optimize`')
+    common_parser.add_argument('--cprofile-dump', type=str, default=None,
+                               metavar='path',
+                               help='Path to dump cProfile stats. Defaults '
+                               'to `<stage>.prof`')
+    common_parser.add_argument('--profile-memory', action='store_true',
+                               help='Also record resident set size and its '
+                               'peak (VmHWM) around each stage, and sizes of '
+                               'large arrays. A summary is printed for each '
+                               'topic')
 
     parser = argparse.ArgumentParser(
             description='Automatically summarize a set of documents'
         )
     subparsers = parser.add_subparsers(title='methods',
-                                       description='Summarization method')
+                                       description='Summarization method',
+                                       dest='method')
 
-    linBilmes.setupArgparse(subparsers.add_parser('linBilmes',
-                                                  parents=[common_parser]))
-    coRank.setupArgparse(subparsers.add_parser('coRank',
-                                               parents=[common_parser]))
-    simFusion.setupArgparse(subparsers.add_parser('simFusion',
-                                                  parents=[common_parser]))
+    summarizers.setupSubparsers(subparsers, [common_parser])
 
     args = parser.parse_args()
 
@@ -48,4 +111,27 @@ if __name__ == '__main__':
 
     logging.info("Initializing summarizer")
 
-    args.func(args)
+    if args.profile or args.cprofile_stage or args.profile_memory:
+        profiling.enable(args.cprofile_stage, args.cprofile_dump,
+                         memory=args.profile_memory)
+        profiling.startRecord(topic=args.source_directory)
+
+    try:
+        with profiling.stage('total'):
+            if args.output:
+                with open(args.output, "w") as outFile:
+                    summarizeTopics(args, outFile)
+            elif os.path.isdir(args.source_directory):
+                args.func(args)
+            else:
+                summarizeTopics(args)
+    except dataset.DatasetError as e:
+        parser.error(str(e))
+
+    if args.profile:
+        with open(args.profile, "w") as f:
+            profiling.writeRecord(f)
+
+    if args.profile_memory:
+        sys.stderr.write("\n".join(
+            profiling.formatMemoryReport([profiling.getRecord()])) + "\n")